@@ -0,0 +1,212 @@
+"""
+Lectures les plus sollicitées servies en asynchrone sous ASGI (astremina.asgi).
+
+Liste, détail et bounding box des propriétés, liste des favoris : le
+cache (versions, ETag, réponses en cache) passe par properties.async_cache
+et les requêtes SQL par l'ORM asynchrone, sans retenir un worker pendant
+les attentes. Les étapes sans entrée/sortie (querysets, filtres, curseurs,
+serializers, ETag) sont celles des viewsets, liés à la requête : la
+réponse est celle du viewset.
+
+Ce que ces vues ne servent pas (écritures, API navigable, ?fields= /
+?expand=, ?search=, ?compact=, paramètres invalides, jeton
+refusé, limite de débit atteinte…) est confié à la vue synchrone du
+router, dans un thread, qui rend la réponse ou l'erreur habituelle. Les
+listes et la bounding box ne sont servies que par le chemin rapide
+(API_FAST_LIST_SERIALIZATION).
+"""
+import abc
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.urls import path
+from django.utils.cache import patch_vary_headers
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from properties import response_cache
+
+from .expansion import is_requested
+from .filters import PropertySearchFilter
+from .pagination import PropertyKeysetPagination, apaginate_page_number
+from .renderers import FastJSONRenderer
+from .views import FavoriteViewSet, PropertyViewSet
+
+RENDERER = FastJSONRenderer()
+
+
+async def authenticate(view):
+    """Établit l'utilisateur de la requête par les authentificateurs du viewset (DEFAULT_AUTHENTICATION_CLASSES).
+
+    Ils lisent la base de façon synchrone : seul ce pas passe par un thread.
+    False quand seul DRF sait répondre (jeton invalide ou refusé).
+    """
+    try:
+        await sync_to_async(view.perform_authentication)(view.request)
+    except APIException:
+        return False
+    return True
+
+
+def wants_json(request):
+    """Rendu JSON tel que DRF le négocie : pas d'autre ?format=, pas de navigateur (API navigable)"""
+    requested = request.GET.get(api_settings.URL_FORMAT_OVERRIDE)
+    if requested:
+        return requested == RENDERER.format
+    return 'text/html' not in request.headers.get('Accept', '')
+
+
+def searching(drf_request):
+    return bool(drf_request.query_params.get(PropertySearchFilter.search_param, '').strip())
+
+
+def bind(viewset_class, action, request, **kwargs):
+    """Viewset lié à la requête comme dans APIView.initial (authentificateurs du viewset, rendu JSON)"""
+    view = viewset_class(action=action, args=(), kwargs=kwargs, format_kwarg=None, headers={})
+    view.request = Request(
+        request, authenticators=view.get_authenticators(),
+        parser_context={'view': view, 'args': (), 'kwargs': kwargs}
+    )
+    view.request.accepted_renderer = RENDERER
+    view.request.accepted_media_type = RENDERER.media_type
+    return view
+
+
+def json_response(data):
+    response = HttpResponse(RENDERER.render(data), content_type=RENDERER.media_type)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+async def throttled(view):
+    """Une limite de débit refuse la requête (le 429 et son Retry-After sont rendus par le viewset)"""
+    for throttle in view.get_throttles():
+        if not hasattr(throttle, 'aallow_request') or not await throttle.aallow_request(view.request, view):
+            return True
+    return False
+
+
+class AsyncReadView(View, abc.ABC):
+    """Lecture asynchrone d'une action du viewset ; le reste va à la vue synchrone de la route (fallback)"""
+    fallback = None
+    viewset_class = None
+    action = None
+    # Aucun gestionnaire get/post… : tout passe par dispatch
+    view_is_async = True
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Comme les vues DRF : SessionAuthentication fait le contrôle CSRF des écritures
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        response = None
+        if request.method == 'GET' and wants_json(request):
+            view = bind(self.viewset_class, self.action, request, **kwargs)
+            if await authenticate(view):
+                try:
+                    if not await throttled(view):
+                        response = await self.read(view, **kwargs)
+                except APIException:
+                    # Erreur de paramètres : rendue par le viewset, comme d'habitude
+                    response = None
+        if response is None:
+            response = await self.afallback(request, *args, **kwargs)
+        return response
+
+    async def afallback(self, request, *args, **kwargs):
+        return await sync_to_async(self.fallback)(request, *args, **kwargs)
+
+    @abc.abstractmethod
+    async def read(self, view, **kwargs):
+        """Réponse servie sans thread, None pour la confier à la vue synchrone"""
+
+
+class AsyncPropertyListView(AsyncReadView):
+    viewset_class = PropertyViewSet
+    action = 'list'
+
+    async def read(self, view):
+        request, user = view.request, view.request.user
+        # ?search= : index de recherche synchrone
+        if not view.use_fast_path() or searching(request):
+            return None
+        queryset = view.filter_queryset(view.get_queryset())
+
+        async def respond():
+            if user.is_authenticated:
+                return json_response(await view.afast_data(queryset, paginate=True))
+            # Comme CachedListMixin
+            return json_response(await response_cache.aget_or_set(
+                view.cache_namespace, request.query_params,
+                lambda: view.afast_data(queryset, paginate=True),
+                extra=request.get_host()
+            ))
+        return await view.aconditional(respond, request)
+
+
+class AsyncPropertyDetailView(AsyncReadView):
+    viewset_class = PropertyViewSet
+    action = 'retrieve'
+
+    async def read(self, view, pk):
+        if is_requested(view.request) or searching(view.request):
+            return None
+
+        async def respond():
+            # Le profil du propriétaire est sérialisé : joint plutôt que lu à part
+            queryset = view.filter_queryset(view.get_queryset()).select_related('owner__profile')
+            property_obj = await queryset.filter(pk=pk).afirst()
+            if property_obj is None:
+                return None
+            view.check_object_permissions(view.request, property_obj)
+            context = view.get_serializer_context()
+            context['favorite_ids'] = await view.afavorite_ids([property_obj.id])
+            return json_response(view.get_serializer_class()(property_obj, context=context).data)
+        return await view.aconditional(respond, view.request)
+
+
+class AsyncPropertyBboxView(AsyncReadView):
+    viewset_class = PropertyViewSet
+    action = 'search_by_bbox'
+
+    async def read(self, view):
+        if 'compact' in view.request.query_params or not view.use_fast_path():
+            return None
+        properties = view.filter_bbox(view.request, view.get_queryset())
+        if properties is None:
+            return None
+        data = await view.afast_data(properties, PropertyKeysetPagination.is_requested(view.request))
+        return None if data is None else json_response(data)
+
+
+class AsyncFavoriteListView(AsyncReadView):
+    viewset_class = FavoriteViewSet
+    action = 'list'
+
+    async def read(self, view):
+        if not view.request.user.is_authenticated:
+            return None
+        if is_requested(view.request) or not isinstance(view.paginator, PageNumberPagination):
+            return None
+        queryset = view.filter_queryset(view.get_queryset())
+        favorites = await apaginate_page_number(view.paginator, queryset, view.request)
+        if favorites is None:
+            return None
+        serializer = view.get_serializer(favorites, many=True)
+        return json_response(view.get_paginated_response(serializer.data).data)
+
+
+def urlpatterns_for(router):
+    """Routes asynchrones, à placer devant celles du router dont elles reprennent les vues"""
+    views = {pattern.name: pattern.callback for pattern in router.urls}
+    return [
+        path('properties/', AsyncPropertyListView.as_view(fallback=views['property-list'])),
+        path('properties/search_by_bbox/', AsyncPropertyBboxView.as_view(fallback=views['property-search-by-bbox'])),
+        path('properties/<uuid:pk>/', AsyncPropertyDetailView.as_view(fallback=views['property-detail'])),
+        path('favorites/', AsyncFavoriteListView.as_view(fallback=views['favorite-list'])),
+    ]
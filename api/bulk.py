@@ -0,0 +1,67 @@
+"""
+Validation des créations / mises à jour en masse de l'API.
+
+Chaque élément est validé par PartnerPropertySerializer ; un élément portant une
+partner_reference déjà connue pour ce propriétaire met l'annonce à jour
+(champs fournis seulement), les autres sont créés. Si un élément est
+invalide, rien n'est écrit ; sinon l'écriture est celle de
+partners.listings.write_listings.
+"""
+from properties.models import Property
+
+from .serializers import PartnerPropertySerializer
+
+REFERENCE_FIELD = 'partner_reference'
+
+def validate_items(items, owner, context, require_reference=False):
+    """(résultats par élément, [(instance existante ou None, données validées)] si tout est valide)"""
+    references = [item.get(REFERENCE_FIELD) for item in items if isinstance(item, dict)]
+    existing = {
+        property_obj.partner_reference: property_obj
+        for property_obj in Property.objects.filter(
+            owner=owner, partner_reference__in=[reference for reference in references if isinstance(reference, str) and reference]
+        )
+    }
+
+    context = {**context, 'owner_references': existing.keys()}
+    results, valid, seen = [], [], set()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results.append({'index': index, 'status': 'invalid', 'errors': {'non_field_errors': ['Expected an object']}})
+            continue
+        reference = item.get(REFERENCE_FIELD)
+        if reference is not None and not isinstance(reference, str):
+            results.append({'index': index, 'status': 'invalid', 'errors': {REFERENCE_FIELD: ['Not a valid string.']}})
+            continue
+        if require_reference and not reference:
+            results.append({'index': index, 'status': 'invalid', 'errors': {REFERENCE_FIELD: ['This field is required.']}})
+            continue
+        if reference and reference in seen:
+            results.append({'index': index, 'status': 'invalid', 'errors': {REFERENCE_FIELD: ['Duplicate reference in this batch']}})
+            continue
+        if reference:
+            seen.add(reference)
+
+        instance = existing.get(reference) if reference else None
+        serializer = PartnerPropertySerializer(instance, data=item, partial=instance is not None, context=context)
+        if serializer.is_valid():
+            results.append({'index': index, 'status': 'valid'})
+            valid.append((instance, serializer.validated_data))
+        else:
+            results.append({'index': index, 'status': 'invalid', 'errors': serializer.errors})
+
+    if len(valid) != len(items):
+        return results, None
+    return results, valid
+
+def written_results(written):
+    """Résultats par élément écrit, dans l'ordre de la requête"""
+    return [
+        {
+            'index': index,
+            'status': 'created' if is_created else 'updated',
+            'id': str(property_obj.id),
+            'partner_reference': property_obj.partner_reference,
+        }
+        for index, (property_obj, is_created) in enumerate(written)
+    ]
@@ -0,0 +1,24 @@
+from rest_framework.response import Response
+
+from properties import response_cache
+
+
+class CachedListMixin:
+    """
+    Données sérialisées de list mises en cache pour les visiteurs anonymes
+    (is_favorited est propre à l'utilisateur connecté). Le rendu (JSON,
+    API navigable) reste fait à chaque requête.
+    """
+    cache_namespace = 'api:list'
+
+    def list(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+
+        data = response_cache.get_or_set(
+            self.cache_namespace, request.query_params,
+            lambda: super(CachedListMixin, self).list(request, *args, **kwargs).data,
+            # Les liens de pagination sont absolus
+            extra=request.get_host()
+        )
+        return Response(data)
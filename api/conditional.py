@@ -0,0 +1,72 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from properties import versions
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified pour list et retrieve, calculés à partir des compteurs
+    de properties.versions et non du corps de la réponse : une requête dont
+    le If-None-Match correspond reçoit un 304 après une seule lecture du
+    cache, sans requête SQL ni sérialisation.
+
+    Last-Modified n'est qu'indicatif : à la seconde près, il ne distingue pas
+    deux écritures de la même seconde, et If-Modified-Since n'est donc pas
+    comparé.
+    """
+    conditional_actions = ('list', 'retrieve')
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
+    def get_version_scopes(self, request):
+        # is_favorited est propre à l'utilisateur connecté
+        scopes = [versions.CATALOGUE]
+        if request.user.is_authenticated:
+            scopes.append(versions.favorites_scope(request.user.pk))
+        return scopes
+
+    def get_validators(self, request, current=None):
+        if current is None:
+            current = versions.get_versions(self.get_version_scopes(request))
+        signature = ':'.join([
+            request.get_full_path(),
+            request.accepted_renderer.format or '',
+            str(request.user.pk or ''),
+        ] + [f'{scope}={version}' for scope, version in sorted(current.items())])
+        etag = quote_etag(hashlib.md5(signature.encode()).hexdigest())
+        return etag, max(current.values()) // 10 ** 9
+
+    def conditional(self, handler, request, *args, **kwargs):
+        if self.action not in self.conditional_actions or request.method not in ('GET', 'HEAD'):
+            return handler(request, *args, **kwargs)
+
+        etag, last_modified = self.get_validators(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        return self.set_validators(response, etag, last_modified)
+
+    async def aconditional(self, handler, request):
+        """conditional pour les vues asynchrones : handler() est une coroutine, qui peut rendre None pour y renoncer"""
+        current = await versions.aget_versions(self.get_version_scopes(request))
+        etag, last_modified = self.get_validators(request, current)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = await handler()
+            if response is None:
+                return None
+        return self.set_validators(response, etag, last_modified)
+
+    def set_validators(self, response, etag, last_modified):
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            patch_vary_headers(response, ['Authorization', 'Cookie'])
+        return response
@@ -0,0 +1,138 @@
+"""
+Champs à la demande : ?fields= et ?expand= (lectures uniquement).
+
+- ?fields=id,title,owner.email : seuls ces champs sont sérialisés, à tout
+  niveau (un champ imbriqué sans sous-champ est rendu en entier).
+- ?expand=owner,partner.user : en présence de ce paramètre, seules les
+  relations listées sont imbriquées ; les autres clés étrangères sont
+  rendues par leur clé primaire (lue sur la ligne, sans jointure) et les
+  autres relations (inverses, multiples) sont omises. Sans ?expand=, les
+  relations restent imbriquées comme avant.
+
+Les vues recalculent alors select_related / prefetch_related à partir des
+champs réellement sérialisés.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+def parse_spec(value):
+    """'a,b.c,b.d' -> {'a': {}, 'b': {'c': {}, 'd': {}}}"""
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in path.strip().split('.'):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+def requested_specs(request):
+    """(fields, expand) de la requête, None quand le paramètre est absent ou la requête une écriture"""
+    if request is None or request.method not in SAFE_METHODS:
+        return None, None
+    params = request.query_params
+    fields = parse_spec(params[FIELDS_PARAM]) if params.get(FIELDS_PARAM) else None
+    expand = parse_spec(params[EXPAND_PARAM]) if EXPAND_PARAM in params else None
+    return fields, expand
+
+def is_requested(request):
+    return requested_specs(request) != (None, None)
+
+def _is_forward_relation(serializer, source):
+    """Clé étrangère portée par le modèle : sa clé primaire est lisible sans requête"""
+    model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+    if model is None or source == '*' or '.' in source:
+        return False
+    try:
+        model_field = model._meta.get_field(source)
+    except FieldDoesNotExist:
+        return False
+    return model_field.concrete and (model_field.many_to_one or model_field.one_to_one)
+
+
+class ExpandableFieldsMixin:
+    """Applique ?fields= et ?expand= au serializer, à sa place dans l'arbre imbriqué"""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        only, expand = self._level_specs()
+
+        if only:
+            for name in list(fields):
+                if name not in only:
+                    del fields[name]
+
+        if expand is not None:
+            for name, field in list(fields.items()):
+                if not isinstance(field, serializers.BaseSerializer) or name in expand:
+                    continue
+                # Les champs ne sont pas encore liés : source vaut None quand elle n'est pas explicite
+                source = field.source or name
+                if isinstance(field, serializers.ListSerializer) or not _is_forward_relation(self, source):
+                    del fields[name]
+                else:
+                    fields[name] = serializers.PrimaryKeyRelatedField(
+                        read_only=True, **({'source': source} if source != name else {})
+                    )
+        return fields
+
+    def _level_specs(self):
+        # Chemin depuis la racine (l'enfant d'un ListSerializer n'a pas de nom)
+        path, node = [], self
+        while node.parent is not None:
+            if node.field_name:
+                path.append(node.field_name)
+            node = node.parent
+
+        only, expand = requested_specs(node.context.get('request'))
+        for name in reversed(path):
+            if only is not None:
+                only = only.get(name) or None
+            if expand is not None:
+                expand = expand.get(name, {})
+        return only, expand
+
+
+def relation_lookups(serializer, prefix='', prefetching=False):
+    """(select_related, prefetch_related) nécessaires aux champs du serializer.
+
+    Les champs calculés déclarent leurs relations dans Meta.field_relations.
+    """
+    select, prefetch = set(), set()
+    declared = getattr(getattr(serializer, 'Meta', None), 'field_relations', {})
+    for name, field in serializer.fields.items():
+        for lookup in declared.get(name, ()):
+            (prefetch if prefetching else select).add(prefix + lookup)
+        if field.source == '*' or not isinstance(field, serializers.BaseSerializer):
+            continue
+        path = prefix + field.source.replace('.', '__')
+        if isinstance(field, serializers.ListSerializer):
+            prefetch.add(path)
+            child_select, child_prefetch = relation_lookups(field.child, path + '__', True)
+        else:
+            (prefetch if prefetching else select).add(path)
+            child_select, child_prefetch = relation_lookups(field, path + '__', prefetching)
+        select |= child_select
+        prefetch |= child_prefetch
+    return select, prefetch
+
+
+class ExpandableQuerysetMixin:
+    """Quand ?fields= ou ?expand= est donné, ne joint et ne précharge que les relations sérialisées"""
+
+    def get_queryset(self):
+        return self.expand_queryset(super().get_queryset())
+
+    def expand_queryset(self, queryset):
+        """À appeler depuis les get_queryset redéfinis"""
+        if not is_requested(self.request):
+            return queryset
+
+        select, prefetch = relation_lookups(self.get_serializer())
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if select:
+            queryset = queryset.select_related(*sorted(select))
+        return queryset.prefetch_related(*sorted(prefetch))
@@ -0,0 +1,89 @@
+"""
+Comptes par facette (ville, type, chambres, tranche de prix) d'un ensemble filtré.
+
+Une seule requête groupe par combinaison (ville, type, chambres, tranche) :
+le nombre de combinaisons reste petit devant le nombre d'annonces, et chaque
+facette s'obtient ensuite en sommant ces lignes, au lieu d'un GROUP BY par
+facette.
+
+Quand seuls la ville et le type filtrent, le total et les facettes ville et
+type sont lus dans les agrégats tenus à jour (properties.aggregates) ; le
+GROUP BY sur les annonces ne porte plus que sur (chambres, tranche).
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, Value, When
+
+from properties.models import ListingAggregate, Property
+
+MAX_CITIES = 20
+# Filtres de PropertyFilter exprimables sur ListingAggregate
+AGGREGATE_LOOKUPS = {'city': 'city__icontains', 'property_type': 'property_type'}
+
+def price_bucket(bounds):
+    """Index de la tranche : 0 sous bounds[0], len(bounds) au-delà du dernier seuil"""
+    return Case(
+        *[When(price__lt=bound, then=Value(index)) for index, bound in enumerate(bounds)],
+        default=Value(len(bounds)),
+        output_field=IntegerField()
+    )
+
+def aggregate_rows(filters):
+    """Lignes d'agrégats des annonces publiées filtrées, None si un autre filtre que ville et type est actif"""
+    if any(name not in AGGREGATE_LOOKUPS for name in filters):
+        return None
+    rows = ListingAggregate.objects.filter(status='published', count__gt=0)
+    for name, value in filters.items():
+        rows = rows.filter(**{AGGREGATE_LOOKUPS[name]: value})
+    return rows.values_list('city', 'property_type', 'count')
+
+def compute_facets(queryset, bounds=None, aggregates=None):
+    """Facettes de queryset ; aggregates (voir aggregate_rows) fournit ville, type et total"""
+    bounds = bounds if bounds is not None else settings.PROPERTY_PRICE_BUCKETS
+    group_fields = ['bedrooms', 'price_bucket']
+    if aggregates is None:
+        group_fields = ['city', 'property_type'] + group_fields
+    rows = queryset.select_related(None).prefetch_related(None).order_by().annotate(
+        price_bucket=price_bucket(bounds)
+    ).values(*group_fields).annotate(count=Count('pk'))
+
+    total = 0
+    cities, types, bedrooms, prices = Counter(), Counter(), Counter(), Counter()
+    for row in rows:
+        count = row['count']
+        bedrooms[row['bedrooms']] += count
+        prices[row['price_bucket']] += count
+        if aggregates is None:
+            total += count
+            cities[row['city']] += count
+            types[row['property_type']] += count
+    for city, property_type, count in aggregates or ():
+        total += count
+        cities[city] += count
+        types[property_type] += count
+
+    type_labels = dict(Property.PROPERTY_TYPES)
+    edges = [None] + list(bounds) + [None]
+    return {
+        'count': total,
+        'facets': {
+            'city': [
+                {'value': city, 'count': count}
+                for city, count in sorted(cities.items(), key=lambda item: (-item[1], item[0]))[:MAX_CITIES]
+            ],
+            'property_type': [
+                {'value': value, 'label': str(type_labels.get(value, value)), 'count': count}
+                for value, count in sorted(types.items(), key=lambda item: (-item[1], item[0]))
+            ],
+            'bedrooms': [
+                {'value': value, 'count': count}
+                for value, count in sorted(bedrooms.items(), key=lambda item: (item[0] is None, item[0] or 0))
+            ],
+            'price': [
+                {'min': edges[index], 'max': edges[index + 1], 'count': prices[index]}
+                for index in range(len(bounds) + 1)
+                if prices[index]
+            ],
+        },
+    }
@@ -0,0 +1,211 @@
+"""
+Sérialisation rapide des listes de propriétés, sans ModelSerializer.
+
+Les lignes sont lues par .values() sur les seules colonnes affichées (pas
+de description, pas d'instances de modèle), puis converties en dicts par
+une fonction générée une fois à partir des champs de
+PropertyListSerializer : les conversions sont celles des champs DRF
+eux-mêmes, avec ce qui ne dépend pas de la valeur (quantum des Decimal,
+fuseau courant) calculé une fois ; les conversions triviales (texte,
+uuid) sont omises. La sortie est identique à celle du serializer.
+
+Utilisé par FastListMixin pour list et search_by_bbox quand
+API_FAST_LIST_SERIALIZATION est actif et qu'aucun ?fields= / ?expand=
+n'est demandé.
+"""
+import decimal
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from properties.models import PropertyImage
+
+from .expansion import is_requested
+from .pagination import apaginate_page_number
+from .serializers import PropertyListSerializer
+
+# Conversions sans effet sur une valeur déjà du bon type
+IDENTITY_FIELDS = (
+    serializers.CharField, serializers.ChoiceField, serializers.BooleanField, serializers.IntegerField,
+)
+
+
+def _decimal_converter(field):
+    """DecimalField.to_representation avec le quantum et le contexte calculés une fois"""
+    if field.decimal_places is None or field.normalize_output or field.localize \
+            or not getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING):
+        return field.to_representation
+    quantum = decimal.Decimal('.1') ** field.decimal_places
+    rounding = field.rounding
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return f'{value.quantize(quantum, rounding=rounding, context=context):f}'
+    return convert
+
+
+def _datetime_converter(field):
+    """DateTimeField.to_representation au format ISO 8601, le fuseau courant étant lu une fois par lot"""
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if hasattr(field, 'timezone') or not settings.USE_TZ \
+            or not isinstance(output_format, str) or output_format.lower() != ISO_8601:
+        return None
+
+    def convert(value, tz):
+        if isinstance(value, str) or timezone.is_naive(value):
+            return field.to_representation(value)
+        value = value.astimezone(tz).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+def _expression(name, field, column, namespace):
+    """Expression Python du champ sur la ligne row"""
+    value = f'row[{column!r}]'
+    if isinstance(field, IDENTITY_FIELDS) and not isinstance(field, serializers.MultipleChoiceField):
+        return value
+    if isinstance(field, serializers.DateTimeField) and (convert := _datetime_converter(field)):
+        call = f'convert_{name}(value, tz)'
+    else:
+        if isinstance(field, serializers.UUIDField) and field.uuid_format == 'hex_verbose':
+            convert = str
+        elif isinstance(field, serializers.DecimalField):
+            convert = _decimal_converter(field)
+        else:
+            convert = field.to_representation
+        call = f'convert_{name}(value)'
+    namespace[f'convert_{name}'] = convert
+    # Le serializer rend None sans appeler to_representation
+    return f'None if (value := {value}) is None else {call}'
+
+
+def _file_url(storage, column):
+    """URL du fichier, None sans fichier (FieldFile vide ou pas d'image jointe)"""
+    def url(row):
+        name = row[column]
+        return storage.url(name) if name else None
+    return url
+
+
+class PropertyRows:
+    """
+    Convertisseur ligne .values() -> dict de PropertyListSerializer.
+
+    La fonction de conversion est générée une fois (un littéral de dict par
+    ligne, sans boucle sur les champs). Les champs calculés
+    (SerializerMethodField) ont ici leur équivalent sur la ligne ; un champ
+    sans équivalent lève ValueError à la compilation, pour ne jamais
+    diverger silencieusement du serializer.
+    """
+    serializer_class = PropertyListSerializer
+    # Champ calculé -> (colonnes lues, expression sur la ligne)
+    computed_fields = {
+        'primary_image': (['primary_image__image'], 'image_url(row)'),
+        'primary_thumbnail': (['primary_image__thumbnail'], 'thumbnail_url(row)'),
+        'is_favorited': (['id'], "row['id'] in favorite_ids"),
+    }
+
+    def __init__(self):
+        namespace = {
+            'image_url': _file_url(PropertyImage._meta.get_field('image').storage, 'primary_image__image'),
+            'thumbnail_url': _file_url(PropertyImage._meta.get_field('thumbnail').storage, 'primary_image__thumbnail'),
+        }
+        columns, items = [], []
+        for name, field in self.serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                if name not in self.computed_fields:
+                    raise ValueError(f'No fast path for computed field {name!r}')
+                field_columns, expression = self.computed_fields[name]
+                columns.extend(field_columns)
+            elif isinstance(field, (serializers.BaseSerializer, serializers.ModelField)) \
+                    or field.source == '*' or '.' in field.source:
+                raise ValueError(f'No fast path for field {name!r}')
+            else:
+                columns.append(field.source)
+                expression = _expression(name, field, field.source, namespace)
+            items.append(f'{name!r}: {expression}')
+
+        source = 'def convert(row, favorite_ids, tz):\n    return {' + ', '.join(items) + '}\n'
+        exec(compile(source, f'<{type(self).__name__}>', 'exec'), namespace)
+        self.convert_row = namespace['convert']
+        self.columns = list(dict.fromkeys(columns))
+
+    def queryset(self, queryset):
+        """Projection des colonnes utiles (une seule jointure, vers l'image principale)"""
+        return queryset.select_related(None).prefetch_related(None).values(*self.columns)
+
+    def convert(self, rows, favorite_ids):
+        convert_row = self.convert_row
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        return [convert_row(row, favorite_ids, tz) for row in rows]
+
+
+_property_rows = None
+
+
+def property_rows():
+    global _property_rows
+    if _property_rows is None:
+        _property_rows = PropertyRows()
+    return _property_rows
+
+
+class FastListMixin:
+    """
+    list (et search_by_bbox, via fast_response) servis par PropertyRows.
+
+    À placer après CachedListMixin : le cache stocke alors les dicts du
+    chemin rapide, identiques à ceux du serializer. La vue fournit
+    favorite_ids(property_ids) (et afavorite_ids pour afast_data).
+    """
+
+    def use_fast_path(self):
+        return settings.API_FAST_LIST_SERIALIZATION and not is_requested(self.request)
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_path():
+            return super().list(request, *args, **kwargs)
+        return self.fast_response(self.filter_queryset(self.get_queryset()), paginate=True)
+
+    def fast_response(self, queryset, paginate):
+        rows = property_rows()
+        values = rows.queryset(queryset)
+        page = self.paginate_queryset(values) if paginate else None
+        if page is not None:
+            return self.get_paginated_response(self.fast_data(rows, page))
+        return Response(self.fast_data(rows, list(values)))
+
+    def fast_data(self, rows, page):
+        favorite_ids = self.favorite_ids([row['id'] for row in page])
+        return rows.convert(page, favorite_ids)
+
+    async def afast_data(self, queryset, paginate):
+        """Données de fast_response pour les vues asynchrones (la vue fournit afavorite_ids).
+
+        None quand la pagination demandée n'a pas de version asynchrone.
+        """
+        rows = property_rows()
+        values = rows.queryset(queryset)
+        if paginate:
+            if hasattr(self.paginator, 'apaginate_queryset'):
+                page = await self.paginator.apaginate_queryset(values, self.request, view=self)
+            elif isinstance(self.paginator, PageNumberPagination):
+                page = await apaginate_page_number(self.paginator, values, self.request)
+            else:
+                return None
+            if page is None:
+                return None
+        else:
+            page = [row async for row in values]
+        data = rows.convert(page, await self.afavorite_ids([row['id'] for row in page]))
+        return self.get_paginated_response(data).data if paginate else data
@@ -1,4 +1,6 @@
 import django_filters
+from rest_framework.filters import BaseFilterBackend
+from properties import search
 from properties.models import Property
 
 class PropertyFilter(django_filters.FilterSet):
@@ -13,4 +15,16 @@ class PropertyFilter(django_filters.FilterSet):
     
     class Meta:
         model = Property
-        fields = ['property_type', 'city', 'neighborhood']
\ No newline at end of file
+        fields = ['property_type', 'city', 'neighborhood']
+
+class PropertySearchFilter(BaseFilterBackend):
+    """?search= servi par l'index inversé de properties.search, résultats triés par pertinence"""
+    search_param = 'search'
+    
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        
+        ranked = search.rank(query, queryset)
+        return queryset if ranked is None else ranked
@@ -0,0 +1,61 @@
+"""
+Formats compacts des marqueurs de carte : uniquement id, latitude, longitude,
+prix et code de type. Le détail d'une propriété est chargé au clic via
+/api/properties/<id>/.
+
+- 'columns' : JSON en colonnes, une liste par champ.
+- 'binary'  : enregistrements binaires de taille fixe (little-endian), précédés
+  d'un en-tête MAGIC + nombre d'enregistrements (uint32) :
+  uuid (16 octets), latitude (float32), longitude (float32), prix (float64),
+  code de type (uint8, index dans TYPE_NAMES, 255 si inconnu).
+"""
+import struct
+
+from properties.models import Property
+
+MARKER_FIELDS = ('id', 'latitude', 'longitude', 'price', 'property_type')
+TYPE_NAMES = [value for value, _ in Property.PROPERTY_TYPES]
+TYPE_CODES = {value: code for code, value in enumerate(TYPE_NAMES)}
+UNKNOWN_TYPE = 255
+
+MAGIC = b'AMK1'
+HEADER = struct.Struct('<4sI')
+RECORD = struct.Struct('<16sffdB')
+
+FORMATS = ('columns', 'binary')
+
+def marker_rows(queryset):
+    """Projection minimale : ni jointures ni préchargements, tuples au lieu d'objets"""
+    return queryset.select_related(None).prefetch_related(None).order_by().values_list(*MARKER_FIELDS)
+
+def to_columns(rows):
+    ids, latitudes, longitudes, prices, types = [], [], [], [], []
+    for property_id, latitude, longitude, price, property_type in rows:
+        ids.append(str(property_id))
+        latitudes.append(round(float(latitude), 6))
+        longitudes.append(round(float(longitude), 6))
+        prices.append(float(price))
+        types.append(TYPE_CODES.get(property_type, UNKNOWN_TYPE))
+    return {
+        'count': len(ids),
+        'types': TYPE_NAMES,
+        'id': ids,
+        'lat': latitudes,
+        'lng': longitudes,
+        'price': prices,
+        'type': types,
+    }
+
+def to_binary(rows):
+    pack = RECORD.pack
+    records = [
+        pack(
+            property_id.bytes,
+            float(latitude),
+            float(longitude),
+            float(price),
+            TYPE_CODES.get(property_type, UNKNOWN_TYPE)
+        )
+        for property_id, latitude, longitude, price, property_type in rows
+    ]
+    return HEADER.pack(MAGIC, len(records)) + b''.join(records)
@@ -0,0 +1,212 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pagination par curseur (keyset) : chaque page filtre sur la clé
+    (champ de tri, id) de la dernière ligne vue au lieu d'un OFFSET, et
+    n'exécute pas de COUNT(*). La page N coûte autant que la page 1,
+    à condition qu'un index couvre (champ de tri, id).
+
+    Le curseur est opaque (JSON encodé en base64) et porte le tri utilisé.
+    """
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering_query_param = 'ordering'
+    invalid_cursor_message = _('Invalid cursor')
+
+    # Tri demandé -> clé de pagination (le dernier champ doit être unique)
+    orderings = {}
+    default_ordering = None
+
+    @classmethod
+    def is_requested(cls, request):
+        """Pour les endpoints non paginés par défaut : pagination à la demande"""
+        params = request.query_params
+        return cls.cursor_query_param in params or cls.page_size_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.page_rows(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset pour les vues asynchrones (api.async_views)"""
+        return self.page_rows([row async for row in self.page_queryset(queryset, request)])
+
+    def page_queryset(self, queryset, request):
+        """Lignes de la page demandée, plus une pour savoir s'il y a une suite"""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+
+        if cursor:
+            self.ordering, self.position, self.reverse = cursor
+        else:
+            self.ordering = request.query_params.get(self.ordering_query_param)
+            if self.ordering not in self.orderings:
+                self.ordering = self.default_ordering
+            self.position, self.reverse = None, False
+
+        fields = self.orderings[self.ordering]
+        if self.position is not None:
+            queryset = queryset.filter(self.position_filter(fields, self.position, self.reverse))
+        order_by = [self.invert(field) for field in fields] if self.reverse else list(fields)
+        return queryset.order_by(*order_by)[:self.page_size + 1]
+
+    def page_rows(self, rows):
+        fields, position = self.orderings[self.ordering], self.position
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+
+        # Reculer depuis un curseur implique qu'une page suivante existe
+        has_next = has_more if not self.reverse else position is not None
+        has_previous = position is not None if not self.reverse else has_more
+        self.next_position = self.position_of(rows[-1], fields) if rows and has_next else None
+        self.previous_position = self.position_of(rows[0], fields) if rows and has_previous else None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.build_link(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.build_link(self.previous_position, reverse=True)
+
+    def build_link(self, position, reverse):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'page')
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(position, reverse))
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({'o': self.ordering, 'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            ordering, position, reverse = payload['o'], payload['p'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError, binascii.Error, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if ordering not in self.orderings or not isinstance(position, list) \
+                or len(position) != len(self.orderings[ordering]):
+            raise NotFound(self.invalid_cursor_message)
+        return ordering, position, reverse
+
+    def position_filter(self, fields, position, reverse):
+        """Lignes strictement après la position : (a > x) OU (a = x ET b > y) ..."""
+        condition = Q()
+        equal = {}
+        for field, value in zip(fields, position):
+            descending = field.startswith('-')
+            name = field.lstrip('-')
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def position_of(self, row, fields):
+        """Position d'une instance ou d'une ligne .values()"""
+        position = []
+        for field in fields:
+            name = field.lstrip('-')
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            position.append(value.isoformat() if hasattr(value, 'isoformat') else str(value))
+        return position
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+
+class PropertyKeysetPagination(KeysetPagination):
+    orderings = {
+        '-created_at': ('-created_at', '-id'),
+        'created_at': ('created_at', 'id'),
+        '-price': ('-price', '-id'),
+        'price': ('price', 'id'),
+    }
+    default_ordering = '-created_at'
+
+
+class DistancePagination(PageNumberPagination):
+    """Pages numérotées d'une liste déjà triée (propriétés d'un rayon, par distance)"""
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    @classmethod
+    def is_requested(cls, request):
+        params = request.query_params
+        return cls.page_query_param in params or cls.page_size_query_param in params
+
+
+async def apaginate_page_number(paginator, queryset, request):
+    """PageNumberPagination.paginate_queryset pour les vues asynchrones : COUNT et page par l'ORM asynchrone"""
+    paginator.request = request
+    page_size = paginator.get_page_size(request)
+    if not page_size:
+        return None
+
+    django_paginator = paginator.django_paginator_class(queryset, page_size)
+    # count est une cached_property : le COUNT asynchrone en tient lieu
+    django_paginator.count = await queryset.acount()
+    page_number = paginator.get_page_number(request, django_paginator)
+    try:
+        number = django_paginator.validate_number(page_number)
+    except InvalidPage as exc:
+        raise NotFound(paginator.invalid_page_message.format(page_number=page_number, message=str(exc)))
+
+    bottom = (number - 1) * page_size
+    top = bottom + page_size
+    if top + django_paginator.orphans >= django_paginator.count:
+        top = django_paginator.count
+    objects = [obj async for obj in queryset[bottom:top]]
+    paginator.page = django_paginator._get_page(objects, number, django_paginator)
+    if django_paginator.num_pages > 1 and paginator.template is not None:
+        paginator.display_page_controls = True
+    return objects
@@ -0,0 +1,70 @@
+import csv
+import io
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from . import export
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encodé par orjson quand il est installé.
+
+    La sortie est celle de JSONRenderer au caractère près (JSON compact, non
+    ASCII, \\u2028 et \\u2029 échappés) : les types qu'orjson ne traite pas
+    à l'identique (dates, Decimal, textes traduits) passent par l'encodeur
+    de DRF. L'indentation, les sorties ASCII ou espacées et les données
+    refusées par orjson retombent sur le rendu de DRF.
+    """
+    options = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact \
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Négociation de ?format=ndjson pour les exports (api.export) : les données
+    sont écrites en flux par la vue, ce rendu ne sert qu'aux réponses
+    d'erreur, un objet par ligne.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        records = data if isinstance(data, list) else [data]
+        return ''.join(export.ndjson_line(record) for record in records).encode()
+
+
+class CSVRenderer(BaseRenderer):
+    """Négociation de ?format=csv pour les exports ; rend les réponses d'erreur en une ligne"""
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        records = data if isinstance(data, list) else [data]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if records and isinstance(records[0], dict):
+            writer.writerow(list(records[0]))
+            writer.writerows([[str(value) for value in record.values()] for record in records])
+        else:
+            writer.writerows([[str(record)] for record in records])
+        return buffer.getvalue().encode()
@@ -1,19 +1,22 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
 from properties.models import Property, PropertyImage, Favorite
-from partners.models import Partner, Contract
+from partners.feeds import detect_format
+from partners.models import Partner, Contract, FeedImport
 from accounts.models import Profile
 from alerts.models import PropertyAlert
+from .expansion import ExpandableFieldsMixin
 
 User = get_user_model()
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Profile
         fields = ['photo', 'phone_number', 'preferred_language', 'ui_theme', 'bio']
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     profile = ProfileSerializer(read_only=True)
     
     class Meta:
@@ -21,12 +24,41 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'email', 'first_name', 'last_name', 'is_partner', 'date_joined', 'profile']
         read_only_fields = ['id', 'date_joined']
 
-class PropertyImageSerializer(serializers.ModelSerializer):
+class PropertyImageSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    renditions = serializers.SerializerMethodField()
+    
     class Meta:
         model = PropertyImage
-        fields = ['id', 'image', 'is_primary']
+        fields = ['id', 'image', 'is_primary', 'renditions']
+    
+    def get_renditions(self, obj):
+        """URL des rendus WebP par largeur (voir properties.views.image_rendition)"""
+        request = self.context.get('request')
+        urls = {}
+        for width in settings.PROPERTY_IMAGE_RENDITION_WIDTHS:
+            url = obj.get_rendition_url(width)
+            urls[str(width)] = request.build_absolute_uri(url) if request else url
+        return urls
+
+class FavoriteStatusMixin:
+    """Champ is_favorited commun aux serializers de propriétés.
+
+    Les vues placent dans le contexte 'favorite_ids', l'ensemble des propriétés
+    favorites de l'utilisateur parmi celles sérialisées (une seule requête) ;
+    à défaut, une requête est faite par propriété.
+    """
 
-class PropertySerializer(serializers.ModelSerializer):
+    def get_is_favorited(self, obj):
+        """Vérifie si la propriété est dans les favoris de l'utilisateur."""
+        favorite_ids = self.context.get('favorite_ids')
+        if favorite_ids is not None:
+            return obj.id in favorite_ids
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            return Favorite.objects.filter(user=request.user, property=obj).exists()
+        return False
+
+class PropertySerializer(ExpandableFieldsMixin, FavoriteStatusMixin, serializers.ModelSerializer):
     images = PropertyImageSerializer(many=True, read_only=True)
     owner = UserSerializer(read_only=True)
     is_favorited = serializers.SerializerMethodField()
@@ -41,16 +73,35 @@ class PropertySerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'slug', 'owner', 'created_at', 'updated_at']
 
-    def get_is_favorited(self, obj):
-        """Vérifie si la propriété est dans les favoris de l'utilisateur."""
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return Favorite.objects.filter(user=user, property=obj).exists()
-        return False
+class PartnerPropertySerializer(PropertySerializer):
+    """Propriété vue par son propriétaire : références de synchronisation du partenaire en plus"""
+    
+    class Meta(PropertySerializer.Meta):
+        fields = PropertySerializer.Meta.fields + ['partner_reference', 'partner_content_hash']
+
+    def validate_partner_reference(self, value):
+        """Vérifie que le propriétaire n'a pas déjà une autre annonce sous cette référence.
+
+        Les lots (api.bulk) placent dans le contexte 'owner_references', les
+        références déjà connues du propriétaire, pour ne pas interroger la base
+        à chaque élément.
+        """
+        if not value or (self.instance is not None and self.instance.partner_reference == value):
+            return value
+        known = self.context.get('owner_references')
+        if known is not None:
+            duplicate = value in known
+        else:
+            owner = self.instance.owner if self.instance is not None else self.context['request'].user
+            duplicate = Property.objects.filter(owner=owner, partner_reference=value).exists()
+        if duplicate:
+            raise serializers.ValidationError(_('You already have a listing with this reference.'))
+        return value
 
-class PropertyListSerializer(serializers.ModelSerializer):
+class PropertyListSerializer(ExpandableFieldsMixin, FavoriteStatusMixin, serializers.ModelSerializer):
     """Serializer léger pour les listes"""
     primary_image = serializers.SerializerMethodField()
+    primary_thumbnail = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     
     class Meta:
@@ -58,24 +109,24 @@ class PropertyListSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'slug', 'property_type', 'price', 'currency',
             'city', 'neighborhood', 'latitude', 'longitude', 'primary_image',
-            'is_favorited', 'created_at'
+            'primary_thumbnail', 'is_favorited', 'created_at'
         ]
+        # Relations lues par les champs calculés (voir api.expansion)
+        field_relations = {
+            'primary_image': ['primary_image'],
+            'primary_thumbnail': ['primary_image'],
+        }
     
     def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
-        if primary_image:
-            return primary_image.image.url
-        first_image = obj.images.first()
-        return first_image.image.url if first_image else None
+        """Image principale dénormalisée (charger avec select_related('primary_image'))"""
+        return obj.primary_image.image.url if obj.primary_image else None
     
-    def get_is_favorited(self, obj):
-        """Vérifie si la propriété est dans les favoris de l'utilisateur."""
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return Favorite.objects.filter(user=user, property=obj).exists()
-        return False
+    def get_primary_thumbnail(self, obj):
+        if obj.primary_image and obj.primary_image.thumbnail:
+            return obj.primary_image.thumbnail.url
+        return None
 
-class FavoriteSerializer(serializers.ModelSerializer):
+class FavoriteSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     property = PropertyListSerializer(read_only=True)
     property_id = serializers.UUIDField(write_only=True)
     
@@ -106,7 +157,7 @@ class FavoriteSerializer(serializers.ModelSerializer):
         property = Property.objects.get(id=property_id)
         return Favorite.objects.create(user=self.context['request'].user, property=property)
 
-class PropertyAlertSerializer(serializers.ModelSerializer):
+class PropertyAlertSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = PropertyAlert
         fields = [
@@ -139,7 +190,7 @@ class PropertyAlertSerializer(serializers.ModelSerializer):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
-class PartnerSerializer(serializers.ModelSerializer):
+class PartnerSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     
     class Meta:
@@ -147,7 +198,7 @@ class PartnerSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'company_name', 'address', 'contact_email', 'contact_phone', 'created_at']
         read_only_fields = ['id', 'created_at']
 
-class ContractSerializer(serializers.ModelSerializer):
+class ContractSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     partner = PartnerSerializer(read_only=True)
     is_active = serializers.ReadOnlyField()
     
@@ -157,4 +208,28 @@ class ContractSerializer(serializers.ModelSerializer):
             'id', 'partner', 'start_date', 'end_date', 'status', 
             'max_publications', 'is_active', 'created_at'
         ]
-        read_only_fields = ['id', 'created_at']
\ No newline at end of file
+        read_only_fields = ['id', 'created_at']
+
+class FeedImportSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    progress = serializers.ReadOnlyField()
+    
+    class Meta:
+        model = FeedImport
+        fields = [
+            'id', 'file', 'format', 'status', 'progress', 'bytes_total', 'bytes_processed',
+            'rows_processed', 'rows_created', 'rows_updated', 'rows_failed', 'rows_per_second',
+            'errors', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = [
+            'id', 'status', 'bytes_total', 'bytes_processed', 'rows_processed', 'rows_created',
+            'rows_updated', 'rows_failed', 'rows_per_second', 'errors', 'created_at', 'started_at', 'finished_at'
+        ]
+        extra_kwargs = {'file': {'write_only': True}, 'format': {'required': False}}
+
+    def validate(self, data):
+        """Format déduit de l'extension du fichier s'il n'est pas donné."""
+        if not data.get('format'):
+            data['format'] = detect_format(data['file'].name)
+            if data['format'] is None:
+                raise serializers.ValidationError({'format': _('Unknown feed format, use csv or xml.')})
+        return data
@@ -0,0 +1,70 @@
+"""
+Synchronisation différentielle de l'inventaire d'un partenaire.
+
+1. Le partenaire envoie son manifeste : [{"reference": ..., "hash": ...}],
+   le hash étant calculé par lui sur le contenu de chaque annonce.
+2. Le serveur le compare aux (partner_reference, partner_content_hash)
+   enregistrés, lus en une requête, par différences d'ensembles : à
+   envoyer les références nouvelles ou dont le hash a changé, à supprimer
+   celles que le manifeste ne contient plus.
+3. Le partenaire envoie seulement ces annonces (avec leur
+   partner_content_hash) et ces suppressions, appliquées en une
+   transaction.
+
+Le volume échangé et écrit ne dépend que du nombre de changements.
+"""
+from django.db import transaction
+
+from partners.listings import write_listings
+from properties.models import Property
+
+from .bulk import validate_items
+
+class ManifestError(ValueError):
+    pass
+
+def parse_manifest(data):
+    """{référence: hash} du manifeste, ManifestError s'il est mal formé"""
+    entries = data.get('listings') if isinstance(data, dict) else None
+    if not isinstance(entries, list):
+        raise ManifestError('Expected {"listings": [{"reference": ..., "hash": ...}]}')
+    manifest = {}
+    for entry in entries:
+        reference = entry.get('reference') if isinstance(entry, dict) else None
+        content_hash = entry.get('hash') if isinstance(entry, dict) else None
+        if not isinstance(reference, str) or not reference or not isinstance(content_hash, str) or not content_hash:
+            raise ManifestError('Each listing needs a non-empty reference and hash')
+        if reference in manifest:
+            raise ManifestError(f'Duplicate reference {reference}')
+        manifest[reference] = content_hash
+    return manifest
+
+def diff_manifest(owner, manifest):
+    """Références à envoyer et à supprimer pour aligner le serveur sur le manifeste"""
+    stored = dict(
+        Property.objects.filter(owner=owner).exclude(partner_reference='').values_list(
+            'partner_reference', 'partner_content_hash'
+        )
+    )
+    upload = manifest.items() - stored.items()
+    delete = stored.keys() - manifest.keys()
+    return {
+        'upload': sorted(reference for reference, _hash in upload),
+        'delete': sorted(delete),
+        'unchanged': len(manifest) - len(upload),
+    }
+
+def apply_changes(owner, upserts, deletions, context):
+    """(résultats de validation, écrites, nombre supprimé) ; rien n'est écrit si une annonce est invalide"""
+    results, valid = validate_items(upserts, owner, context, require_reference=True) if upserts else ([], [])
+    if valid is None:
+        return results, None, 0
+    with transaction.atomic():
+        # Supprimer d'abord libère le quota de publications pour les annonces envoyées
+        deleted = 0
+        if deletions:
+            deleted = Property.objects.filter(owner=owner, partner_reference__in=deletions).exclude(
+                partner_reference=''
+            ).delete()[1].get(Property._meta.label, 0)
+        written = write_listings(valid, owner) if valid else []
+    return results, written, deleted
@@ -0,0 +1,248 @@
+"""
+Limitation de débit par seau à jetons (token bucket), dans Redis.
+
+Chaque identité (IP anonyme, utilisateur, partenaire) a un seau de
+`capacité` jetons qui se remplit au rythme du taux de
+DEFAULT_THROTTLE_RATES ('120/min' : 120 jetons, 2 par seconde). Une
+requête prend un jeton ; sans jeton, elle reçoit un 429 avec Retry-After
+(temps avant le prochain jeton). Le remplissage et la prise se font
+dans un script Lua, atomique, en un aller-retour par requête (EVALSHA).
+
+Sans Redis (autre backend de cache, serveur injoignable), les seaux sont
+gardés en mémoire du processus : la limite vaut alors par processus.
+Après une erreur de connexion, Redis n'est réessayé qu'au bout de
+REDIS_RETRY_SECONDS, pour ne pas payer un délai de connexion par requête.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from properties import async_cache
+
+try:
+    from django_redis.cache import RedisCache
+    from django_redis.exceptions import ConnectionInterrupted
+    from redis.exceptions import ConnectionError as RedisConnectionError, NoScriptError, TimeoutError as RedisTimeoutError
+    REDIS_ERRORS = (ConnectionInterrupted, RedisConnectionError, RedisTimeoutError)
+except ImportError:
+    RedisCache = None
+    REDIS_ERRORS = ()
+
+logger = logging.getLogger(__name__)
+
+REDIS_RETRY_SECONDS = 5
+
+# KEYS[1] : seau ; ARGV : capacité, jetons par seconde.
+# Rend {1, 0} si un jeton est pris, {0, millisecondes avant le prochain jeton} sinon.
+# L'heure est celle de Redis (TIME) : les horloges des serveurs d'application n'interviennent pas.
+TOKEN_BUCKET_SCRIPT = """
+-- TIME avant une écriture : réplication des effets (par défaut depuis Redis 5)
+redis.replicate_commands()
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local last = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - last) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) / rate * 1000)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+if wait > 0 then
+    return {0, wait}
+end
+return {1, 0}
+"""
+TOKEN_BUCKET_SHA = hashlib.sha1(TOKEN_BUCKET_SCRIPT.encode()).hexdigest()
+
+
+class LocalBuckets:
+    """Seaux en mémoire du processus, pour le repli sans Redis"""
+    max_buckets = 10000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}
+
+    def take(self, key, capacity, rate):
+        now = time.monotonic()
+        with self.lock:
+            tokens, last = self.buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + max(0.0, now - last) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self.buckets[key] = (tokens, now)
+            if len(self.buckets) > self.max_buckets:
+                self.prune(now, capacity, rate)
+        return wait
+
+    def prune(self, now, capacity, rate):
+        # Un seau redevenu plein n'a plus rien à retenir
+        for key, (tokens, last) in list(self.buckets.items()):
+            if tokens + (now - last) * rate >= capacity:
+                del self.buckets[key]
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+
+local_buckets = LocalBuckets()
+_redis_retry_at = 0.0
+
+
+def _redis_backend():
+    """Backend django_redis du cache, None avec un autre backend ou après une erreur récente"""
+    backend = caches['default']
+    if RedisCache is None or not isinstance(backend, RedisCache) or time.monotonic() < _redis_retry_at:
+        return None
+    return backend
+
+
+def _redis_failed(exc):
+    global _redis_retry_at
+    _redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+    logger.warning('Redis unavailable for throttling, using local buckets: %s', exc)
+
+
+def _wait(result):
+    allowed, wait_ms = result
+    return 0.0 if int(allowed) else int(wait_ms) / 1000
+
+
+def take(key, capacity, rate):
+    """Prend un jeton : 0 si la requête passe, sinon secondes avant le prochain jeton"""
+    backend = _redis_backend()
+    if backend is not None:
+        redis_key = backend.make_key(key)
+        try:
+            client = backend.client.get_client(write=True)
+            try:
+                return _wait(client.evalsha(TOKEN_BUCKET_SHA, 1, redis_key, capacity, rate))
+            except NoScriptError:
+                return _wait(client.eval(TOKEN_BUCKET_SCRIPT, 1, redis_key, capacity, rate))
+        except REDIS_ERRORS as exc:
+            _redis_failed(exc)
+    return local_buckets.take(key, capacity, rate)
+
+
+async def atake(key, capacity, rate):
+    """take() pour les vues asynchrones (client redis.asyncio)"""
+    backend = _redis_backend()
+    if backend is not None:
+        redis_key = backend.make_key(key)
+        try:
+            client = async_cache.redis_client()
+            try:
+                return _wait(await client.evalsha(TOKEN_BUCKET_SHA, 1, redis_key, capacity, rate))
+            except NoScriptError:
+                return _wait(await client.eval(TOKEN_BUCKET_SCRIPT, 1, redis_key, capacity, rate))
+        except REDIS_ERRORS as exc:
+            _redis_failed(exc)
+    return local_buckets.take(key, capacity, rate)
+
+
+def is_partner(user):
+    # Comme IsPartnerOrAdmin
+    return user.is_staff or user.is_partner
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Throttle DRF sur un seau à jetons de la portée `scope`.
+
+    Le taux de DEFAULT_THROTTLE_RATES donne la capacité du seau et son
+    remplissage ; get_cache_key rend None pour les requêtes hors de la
+    portée (elles ne coûtent alors aucun aller-retour).
+    """
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    @property
+    def THROTTLE_RATES(self):
+        # Lu à chaque instanciation : suit les modifications de REST_FRAMEWORK
+        return api_settings.DEFAULT_THROTTLE_RATES
+
+    def bucket(self, request, view):
+        """(clé, capacité, jetons par seconde), None hors de la portée ou si la requête a déjà payé son jeton"""
+        if self.rate is None:
+            return None
+        key = self.get_cache_key(request, view)
+        if key is None or key in getattr(request._request, 'charged_buckets', ()):
+            return None
+        return key, self.num_requests, self.num_requests / self.duration
+
+    def allow_request(self, request, view):
+        bucket = self.bucket(request, view)
+        self.wait_seconds = take(*bucket) if bucket else 0.0
+        return self.wait_seconds == 0
+
+    async def aallow_request(self, request, view):
+        bucket = self.bucket(request, view)
+        self.wait_seconds = await atake(*bucket) if bucket else 0.0
+        if bucket and self.wait_seconds == 0:
+            # Une vue asynchrone peut confier la requête au viewset : il ne reprend pas de jeton
+            http_request = request._request
+            http_request.charged_buckets = getattr(http_request, 'charged_buckets', frozenset()) | {bucket[0]}
+        return self.wait_seconds == 0
+
+    def wait(self):
+        # Retry-After entier : arrondi au-dessus, pour ne pas revenir trop tôt
+        return math.ceil(self.wait_seconds)
+
+    def ident_key(self, ident):
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class AnonBucketThrottle(TokenBucketThrottle):
+    """Visiteurs anonymes, par adresse IP"""
+    scope = 'anon'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.ident_key(self.get_ident(request))
+
+
+class UserBucketThrottle(TokenBucketThrottle):
+    """Utilisateurs connectés, hors partenaires"""
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        if not (request.user and request.user.is_authenticated) or is_partner(request.user):
+            return None
+        return self.ident_key(request.user.pk)
+
+
+class PartnerBucketThrottle(TokenBucketThrottle):
+    """Partenaires et administrateurs (intégrations), par utilisateur"""
+    scope = 'partner'
+
+    def get_cache_key(self, request, view):
+        if not (request.user and request.user.is_authenticated) or not is_partner(request.user):
+            return None
+        return self.ident_key(request.user.pk)
+
+
+class BulkBucketThrottle(TokenBucketThrottle):
+    """Écritures et exports en masse, par utilisateur (remplace les portées par défaut sur ces actions)"""
+    scope = 'bulk'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return self.ident_key(request.user.pk)
+        return self.ident_key(self.get_ident(request))
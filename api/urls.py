@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import (
@@ -6,7 +7,7 @@ from rest_framework_simplejwt.views import (
 )
 from .views import (
     UserViewSet, PropertyViewSet, FavoriteViewSet, 
-    AlertViewSet, PartnerViewSet, ContractViewSet,
+    AlertViewSet, PartnerViewSet, ContractViewSet, FeedImportViewSet,
     DashboardStatsView, ScrapingControlView
 )
 
@@ -17,6 +18,7 @@ router.register(r'favorites', FavoriteViewSet, basename='favorite')
 router.register(r'alerts', AlertViewSet, basename='alert')
 router.register(r'partners', PartnerViewSet, basename='partner')
 router.register(r'contracts', ContractViewSet, basename='contract')
+router.register(r'feeds', FeedImportViewSet, basename='feed')
 
 urlpatterns = [
     # Authentication
@@ -31,4 +33,9 @@ urlpatterns = [
     
     # Scraping control
     path('scraper/run/', ScrapingControlView.as_view(), name='scraper_run'),
-]
\ No newline at end of file
+]
+
+if settings.API_ASYNC_READ_VIEWS:
+    # Sous ASGI : lectures asynchrones devant les routes du router
+    from .async_views import urlpatterns_for
+    urlpatterns = urlpatterns_for(router) + urlpatterns
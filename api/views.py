@@ -1,29 +1,76 @@
-from rest_framework import viewsets, status, permissions
+from rest_framework import mixins, viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Q
-from django.utils import timezone
-from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, Max, Min, Q
+from django.db.models.functions import Substr
+from django.http import HttpResponse
 from django.utils.translation import gettext_lazy as _
 
-from properties.models import Property, Favorite
+from partners.listings import write_listings
+from partners.quotas import PublicationQuotaExceeded, publication_quota
+from properties import aggregates as listing_aggregates
+from properties import changelog, geo, response_cache
+from properties.models import ListingAggregate, Property, Favorite
 from alerts.models import PropertyAlert
-from partners.models import Partner, Contract
+from dashboard import counters
+from partners.models import Partner, Contract, FeedImport
+from partners.tasks import import_partner_feed
 from scraping.models import ScrapingSource
 from scraping.tasks import scrape_source
 
 from .serializers import (
-    UserSerializer, PropertySerializer, PropertyListSerializer,
-    FavoriteSerializer, PropertyAlertSerializer, PartnerSerializer, ContractSerializer
+    UserSerializer, PropertySerializer, PartnerPropertySerializer, PropertyListSerializer,
+    FavoriteSerializer, PropertyAlertSerializer, PartnerSerializer, ContractSerializer,
+    FeedImportSerializer
 )
-from .filters import PropertyFilter
+from . import bulk as bulk_writes
+from . import export as export_formats
+from . import facets as facet_counts
+from . import sync as delta_sync
+from . import markers as marker_formats
+from .caching import CachedListMixin
+from .conditional import ConditionalGetMixin
+from .expansion import ExpandableQuerysetMixin
+from .fastpath import FastListMixin
+from .filters import PropertyFilter, PropertySearchFilter
+from .pagination import DistancePagination, PropertyKeysetPagination
 from .permissions import IsOwnerOrReadOnly, IsPartnerOrAdmin
+from .renderers import CSVRenderer, FastJSONRenderer, NDJSONRenderer
+from .throttling import BulkBucketThrottle
 
 User = get_user_model()
 
+def favorite_ids_for(user, property_ids):
+    """Ids des propriétés favorites de l'utilisateur parmi les ids donnés, en une requête"""
+    if not user.is_authenticated:
+        return set()
+    property_ids = list(property_ids)
+    if not property_ids:
+        return set()
+    return set(
+        Favorite.objects.filter(user=user, property_id__in=property_ids).values_list('property_id', flat=True)
+    )
+
+async def afavorite_ids_for(user, property_ids):
+    """favorite_ids_for pour les vues asynchrones"""
+    if not user.is_authenticated:
+        return set()
+    property_ids = list(property_ids)
+    if not property_ids:
+        return set()
+    return {
+        property_id async for property_id in
+        Favorite.objects.filter(user=user, property_id__in=property_ids).values_list('property_id', flat=True)
+    }
+
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
@@ -42,39 +89,88 @@ class UserViewSet(viewsets.ModelViewSet):
                 return Response(serializer.data)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class PropertyViewSet(viewsets.ModelViewSet):
-    queryset = Property.objects.filter(status='published').select_related('owner').prefetch_related('images')
+class PropertyViewSet(ConditionalGetMixin, CachedListMixin, FastListMixin, ExpandableQuerysetMixin, viewsets.ModelViewSet):
+    queryset = Property.objects.filter(status='published').select_related('owner', 'primary_image').prefetch_related('images')
     serializer_class = PropertySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
-    filter_backends = [DjangoFilterBackend]
+    filter_backends = [DjangoFilterBackend, PropertySearchFilter]
     filterset_class = PropertyFilter
-    search_fields = ['title', 'description', 'city', 'neighborhood']
+    pagination_class = PropertyKeysetPagination
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
     ordering_fields = ['created_at', 'price', 'title']
     ordering = ['-created_at']
     
+    @property
+    def paginator(self):
+        """Pagination numérotée par défaut ; par curseur sur demande (?cursor=, ?page_size=).
+        
+        Une recherche est triée par pertinence, que le curseur ne sait pas suivre :
+        elle reste paginée par numéro.
+        """
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if (
+                'page' not in params
+                and not params.get(PropertySearchFilter.search_param, '').strip()
+                and self.pagination_class.is_requested(self.request)
+            ):
+                self._paginator = self.pagination_class()
+            else:
+                self._paginator = PageNumberPagination()
+        return self._paginator
+    
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in ('list', 'search_by_bbox', 'clusters', 'nearby', 'changes'):
             return PropertyListSerializer
+        if self.action in ('create', 'update', 'partial_update'):
+            # Écritures du propriétaire : références partenaire lisibles et modifiables
+            return PartnerPropertySerializer
         return PropertySerializer
     
+    def get_serializer(self, *args, **kwargs):
+        """Charge en une requête les favoris parmi les propriétés sérialisées (page, détail, carte)"""
+        if args and args[0] is not None:
+            properties = args[0] if kwargs.get('many') else [args[0]]
+            context = kwargs.setdefault('context', self.get_serializer_context())
+            context['favorite_ids'] = self.favorite_ids(property_obj.id for property_obj in properties)
+        return super().get_serializer(*args, **kwargs)
+    
+    def favorite_ids(self, property_ids):
+        return favorite_ids_for(self.request.user, property_ids)
+    
+    async def afavorite_ids(self, property_ids):
+        return await afavorite_ids_for(self.request.user, property_ids)
+    
     def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
+        try:
+            with publication_quota(self.request.user):
+                serializer.save(owner=self.request.user)
+        except PublicationQuotaExceeded as exc:
+            raise PermissionDenied(f'Publication quota exceeded ({exc.limit})')
     
-    @action(detail=False, methods=['get'])
-    def search_by_bbox(self, request):
-        """Recherche par bounding box pour la carte"""
+    def perform_update(self, serializer):
+        # Un brouillon repassé en publié compte comme une publication (PUT et PATCH)
+        try:
+            with publication_quota(serializer.instance.owner):
+                serializer.save()
+        except PublicationQuotaExceeded as exc:
+            raise PermissionDenied(f'Publication quota exceeded ({exc.limit})')
+    
+    def filter_bbox(self, request, queryset):
+        """Filtre sur la bounding box de la requête, None si un paramètre manque.
+        
+        Les préfixes geohash qui recouvrent la box présélectionnent par index ;
+        latitude et longitude, sans index, ne font que retirer les bords.
+        """
         min_lat = request.query_params.get('min_lat')
         min_lng = request.query_params.get('min_lng')
         max_lat = request.query_params.get('max_lat')
         max_lng = request.query_params.get('max_lng')
         
         if not all([min_lat, min_lng, max_lat, max_lng]):
-            return Response(
-                {'error': 'Missing bbox parameters'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            return None
         
-        properties = self.get_queryset().filter(
+        queryset = queryset.filter(
             latitude__gte=min_lat,
             latitude__lte=max_lat,
             longitude__gte=min_lng,
@@ -82,16 +178,363 @@ class PropertyViewSet(viewsets.ModelViewSet):
             latitude__isnull=False,
             longitude__isnull=False
         )
+        try:
+            prefixes = geo.cover_filter(float(min_lat), float(min_lng), float(max_lat), float(max_lng))
+        except (ValueError, OverflowError):
+            prefixes = None
+        return queryset if prefixes is None else queryset.filter(prefixes)
+    
+    @action(detail=False, methods=['get'])
+    def search_by_bbox(self, request):
+        """Recherche par bounding box pour la carte"""
+        properties = self.filter_bbox(request, self.get_queryset())
+        if properties is None:
+            return Response(
+                {'error': 'Missing bbox parameters'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if 'compact' in request.query_params:
+            return self.compact_markers(request, properties)
+        
+        # Pagination par curseur sur demande (?cursor= ou ?page_size=), liste complète sinon
+        paginate = PropertyKeysetPagination.is_requested(request)
+        if self.use_fast_path():
+            return self.fast_response(properties, paginate)
+        if paginate:
+            page = self.paginate_queryset(properties)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
         
-        serializer = PropertyListSerializer(properties, many=True)
+        serializer = self.get_serializer(properties, many=True)
         return Response(serializer.data)
+    
+    def compact_markers(self, request, properties, **envelope):
+        """Marqueurs réduits au strict nécessaire (?compact=columns ou ?compact=binary)"""
+        compact = request.query_params.get('compact') or 'columns'
+        if compact not in marker_formats.FORMATS:
+            return Response(
+                {'error': 'Invalid compact format'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        rows = marker_formats.marker_rows(properties)
+        if compact == 'binary':
+            response = HttpResponse(marker_formats.to_binary(rows), content_type='application/octet-stream')
+            response['X-Marker-Types'] = ','.join(marker_formats.TYPE_NAMES)
+            return response
+        columns = marker_formats.to_columns(rows)
+        if envelope:
+            return Response({**envelope, 'markers': columns})
+        return Response(columns)
+    
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """Propriétés autour d'un point, par distance croissante.
+
+        ?lat=&lng= et ?radius= (km) pour toutes celles du cercle (rayon borné à
+        PROPERTY_NEARBY_MAX_RADIUS_KM), paginées sur demande (?page=,
+        ?page_size=) ; sinon les ?limit= plus proches dans ce rayon maximal.
+        """
+        try:
+            latitude = float(request.query_params['lat'])
+            longitude = float(request.query_params['lng'])
+            radius = request.query_params.get('radius')
+            radius = float(radius) if radius else None
+            limit = int(request.query_params.get('limit', 20))
+            if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or (radius is not None and radius <= 0):
+                raise ValueError
+        except (KeyError, ValueError):
+            return Response(
+                {'error': 'Missing or invalid lat, lng, radius or limit parameter'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        limit = max(1, min(limit, settings.PROPERTY_NEARBY_MAX_RESULTS))
+        max_radius = settings.PROPERTY_NEARBY_MAX_RADIUS_KM
+        candidates = self.filter_queryset(self.get_queryset())
+        paginator = None
+        if radius is not None:
+            found = geo.within_radius(candidates, latitude, longitude, min(radius, max_radius))
+            if DistancePagination.is_requested(request):
+                paginator = DistancePagination()
+                found = paginator.paginate_queryset(found, request, view=self)
+        else:
+            found = geo.nearest(candidates, latitude, longitude, limit, max_radius)
+        
+        # Seules les propriétés retenues sont chargées entièrement
+        distances = {property_id: distance for distance, property_id in found}
+        properties = sorted(
+            self.get_queryset().filter(id__in=distances),
+            key=lambda property_obj: (distances[property_obj.id], property_obj.id)
+        )
+        data = self.get_serializer(properties, many=True).data
+        for item, property_obj in zip(data, properties):
+            item['distance'] = round(distances[property_obj.id], 3)
+        if paginator:
+            return paginator.get_paginated_response(data)
+        return Response(data)
+    
+    @action(
+        detail=False, methods=['post'], permission_classes=[IsPartnerOrAdmin],
+        throttle_classes=[BulkBucketThrottle]
+    )
+    def bulk(self, request):
+        """Création / mise à jour en masse (tableau d'annonces, mise à jour par partner_reference).
+        
+        Tout ou rien : un élément invalide ou le quota de publications dépassé n'écrit rien.
+        """
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response(
+                {'error': 'Expected a non-empty array of listings'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > settings.PROPERTY_BULK_MAX_ITEMS:
+            return Response(
+                {'error': f'At most {settings.PROPERTY_BULK_MAX_ITEMS} listings per request'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        results, valid = bulk_writes.validate_items(items, request.user, self.get_serializer_context())
+        if valid is None:
+            return Response(
+                {'error': 'Invalid listings, nothing was written', 'results': results}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            written = write_listings(valid, request.user)
+        except PublicationQuotaExceeded as exc:
+            return Response(
+                {'error': 'Publication quota exceeded', 'limit': exc.limit, 'published': exc.published}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        except IntegrityError:
+            # Une requête concurrente a créé la même partner_reference entre la validation et l'écriture
+            return Response(
+                {'error': 'Conflicting partner_reference, nothing was written'}, 
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        created = sum(is_created for _property, is_created in written)
+        return Response(
+            {'created': created, 'updated': len(written) - created, 'results': bulk_writes.written_results(written)}, 
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+    
+    @action(
+        detail=False, methods=['post'], permission_classes=[IsPartnerOrAdmin],
+        throttle_classes=[BulkBucketThrottle], url_path='sync/manifest'
+    )
+    def sync_manifest(self, request):
+        """Compare le manifeste du partenaire (référence, hash) à l'inventaire : annonces à envoyer et à supprimer"""
+        try:
+            manifest = delta_sync.parse_manifest(request.data)
+        except delta_sync.ManifestError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        if len(manifest) > settings.PROPERTY_SYNC_MAX_MANIFEST:
+            return Response(
+                {'error': f'At most {settings.PROPERTY_SYNC_MAX_MANIFEST} listings per manifest'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(delta_sync.diff_manifest(request.user, manifest))
+    
+    @action(
+        detail=False, methods=['post'], permission_classes=[IsPartnerOrAdmin],
+        throttle_classes=[BulkBucketThrottle], url_path='sync/apply'
+    )
+    def sync_apply(self, request):
+        """Applique les changements annoncés par sync/manifest : {"upsert": [annonces], "delete": [références]}"""
+        upserts = request.data.get('upsert', []) if isinstance(request.data, dict) else None
+        deletions = request.data.get('delete', []) if isinstance(request.data, dict) else None
+        if not isinstance(upserts, list) or not isinstance(deletions, list) \
+                or not all(isinstance(reference, str) for reference in deletions):
+            return Response(
+                {'error': 'Expected {"upsert": [listings], "delete": [references]}'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(upserts) > settings.PROPERTY_BULK_MAX_ITEMS:
+            return Response(
+                {'error': f'At most {settings.PROPERTY_BULK_MAX_ITEMS} listings per request'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            results, written, deleted = delta_sync.apply_changes(
+                request.user, upserts, deletions, self.get_serializer_context()
+            )
+        except PublicationQuotaExceeded as exc:
+            return Response(
+                {'error': 'Publication quota exceeded', 'limit': exc.limit, 'published': exc.published}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        except IntegrityError:
+            return Response(
+                {'error': 'Conflicting partner_reference, nothing was written'}, 
+                status=status.HTTP_409_CONFLICT
+            )
+        if written is None:
+            return Response(
+                {'error': 'Invalid listings, nothing was written', 'results': results}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        created = sum(is_created for _property, is_created in written)
+        return Response({
+            'created': created,
+            'updated': len(written) - created,
+            'deleted': deleted,
+            'results': bulk_writes.written_results(written),
+        })
+    
+    @action(
+        detail=False, methods=['get'], permission_classes=[IsPartnerOrAdmin],
+        renderer_classes=[NDJSONRenderer, CSVRenderer], throttle_classes=[BulkBucketThrottle]
+    )
+    def export(self, request):
+        """Export en flux de l'inventaire (?format=ndjson ou ?format=csv), filtres de PropertyFilter compris.
+        
+        Tous les statuts ; un partenaire n'exporte que ses propres annonces. Avec ?search=,
+        tous les résultats, par pertinence.
+        """
+        properties = Property.objects.all()
+        if not request.user.is_staff:
+            properties = properties.filter(owner=request.user)
+        properties = self.filter_queryset(properties)
+        return export_formats.streaming_export(properties, request.accepted_renderer.format)
+    
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """Propriétés publiées, modifiées et retirées depuis ?token= (synchronisation hors ligne).
+        
+        Sans jeton : tout le catalogue publié. Reprendre avec le jeton rendu tant que has_more est vrai.
+        """
+        token = request.query_params.get('token')
+        try:
+            since = changelog.decode_token(token) if token else 0
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        rows, has_more = changelog.changes_since(since, settings.PROPERTY_CHANGES_PAGE_SIZE)
+        upserted = [row.property_id for row in rows if row.kind == changelog.UPSERT]
+        positions = {property_id: position for position, property_id in enumerate(upserted)}
+        properties = sorted(
+            Property.objects.filter(status='published', id__in=upserted).select_related('primary_image'),
+            key=lambda property_obj: positions[property_obj.id]
+        )
+        return Response({
+            'results': self.get_serializer(properties, many=True).data,
+            # Sans jeton, le client n'a rien à retirer
+            'removed': [str(row.property_id) for row in rows if row.kind == changelog.REMOVE and token],
+            'token': changelog.encode_token(rows[-1].seq if rows else since),
+            'has_more': has_more,
+        })
+    
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """Comptes par ville, type, chambres et tranche de prix pour les filtres courants"""
+        def compute():
+            queryset = self.filter_queryset(self.get_queryset())
+            filters = {name: value for name, value in request.query_params.items() if value and (
+                name in PropertyFilter.base_filters or name == PropertySearchFilter.search_param
+            )}
+            return facet_counts.compute_facets(queryset, aggregates=facet_counts.aggregate_rows(filters))
+        
+        data = response_cache.get_or_set('api:facets', request.query_params, compute)
+        return Response(data)
+    
+    @action(detail=False, methods=['get'])
+    def aggregates(self, request):
+        """Nombre, prix moyen et médian par ville et par type, lus dans les agrégats tenus à jour.
+        
+        ?group_by= parmi city, property_type, status (défaut city,property_type) ; ?city= et
+        ?property_type= filtrent. Propriétés publiées, ou ?status= pour les administrateurs.
+        """
+        group_by = [field for field in request.query_params.get('group_by', 'city,property_type').split(',') if field]
+        invalid = [field for field in group_by if field not in listing_aggregates.GROUP_FIELDS]
+        if invalid:
+            return Response(
+                {'error': f"Invalid group_by field: {invalid[0]}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        listing_status = request.query_params.get('status', 'published')
+        if listing_status != 'published' and not request.user.is_staff:
+            raise PermissionDenied('Only administrators can see unpublished listings')
+        
+        rows = ListingAggregate.objects.filter(status=listing_status)
+        for field in ('city', 'property_type'):
+            if request.query_params.get(field):
+                rows = rows.filter(**{field: request.query_params[field]})
+        results = listing_aggregates.summarize(rows, group_by)
+        return Response({'count': sum(result['count'] for result in results), 'results': results})
+    
+    @action(detail=False, methods=['get'])
+    def clusters(self, request):
+        """Regroupement des propriétés de la bounding box par cellule geohash selon le zoom"""
+        try:
+            zoom = int(request.query_params.get('zoom', ''))
+        except ValueError:
+            return Response(
+                {'error': 'Missing or invalid zoom parameter'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Marqueurs individuels au zoom rapproché, agrégats sinon (sans jointures)
+        markers = zoom >= geo.MARKER_ZOOM
+        base_queryset = self.get_queryset() if markers else Property.objects.filter(status='published')
+        properties = self.filter_bbox(request, base_queryset)
+        if properties is None:
+            return Response(
+                {'error': 'Missing bbox parameters'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if markers:
+            if 'compact' in request.query_params:
+                return self.compact_markers(request, properties, zoom=zoom, clusters=[])
+            serializer = self.get_serializer(properties, many=True)
+            return Response({'zoom': zoom, 'clusters': [], 'markers': serializer.data})
+        
+        # GROUP BY sur le préfixe du geohash précalculé, calculé par la base
+        precision = geo.precision_for_zoom(zoom)
+        cells = properties.order_by().annotate(
+            cell=Substr('geohash', 1, precision)
+        ).values('cell').annotate(
+            count=Count('id'),
+            latitude=Avg('latitude'),
+            longitude=Avg('longitude'),
+            min_price=Min('price'),
+            max_price=Max('price'),
+        ).order_by('cell')
+        
+        clusters = [
+            {
+                'cell': cell['cell'],
+                'count': cell['count'],
+                'latitude': round(float(cell['latitude']), 6),
+                'longitude': round(float(cell['longitude']), 6),
+                'min_price': cell['min_price'],
+                'max_price': cell['max_price'],
+            }
+            for cell in cells
+        ]
+        return Response({'zoom': zoom, 'precision': precision, 'clusters': clusters, 'markers': []})
 
-class FavoriteViewSet(viewsets.ModelViewSet):
+class FavoriteViewSet(ExpandableQuerysetMixin, viewsets.ModelViewSet):
     serializer_class = FavoriteSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Favorite.objects.filter(user=self.request.user).select_related('property')
+        return self.expand_queryset(
+            Favorite.objects.filter(user=self.request.user).select_related('property', 'property__primary_image')
+        )
+    
+    def get_serializer(self, *args, **kwargs):
+        """Les propriétés d'une liste de favoris sont par définition favorites : aucune requête"""
+        if args and args[0] is not None:
+            favorites = args[0] if kwargs.get('many') else [args[0]]
+            context = kwargs.setdefault('context', self.get_serializer_context())
+            context['favorite_ids'] = {favorite.property_id for favorite in favorites}
+        return super().get_serializer(*args, **kwargs)
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -118,7 +561,7 @@ class AlertViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class PartnerViewSet(viewsets.ModelViewSet):
+class PartnerViewSet(ExpandableQuerysetMixin, viewsets.ModelViewSet):
     queryset = Partner.objects.all()
     serializer_class = PartnerSerializer
     permission_classes = [IsPartnerOrAdmin]
@@ -127,8 +570,19 @@ class PartnerViewSet(viewsets.ModelViewSet):
     def properties(self, request, pk=None):
         """Propriétés d'un partenaire"""
         partner = self.get_object()
-        properties = Property.objects.filter(owner=partner.user)
-        serializer = PropertyListSerializer(properties, many=True)
+        properties = Property.objects.filter(owner=partner.user).select_related('primary_image')
+        
+        # Pagination par curseur sur demande (?cursor= ou ?page_size=), liste complète sinon
+        paginator = None
+        if PropertyKeysetPagination.is_requested(request):
+            paginator = PropertyKeysetPagination()
+            properties = paginator.paginate_queryset(properties, request, view=self)
+        
+        context = self.get_serializer_context()
+        context['favorite_ids'] = favorite_ids_for(request.user, (property_obj.id for property_obj in properties))
+        serializer = PropertyListSerializer(properties, many=True, context=context)
+        if paginator:
+            return paginator.get_paginated_response(serializer.data)
         return Response(serializer.data)
     
     @action(detail=True, methods=['get'])
@@ -136,31 +590,50 @@ class PartnerViewSet(viewsets.ModelViewSet):
         """Contrats d'un partenaire"""
         partner = self.get_object()
         contracts = Contract.objects.filter(partner=partner)
-        serializer = ContractSerializer(contracts, many=True)
+        serializer = ContractSerializer(contracts, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
 
-class ContractViewSet(viewsets.ModelViewSet):
+class ContractViewSet(ExpandableQuerysetMixin, viewsets.ModelViewSet):
     queryset = Contract.objects.all()
     serializer_class = ContractSerializer
     permission_classes = [IsPartnerOrAdmin]
 
+class FeedImportViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """Flux d'annonces (CSV ou XML) déposés par les partenaires, importés par une tâche Celery"""
+    serializer_class = FeedImportSerializer
+    permission_classes = [IsPartnerOrAdmin]
+    
+    def get_throttles(self):
+        if self.action == 'create':
+            return [BulkBucketThrottle()]
+        return super().get_throttles()
+    
+    def get_queryset(self):
+        feed_imports = FeedImport.objects.select_related('partner')
+        if self.request.user.is_staff:
+            return feed_imports
+        return feed_imports.filter(partner__user=self.request.user)
+    
+    def perform_create(self, serializer):
+        try:
+            partner = self.request.user.partner_profile
+        except Partner.DoesNotExist:
+            raise ValidationError({'error': 'Partner profile not found'})
+        feed_import = serializer.save(partner=partner)
+        transaction.on_commit(lambda: import_partner_feed.delay(feed_import.id))
+
 class DashboardStatsView(APIView):
     permission_classes = [permissions.IsAdminUser]
     
     def get(self, request):
-        """Statistiques pour le dashboard admin"""
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        
-        stats = {
-            'total_users': User.objects.count(),
-            'active_users_30d': User.objects.filter(last_login__gte=thirty_days_ago).count(),
-            'total_properties': Property.objects.count(),
-            'published_properties': Property.objects.filter(status='published').count(),
-            'total_partners': Partner.objects.count(),
-            'active_contracts': Contract.objects.filter(status='active').count(),
-        }
-        
-        return Response(stats)
+        """Statistiques pour le dashboard admin (compteurs matérialisés)"""
+        stats = counters.snapshot()
+        return Response({
+            key: stats[key] for key in (
+                'total_users', 'active_users_30d', 'total_properties', 'published_properties',
+                'total_partners', 'active_contracts', 'fresh_as_of',
+            )
+        })
 
 class ScrapingControlView(APIView):
     permission_classes = [permissions.IsAdminUser]
@@ -0,0 +1,8 @@
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'astremina.settings')
+# Lectures asynchrones de l'API (api.async_views), sauf API_ASYNC_READ_VIEWS=False
+os.environ.setdefault('API_ASYNC_READ_VIEWS', 'True')
+
+application = get_asgi_application()
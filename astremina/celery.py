@@ -22,4 +22,10 @@ def setup_periodic_tasks(sender, **kwargs):
             schedule=task_config['schedule'],
             sig=app.signature(task_config['task'], args=task_config.get('args', ())),
             name=task_name,
-        )
\ No newline at end of file
+        )
+    # Réconciliation des compteurs du dashboard (fenêtres de 30 jours, écarts)
+    sender.add_periodic_task(
+        settings.DASHBOARD_COUNTERS_RECONCILE_SECONDS,
+        app.signature('dashboard.tasks.reconcile_counters'),
+        name='reconcile-dashboard-counters',
+    )
\ No newline at end of file
@@ -87,6 +87,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'astremina.wsgi.application'
+ASGI_APPLICATION = 'astremina.asgi.application'
 
 # Database
 DATABASES = {
@@ -140,6 +141,64 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Property image renditions (changing these makes reprocess_images regenerate them)
+PROPERTY_IMAGE_MAX_SIZE = (1200, 1200)
+PROPERTY_IMAGE_THUMBNAIL_SIZE = (200, 200)
+PROPERTY_IMAGE_QUALITY = 85
+
+# On-demand renditions served by properties:image_rendition
+PROPERTY_IMAGE_RENDITION_WIDTHS = [200, 400, 800, 1200]
+PROPERTY_IMAGE_RENDITION_FORMATS = ['jpeg', 'webp', 'png']
+PROPERTY_IMAGE_CACHE_DIR = config('PROPERTY_IMAGE_CACHE_DIR', default=str(BASE_DIR / 'cache' / 'renditions'))
+PROPERTY_IMAGE_CACHE_MAX_BYTES = config('PROPERTY_IMAGE_CACHE_MAX_BYTES', default=512 * 1024 * 1024, cast=int)
+
+# Scraped listing photos
+SCRAPING_IMAGE_WORKERS = config('SCRAPING_IMAGE_WORKERS', default=8, cast=int)
+SCRAPING_IMAGE_PER_HOST = config('SCRAPING_IMAGE_PER_HOST', default=2, cast=int)
+SCRAPING_IMAGE_MAX_BYTES = 5 * 1024 * 1024
+SCRAPING_IMAGE_TIMEOUT = 30
+# Allow image downloads from private/loopback addresses (local stand-in servers only)
+SCRAPING_IMAGE_ALLOW_PRIVATE_HOSTS = False
+
+# Radius / nearest property search (kilometres)
+PROPERTY_NEARBY_MAX_RADIUS_KM = 100
+PROPERTY_NEARBY_MAX_RESULTS = 100
+
+# Price bucket bounds of the facet counts (XAF)
+PROPERTY_PRICE_BUCKETS = [5_000_000, 10_000_000, 25_000_000, 50_000_000, 100_000_000, 250_000_000]
+
+# Listing aggregates (properties.aggregates): relative accuracy of the price quantiles.
+# Changing it requires `manage.py rebuild_listing_aggregates`
+PROPERTY_AGGREGATE_ACCURACY = 0.01
+
+# Cached search results (seconds); writes invalidate them through version counters
+PROPERTY_RESPONSE_CACHE_TIMEOUT = config('PROPERTY_RESPONSE_CACHE_TIMEOUT', default=300, cast=int)
+
+# Property list and bbox endpoints serialized from .values() rows instead of PropertyListSerializer
+API_FAST_LIST_SERIALIZATION = config('API_FAST_LIST_SERIALIZATION', default=False, cast=bool)
+
+# Streaming exports: rows fetched per database round trip and per written chunk
+EXPORT_CHUNK_SIZE = 2000
+
+# Bulk listing writes: maximum listings per request
+PROPERTY_BULK_MAX_ITEMS = 500
+
+# Delta sync: maximum (reference, hash) pairs per manifest
+PROPERTY_SYNC_MAX_MANIFEST = 50000
+
+# Partner feed imports: rows validated and written per transaction
+FEED_IMPORT_CHUNK_SIZE = 500
+
+# Changes feed (mobile sync): changes per response, and age before a change is served
+PROPERTY_CHANGES_PAGE_SIZE = 500
+PROPERTY_CHANGES_SETTLE_SECONDS = 5
+
+# Async read views (api.async_views) in front of the API routes; enabled by astremina.asgi
+API_ASYNC_READ_VIEWS = config('API_ASYNC_READ_VIEWS', default=False, cast=bool)
+
+# Dashboard counters (dashboard.counters): seconds between two reconciliations with the tables
+DASHBOARD_COUNTERS_RECONCILE_SECONDS = config('DASHBOARD_COUNTERS_RECONCILE_SECONDS', default=900, cast=int)
+
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
@@ -194,6 +253,18 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    # Token buckets in Redis (api.throttling): '120/min' = 120 tokens, refilled at 2 per second
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.AnonBucketThrottle',
+        'api.throttling.UserBucketThrottle',
+        'api.throttling.PartnerBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': config('THROTTLE_RATE_ANON', default='120/min'),
+        'user': config('THROTTLE_RATE_USER', default='300/min'),
+        'partner': config('THROTTLE_RATE_PARTNER', default='1200/min'),
+        'bulk': config('THROTTLE_RATE_BULK', default='30/min'),
+    },
 }
 
 # JWT settings
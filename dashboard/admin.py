@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
-from .models import DailyStats
+from .models import DailyStats, StatCounter
 
 @admin.register(DailyStats)
 class DailyStatsAdmin(admin.ModelAdmin):
@@ -12,4 +12,11 @@ class DailyStatsAdmin(admin.ModelAdmin):
 
     class Meta:
         verbose_name = _('Daily Stats')
-        verbose_name_plural = _('Daily Stats')
\ No newline at end of file
+        verbose_name_plural = _('Daily Stats')
+
+@admin.register(StatCounter)
+class StatCounterAdmin(admin.ModelAdmin):
+    list_display = ('name', 'value', 'updated_at', 'reconciled_at')
+    search_fields = ('name',)
+    readonly_fields = ('name', 'value', 'updated_at', 'reconciled_at')
+    ordering = ['name']
\ No newline at end of file
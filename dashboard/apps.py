@@ -4,4 +4,7 @@ from django.utils.translation import gettext_lazy as _
 class DashboardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dashboard'
-    verbose_name = _('Dashboard')
\ No newline at end of file
+    verbose_name = _('Dashboard')
+    
+    def ready(self):
+        import dashboard.signals
\ No newline at end of file
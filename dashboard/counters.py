@@ -0,0 +1,143 @@
+"""
+Compteurs matérialisés des dashboards (admin_dashboard, DashboardStatsView).
+
+Chaque statistique est une ligne de StatCounter, lue par clé primaire :
+le coût d'une lecture ne dépend plus de la taille des tables. Les
+signaux (dashboard.signals) et les écritures en masse y reportent leurs
+variations après le commit, en un UPDATE value = value + delta.
+
+reconcile() recompte tout depuis les tables (tâche périodique
+reconcile_counters) : il corrige les écarts (écritures par update(),
+concurrence avec une réconciliation) et met à jour les fenêtres
+glissantes (utilisateurs actifs / nouveaux sur 30 jours), qu'aucun
+événement ne fait évoluer. Leur date est le « fresh as of » affiché.
+"""
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.utils import timezone
+
+from partners.models import Contract, Partner
+from properties.models import Property
+
+from .models import StatCounter
+
+User = get_user_model()
+
+TOTAL_USERS = 'users:total'
+ACTIVE_USERS_30D = 'users:active_30d'
+NEW_USERS_30D = 'users:new_30d'
+TOTAL_PROPERTIES = 'properties:total'
+PUBLISHED_PROPERTIES = 'properties:published'
+PUBLISHED_PRICE_SUM = 'properties:published_price_sum'
+TOTAL_PARTNERS = 'partners:total'
+CONTRACT_PREFIX = 'contracts:'
+# Statuts de contrat affichés
+CONTRACT_STATUSES = ('active', 'expired')
+
+NAMES = (
+    TOTAL_USERS, ACTIVE_USERS_30D, NEW_USERS_30D, TOTAL_PROPERTIES, PUBLISHED_PROPERTIES,
+    PUBLISHED_PRICE_SUM, TOTAL_PARTNERS,
+) + tuple(CONTRACT_PREFIX + contract_status for contract_status in CONTRACT_STATUSES)
+
+def contract_name(contract_status):
+    return CONTRACT_PREFIX + contract_status if contract_status in CONTRACT_STATUSES else None
+
+
+def property_deltas(transitions):
+    """Variations des compteurs pour [(état avant, état après)] de propriétés (None : absente)"""
+    deltas = Counter()
+    for before, after in transitions:
+        for state, sign in ((before, -1), (after, 1)):
+            if state is None:
+                continue
+            deltas[TOTAL_PROPERTIES] += sign
+            if state['status'] == 'published':
+                deltas[PUBLISHED_PROPERTIES] += sign
+                deltas[PUBLISHED_PRICE_SUM] += sign * Decimal(str(state['price']))
+    return deltas
+
+
+def record(deltas):
+    """Reporte les variations {compteur: delta} après le commit (rien si la transaction est annulée)"""
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if deltas:
+        transaction.on_commit(lambda: apply(deltas))
+
+
+def apply(deltas):
+    """Un seul UPDATE pour toutes les variations ; un compteur absent attend la réconciliation"""
+    StatCounter.objects.filter(name__in=list(deltas)).update(
+        value=F('value') + Case(*[When(name=name, then=Value(Decimal(delta))) for name, delta in deltas.items()]),
+        updated_at=timezone.now(),
+    )
+
+
+def compute():
+    """Valeurs exactes de tous les compteurs, calculées sur les tables"""
+    thirty_days_ago = timezone.now() - timedelta(days=30)
+    values = User.objects.aggregate(
+        total=Count('pk'),
+        active=Count('pk', filter=Q(last_login__gte=thirty_days_ago)),
+        new=Count('pk', filter=Q(date_joined__gte=thirty_days_ago)),
+    )
+    properties = Property.objects.aggregate(
+        total=Count('pk'),
+        published=Count('pk', filter=Q(status='published')),
+        price_sum=Sum('price', filter=Q(status='published')),
+    )
+    counters = {
+        TOTAL_USERS: values['total'],
+        ACTIVE_USERS_30D: values['active'],
+        NEW_USERS_30D: values['new'],
+        TOTAL_PROPERTIES: properties['total'],
+        PUBLISHED_PROPERTIES: properties['published'],
+        PUBLISHED_PRICE_SUM: properties['price_sum'] or 0,
+        TOTAL_PARTNERS: Partner.objects.count(),
+    }
+    contracts = dict(Contract.objects.values_list('status').annotate(count=Count('pk')))
+    for contract_status in CONTRACT_STATUSES:
+        counters[contract_name(contract_status)] = contracts.get(contract_status, 0)
+    return counters
+
+
+def reconcile():
+    """Remplace les compteurs par les valeurs recalculées ; rend la date de réconciliation"""
+    now = timezone.now()
+    counters = compute()
+    with transaction.atomic():
+        StatCounter.objects.exclude(name__in=list(counters)).delete()
+        StatCounter.objects.bulk_create(
+            [
+                StatCounter(name=name, value=value, updated_at=now, reconciled_at=now)
+                for name, value in counters.items()
+            ],
+            update_conflicts=True, unique_fields=['name'], update_fields=['value', 'updated_at', 'reconciled_at'],
+        )
+    return now
+
+
+def snapshot():
+    """Statistiques des dashboards lues dans les compteurs (réconciliés d'abord s'il en manque)"""
+    rows = {row.name: row for row in StatCounter.objects.filter(name__in=NAMES)}
+    if len(rows) < len(NAMES):
+        reconcile()
+        rows = {row.name: row for row in StatCounter.objects.filter(name__in=NAMES)}
+    value = {name: row.value for name, row in rows.items()}
+    published = int(value[PUBLISHED_PROPERTIES])
+    return {
+        'total_users': int(value[TOTAL_USERS]),
+        'active_users_30d': int(value[ACTIVE_USERS_30D]),
+        'new_users_30d': int(value[NEW_USERS_30D]),
+        'total_properties': int(value[TOTAL_PROPERTIES]),
+        'published_properties': published,
+        'avg_property_price': round(value[PUBLISHED_PRICE_SUM] / published, 2) if published else 0,
+        'total_partners': int(value[TOTAL_PARTNERS]),
+        'active_contracts': int(value[contract_name('active')]),
+        'expired_contracts': int(value[contract_name('expired')]),
+        'fresh_as_of': min(row.reconciled_at for row in rows.values()),
+    }
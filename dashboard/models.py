@@ -19,4 +19,18 @@ class DailyStats(models.Model):
         ordering = ['-date']
 
     def __str__(self):
-        return f"Stats for {self.date}"
\ No newline at end of file
+        return f"Stats for {self.date}"
+
+class StatCounter(models.Model):
+    """Compteur matérialisé du dashboard (cf. dashboard.counters)"""
+    name = models.CharField(_('name'), max_length=150, primary_key=True)
+    value = models.DecimalField(_('value'), max_digits=24, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(_('updated at'))
+    reconciled_at = models.DateTimeField(_('reconciled at'))
+
+    class Meta:
+        verbose_name = _('Stat Counter')
+        verbose_name_plural = _('Stat Counters')
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
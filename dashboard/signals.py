@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from partners.models import Partner, Contract
+from properties import aggregates
+from properties.models import Property
+from . import counters
+
+User = get_user_model()
+
+@receiver(post_save, sender=Property)
+def property_counted(sender, instance, created, **kwargs):
+    """Variations des compteurs entre l'état enregistré (cf. properties.signals) et le nouveau"""
+    before = None if created else getattr(instance, '_previous_state', None)
+    counters.record(counters.property_deltas([(before, aggregates.property_state(instance))]))
+
+@receiver(post_delete, sender=Property)
+def property_uncounted(sender, instance, **kwargs):
+    counters.record(counters.property_deltas([(aggregates.property_state(instance), None)]))
+
+@receiver(post_save, sender=User)
+def user_counted(sender, instance, created, **kwargs):
+    if created:
+        counters.record({counters.TOTAL_USERS: 1})
+
+@receiver(post_delete, sender=User)
+def user_uncounted(sender, instance, **kwargs):
+    counters.record({counters.TOTAL_USERS: -1})
+
+@receiver(post_save, sender=Partner)
+def partner_counted(sender, instance, created, **kwargs):
+    if created:
+        counters.record({counters.TOTAL_PARTNERS: 1})
+
+@receiver(post_delete, sender=Partner)
+def partner_uncounted(sender, instance, **kwargs):
+    counters.record({counters.TOTAL_PARTNERS: -1})
+
+@receiver(pre_save, sender=Contract)
+def contract_pre_save(sender, instance, **kwargs):
+    """Retient le statut enregistré : un changement de statut déplace le contrat d'un compteur à l'autre"""
+    if instance.pk and not instance._state.adding:
+        instance._previous_status = Contract.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+@receiver(post_save, sender=Contract)
+def contract_counted(sender, instance, created, **kwargs):
+    previous = None if created else getattr(instance, '_previous_status', None)
+    if previous != instance.status:
+        counters.record({
+            name: delta
+            for name, delta in ((counters.contract_name(previous), -1), (counters.contract_name(instance.status), 1))
+            if name
+        })
+
+@receiver(post_delete, sender=Contract)
+def contract_uncounted(sender, instance, **kwargs):
+    name = counters.contract_name(instance.status)
+    if name:
+        counters.record({name: -1})
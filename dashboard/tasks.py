@@ -0,0 +1,12 @@
+from celery import shared_task
+import logging
+
+from . import counters
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def reconcile_counters():
+    """Recalcule les compteurs du dashboard à partir des tables"""
+    reconciled_at = counters.reconcile()
+    logger.info(f"Dashboard counters reconciled at {reconciled_at.isoformat()}")
@@ -0,0 +1,130 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from properties.models import Property
+
+User = get_user_model()
+
+class DashboardCountersTest(TestCase):
+    maxDiff = None
+
+    def setUp(self):
+        from dashboard import counters
+
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@astremina.com',
+            password='test123',
+            is_staff=True,
+            is_superuser=True
+        )
+        self.user = User.objects.create_user(
+            username='owner',
+            email='owner@astremina.com',
+            password='test123'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.house = self.create('Maison', 'Douala', 1000000)
+        self.reconciled_at = counters.reconcile()
+
+    def create(self, title, city, price, status='published'):
+        return Property.objects.create(
+            title=title, description='Maison', property_type='house', price=price,
+            city=city, owner=self.user, status=status
+        )
+
+    def assertMatchesTables(self):
+        from dashboard import counters
+        from dashboard.models import StatCounter
+
+        # Les fenêtres de 30 jours ne suivent que les réconciliations
+        windows = [counters.ACTIVE_USERS_30D, counters.NEW_USERS_30D]
+        stored = {row.name: row.value for row in StatCounter.objects.filter(value__gt=0).exclude(name__in=windows)}
+        self.assertEqual(
+            stored, {name: value for name, value in counters.compute().items() if value and name not in windows}
+        )
+
+    def test_writes_update_counters(self):
+        from datetime import date
+        from partners.models import Partner, Contract
+        from scraping.tasks import check_contract_expirations
+
+        with self.captureOnCommitCallbacks(execute=True):
+            villa = self.create('Villa', 'Yaoundé', 3000000)
+            self.create('Brouillon', 'Yaoundé', 500000, status='draft')
+            self.house.price = 2000000
+            self.house.city = 'Kribi'
+            self.house.save()
+            partner = Partner.objects.create(
+                user=self.user, company_name='Agence', address='Akwa',
+                contact_email='agence@astremina.com', contact_phone='600000000'
+            )
+            contract = Contract.objects.create(partner=partner, start_date=date(2025, 1, 1), end_date=date(2025, 12, 31))
+        self.assertMatchesTables()
+
+        # update() sans signaux : les compteurs suivent quand même
+        with self.captureOnCommitCallbacks(execute=True):
+            check_contract_expirations()
+        contract.refresh_from_db()
+        self.assertEqual(contract.status, 'expired')
+        self.assertMatchesTables()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            villa.delete()
+            User.objects.create_user(username='new', email='new@astremina.com', password='test123')
+        self.assertMatchesTables()
+
+    def test_rolled_back_writes_are_not_counted(self):
+        from django.db import transaction
+        from dashboard import counters
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.create('Villa', 'Douala', 3000000)
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual(counters.snapshot()['total_properties'], 1)
+
+    def test_stats_view_reads_counters(self):
+        from dashboard.models import StatCounter
+
+        self.client.force_authenticate(user=self.admin)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/dashboard/summary/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(
+            {key: value for key, value in data.items() if key != 'fresh_as_of'},
+            {
+                'total_users': User.objects.count(), 'active_users_30d': 0, 'total_properties': 1, 'published_properties': 1,
+                'total_partners': 0, 'active_contracts': 0,
+            }
+        )
+        self.assertEqual(data['fresh_as_of'], self.reconciled_at.isoformat().replace('+00:00', 'Z'))
+
+        # Store vide (premier déploiement) : réconcilié à la première lecture
+        StatCounter.objects.all().delete()
+        self.assertEqual(self.client.get('/api/dashboard/summary/').json()['total_users'], User.objects.count())
+        self.assertTrue(StatCounter.objects.exists())
+
+    def test_admin_dashboard(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create('Villa', 'Yaoundé', 3000000)
+            self.create('Studio', 'Yaoundé', 200000)
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('dashboard:admin_dashboard'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.context['avg_property_price'], round((1000000 + 3000000 + 200000) / 3, 2))
+        self.assertEqual(
+            response.context['properties_by_city'],
+            [{'city': 'Yaoundé', 'count': 2}, {'city': 'Douala', 'count': 1}]
+        )
+        self.assertAlmostEqual(response.context['median_property_price'], 1000000, delta=1000000 * 0.01)
+        self.assertEqual(response.context['fresh_as_of'], self.reconciled_at)
+        self.assertContains(response, 'Fresh as of')
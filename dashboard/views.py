@@ -2,39 +2,22 @@ from django.shortcuts import render
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.core.paginator import Paginator
 from django.utils.translation import gettext_lazy as _
-from django.db.models import Count, Q, Avg
-from django.utils import timezone
-from datetime import timedelta
-from django.contrib.auth import get_user_model
-from properties.models import Property
-from partners.models import Partner, Contract
+from properties.models import ListingAggregate, Property
+from properties import aggregates, response_cache
 from scraping.models import ScrapeJobLog
+from . import counters
 from .models import DailyStats
 
-User = get_user_model()
-
 @login_required
 @user_passes_test(lambda u: u.is_superuser)
 def admin_dashboard(request):
     """Dashboard administrateur"""
-    # Statistiques utilisateurs (temps réel)
-    total_users = User.objects.count()
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    active_users_30d = User.objects.filter(last_login__gte=thirty_days_ago).count()
-    new_users_30d = User.objects.filter(date_joined__gte=thirty_days_ago).count()
-
-    # Statistiques propriétés (temps réel)
-    total_properties = Property.objects.count()
-    published_properties = Property.objects.filter(status='published').count()
-    avg_property_price = Property.objects.filter(status='published').aggregate(Avg('price'))['price__avg'] or 0
-    properties_by_city = Property.objects.values('city').annotate(
-        count=Count('id')
-    ).order_by('-count')[:10]
+    # Statistiques utilisateurs, propriétés, partenaires (compteurs matérialisés)
+    stats = counters.snapshot()
 
-    # Statistiques partenaires (temps réel)
-    total_partners = Partner.objects.count()
-    active_contracts = Contract.objects.filter(status='active').count()
-    expired_contracts = Contract.objects.filter(status='expired').count()
+    # Répartition par ville et prix médian (agrégats par ville, type et statut)
+    published_prices = aggregates.summarize(ListingAggregate.objects.filter(status='published'), group_by=())
+    properties_by_city = aggregates.top_cities(10)
 
     # Dernières stats agrégées (depuis DailyStats)
     latest_stats = DailyStats.objects.order_by('-date').first()
@@ -48,22 +31,18 @@ def admin_dashboard(request):
     # Propriétés récentes (avec pagination)
     recent_properties = Property.objects.select_related('owner').order_by('-created_at')
     property_paginator = Paginator(recent_properties, 10)
+    # Nombre de pages tiré du compteur, sans COUNT(*) sur la table
+    property_paginator.count = stats['total_properties']
     property_page_number = request.GET.get('property_page')
     property_page_obj = property_paginator.get_page(property_page_number)
 
     context = {
         'title': _('Admin Dashboard'),
-        'total_users': total_users,
-        'active_users_30d': active_users_30d,
-        'new_users_30d': new_users_30d,
-        'total_properties': total_properties,
-        'published_properties': published_properties,
-        'avg_property_price': round(avg_property_price, 2),
+        **stats,
+        'median_property_price': published_prices[0]['median_price'] if published_prices else None,
         'properties_by_city': properties_by_city,
-        'total_partners': total_partners,
-        'active_contracts': active_contracts,
-        'expired_contracts': expired_contracts,
         'latest_stats': latest_stats,
+        'response_cache_stats': response_cache.stats(),
         'scrape_page_obj': scrape_page_obj,
         'property_page_obj': property_page_obj,
     }
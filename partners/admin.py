@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
-from .models import Partner, Contract
+from .models import Partner, Contract, FeedImport
 
 @admin.register(Partner)
 class PartnerAdmin(admin.ModelAdmin):
@@ -19,4 +19,14 @@ class ContractAdmin(admin.ModelAdmin):
     def is_active(self, obj):
         return obj.is_active
     is_active.boolean = True
-    is_active.short_description = _('Is Active')
\ No newline at end of file
+    is_active.short_description = _('Is Active')
+
+@admin.register(FeedImport)
+class FeedImportAdmin(admin.ModelAdmin):
+    list_display = ('partner', 'format', 'status', 'rows_processed', 'rows_failed', 'rows_per_second', 'created_at')
+    list_filter = ('status', 'format', 'created_at')
+    search_fields = ('partner__company_name',)
+    readonly_fields = (
+        'status', 'bytes_total', 'bytes_processed', 'rows_processed', 'rows_created', 'rows_updated',
+        'rows_failed', 'rows_per_second', 'errors', 'created_at', 'started_at', 'finished_at'
+    )
@@ -0,0 +1,179 @@
+"""
+Import des flux d'annonces des partenaires (CSV ou XML).
+
+Le fichier est lu en flux (csv.DictReader sur le fichier ouvert, iterparse
+pour le XML en libérant chaque annonce lue) : la mémoire ne dépend que de
+la taille des paquets. Chaque ligne est validée par FeedListingForm (les
+règles de PropertyForm), puis les lignes valides sont écrites par paquets
+de FEED_IMPORT_CHUNK_SIZE, création ou mise à jour selon la référence
+du partenaire (Property.partner_reference).
+
+Format CSV : une ligne d'en-tête avec les noms de champs. Format XML :
+<listings><listing><reference>…</reference><title>…</title>…</listing></listings>.
+"""
+import csv
+import io
+import time
+import xml.etree.ElementTree as ElementTree
+
+from django.conf import settings
+from django.utils import timezone
+
+from properties.forms import PropertyForm
+from properties.models import Property
+
+from .listings import write_listings
+from .quotas import PublicationQuotaExceeded
+
+REFERENCE_FIELD = 'reference'
+LISTING_TAG = 'listing'
+MAX_ERRORS = 200
+
+
+class FeedListingForm(PropertyForm):
+    """Ligne de flux : les champs et règles de PropertyForm, plus les pièces et la surface"""
+    class Meta(PropertyForm.Meta):
+        fields = PropertyForm.Meta.fields + ['bedrooms', 'bathrooms', 'surface_area']
+
+
+class _CountingReader(io.RawIOBase):
+    """Fichier binaire en lecture qui compte les octets lus (progression)"""
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.fileobj.read(len(buffer))
+        buffer[:len(data)] = data
+        self.bytes_read += len(data)
+        return len(data)
+
+
+def iter_csv(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    for row in csv.DictReader(text):
+        yield {name.strip(): (value or '').strip() for name, value in row.items() if name}
+
+
+def iter_xml(stream):
+    events = ElementTree.iterparse(stream, events=('start', 'end'))
+    _, root = next(events)
+    for event, element in events:
+        if event == 'end' and element.tag == LISTING_TAG:
+            yield {child.tag: (child.text or '').strip() for child in element}
+            # L'annonce lue n'est plus retenue par l'arbre
+            root.clear()
+
+
+PARSERS = {
+    'csv': iter_csv,
+    'xml': iter_xml,
+}
+
+
+def detect_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return extension if extension in PARSERS else None
+
+
+def validate_row(row):
+    """(référence, champs validés, None) ou (référence, None, {champ: [messages]})"""
+    reference = row.get(REFERENCE_FIELD, '')
+    if not reference:
+        return reference, None, {REFERENCE_FIELD: ['This field is required.']}
+    if len(reference) > Property._meta.get_field('partner_reference').max_length:
+        return reference, None, {REFERENCE_FIELD: ['Reference is too long.']}
+    form = FeedListingForm(data=row)
+    if not form.is_valid():
+        return reference, None, {field: list(messages) for field, messages in form.errors.items()}
+    return reference, form.cleaned_data, None
+
+
+class FeedImporter:
+    """Traite un FeedImport : lecture en flux, écritures par paquets, progression enregistrée"""
+
+    def __init__(self, feed_import, chunk_size=None):
+        self.job = feed_import
+        self.owner = feed_import.partner.user
+        self.chunk_size = chunk_size or settings.FEED_IMPORT_CHUNK_SIZE
+        self.errors = []
+        self.stream = None
+        self.started = time.monotonic()
+
+    def run(self):
+        job = self.job
+        job.status = 'running'
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at'])
+        self.started = time.monotonic()
+
+        try:
+            with job.file.open('rb') as fileobj:
+                job.bytes_total = job.file.size
+                self.stream = _CountingReader(fileobj)
+                chunk = []
+                for line, row in enumerate(PARSERS[job.format](io.BufferedReader(self.stream)), 1):
+                    chunk.append((line, row))
+                    if len(chunk) >= self.chunk_size:
+                        self.write_chunk(chunk)
+                        chunk = []
+                if chunk:
+                    self.write_chunk(chunk)
+            job.status = 'success'
+        except (ElementTree.ParseError, csv.Error, UnicodeDecodeError) as exc:
+            self.error(f'Unreadable feed: {exc}')
+            job.status = 'failed'
+        finally:
+            job.finished_at = timezone.now()
+            self.save_progress()
+        return job
+
+    def write_chunk(self, chunk):
+        existing = dict(
+            Property.objects.filter(
+                owner=self.owner, partner_reference__in=[row.get(REFERENCE_FIELD) for _, row in chunk]
+            ).values_list('partner_reference', 'pk')
+        )
+        instances = Property.objects.in_bulk(existing.values())
+
+        valid, seen = [], set()
+        for line, row in chunk:
+            reference, data, errors = validate_row(row)
+            if reference and reference in seen:
+                errors = {REFERENCE_FIELD: ['Duplicate reference in this chunk.']}
+            if errors:
+                self.job.rows_failed += 1
+                details = '; '.join(f'{field}: {" ".join(messages)}' for field, messages in errors.items())
+                self.error(f'Row {line} ({reference or "no reference"}): {details}')
+                continue
+            seen.add(reference)
+            instance = instances.get(existing.get(reference))
+            valid.append((instance, {**data, 'partner_reference': reference}))
+
+        try:
+            written = write_listings(valid, self.owner) if valid else []
+        except PublicationQuotaExceeded as exc:
+            self.job.rows_failed += len(valid)
+            self.error(f'Rows {chunk[0][0]}-{chunk[-1][0]}: {exc}')
+        else:
+            created = sum(is_created for _property, is_created in written)
+            self.job.rows_created += created
+            self.job.rows_updated += len(written) - created
+        self.job.rows_processed += len(chunk)
+        self.save_progress()
+
+    def error(self, message):
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(message)
+
+    def save_progress(self):
+        job = self.job
+        if self.stream is not None:
+            job.bytes_processed = self.stream.bytes_read
+        elapsed = time.monotonic() - self.started
+        job.rows_per_second = round(job.rows_processed / elapsed, 1) if elapsed > 0 else 0
+        job.errors = '\n'.join(self.errors)
+        job.save()
@@ -0,0 +1,84 @@
+"""
+Écriture en masse des annonces d'un partenaire (API bulk, imports de flux).
+
+Les éléments arrivent validés (serializer ou formulaire) sous la forme
+(annonce existante ou None, champs). Ils sont écrits par bulk_create /
+bulk_update dans une transaction, sous le quota de publications du contrat.
+
+Les signaux de Property ne sont pas émis par les écritures en masse : leurs
+effets (index de recherche, versions du catalogue, agrégats, compteurs du
+dashboard, géocodage) sont appliqués ici une fois pour le lot.
+"""
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from properties import aggregates, changelog, search, versions
+from properties.models import Property
+from scraping.tasks import geocode_properties
+
+from dashboard import counters
+
+from .quotas import publication_quota
+
+def _assign_slugs(properties):
+    """Même slug que Property.save, suffixé par l'id en cas de collision (base ou lot)"""
+    candidates = {property_obj: slugify(property_obj.title) for property_obj in properties}
+    taken = set(Property.objects.filter(slug__in=set(candidates.values())).values_list('slug', flat=True))
+    for property_obj, slug in candidates.items():
+        if not slug or slug in taken:
+            slug = f'{slug}-{property_obj.id.hex[:8]}'.lstrip('-')
+        property_obj.slug = slug
+        taken.add(slug)
+
+def write_listings(valid, owner):
+    """Écrit les éléments validés, [(propriété, créée)] dans leur ordre.
+
+    Lève PublicationQuotaExceeded (tout est annulé) au-delà du quota.
+    """
+    written, created, updated, update_fields = [], [], [], {'geohash', 'updated_at'}
+    previous_types, transitions = set(), []
+    now = timezone.now()
+    for instance, data in valid:
+        if instance is None:
+            property_obj, before = Property(owner=owner, **data), None
+            created.append(property_obj)
+        else:
+            property_obj = instance
+            previous_types.add(instance.property_type)
+            before = aggregates.property_state(instance)
+            for name, value in data.items():
+                setattr(instance, name, value)
+            instance.updated_at = now
+            update_fields.update(data)
+            updated.append(instance)
+        transitions.append((before, aggregates.property_state(property_obj)))
+        written.append((property_obj, instance is None))
+    properties = created + updated
+
+    for property_obj in properties:
+        property_obj.geohash = property_obj.compute_geohash()
+    _assign_slugs(created)
+
+    with publication_quota(owner):
+        Property.objects.bulk_create(created)
+        if updated:
+            Property.objects.bulk_update(updated, sorted(update_fields))
+        search.index_properties(properties)
+        changelog.record_properties(properties)
+        aggregates.record(transitions)
+        counters.record(counters.property_deltas(transitions))
+
+    to_geocode = [
+        property_obj.id for property_obj in created
+        if property_obj.address and property_obj.city and property_obj.geohash == ''
+    ]
+    types = {property_obj.property_type for property_obj in properties} | previous_types
+
+    def after_commit():
+        for property_type in types:
+            versions.bump_property(property_type)
+        if to_geocode:
+            geocode_properties.delay(to_geocode)
+    transaction.on_commit(after_commit)
+    return written
@@ -68,4 +68,56 @@ class Contract(models.Model):
         return (
             self.status == 'active' and 
             self.start_date <= today <= self.end_date
-        )
\ No newline at end of file
+        )
+
+
+class FeedImport(models.Model):
+    """Import d'un flux d'annonces (CSV ou XML) déposé par un partenaire, suivi du traitement"""
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('xml', 'XML'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', _('Pending')),
+        ('running', _('Running')),
+        ('success', _('Success')),
+        ('failed', _('Failed')),
+    ]
+
+    partner = models.ForeignKey(
+        Partner,
+        on_delete=models.CASCADE,
+        related_name='feed_imports',
+        verbose_name=_('partner')
+    )
+    file = models.FileField(_('file'), upload_to='feeds/%Y/%m/')
+    format = models.CharField(_('format'), max_length=3, choices=FORMAT_CHOICES)
+    status = models.CharField(_('status'), max_length=10, choices=STATUS_CHOICES, default='pending')
+    bytes_total = models.PositiveBigIntegerField(_('bytes total'), default=0)
+    bytes_processed = models.PositiveBigIntegerField(_('bytes processed'), default=0)
+    rows_processed = models.PositiveIntegerField(_('rows processed'), default=0)
+    rows_created = models.PositiveIntegerField(_('rows created'), default=0)
+    rows_updated = models.PositiveIntegerField(_('rows updated'), default=0)
+    rows_failed = models.PositiveIntegerField(_('rows failed'), default=0)
+    rows_per_second = models.FloatField(_('rows per second'), default=0)
+    errors = models.TextField(_('errors'), blank=True)
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+    started_at = models.DateTimeField(_('started at'), blank=True, null=True)
+    finished_at = models.DateTimeField(_('finished at'), blank=True, null=True)
+
+    class Meta:
+        verbose_name = _('Feed Import')
+        verbose_name_plural = _('Feed Imports')
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.partner.company_name} - {self.created_at}"
+
+    @property
+    def progress(self):
+        """Part du fichier lue, en pourcentage"""
+        if self.status == 'success':
+            return 100.0
+        if not self.bytes_total:
+            return 0.0
+        return round(100 * min(self.bytes_processed, self.bytes_total) / self.bytes_total, 1)
@@ -0,0 +1,59 @@
+"""
+Quota de publications du contrat actif d'un partenaire (Contract.max_publications).
+
+Le contrat est verrouillé (SELECT ... FOR UPDATE) pendant l'écriture : deux
+envois simultanés du même partenaire s'attendent au lieu de dépasser
+ensemble le quota.
+"""
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.utils import timezone
+
+from properties.models import Property
+
+from .models import Contract
+
+
+class PublicationQuotaExceeded(Exception):
+    def __init__(self, limit, published):
+        self.limit = limit
+        self.published = published
+        super().__init__(f'Publication quota exceeded: {published} published for a limit of {limit}')
+
+
+def active_contract(user, lock=False):
+    """Contrat en cours du partenaire (le plus récent), None pour les autres utilisateurs"""
+    today = timezone.now().date()
+    contracts = Contract.objects.filter(
+        partner__user=user, status='active', start_date__lte=today, end_date__gte=today
+    ).order_by('-created_at')
+    if lock:
+        contracts = contracts.select_for_update()
+    return contracts.first()
+
+
+def published_count(user):
+    return Property.objects.filter(owner=user, status='published').count()
+
+
+@contextmanager
+def publication_quota(user):
+    """Bloc transactionnel dont les écritures ne peuvent pas porter les publications au-delà du quota.
+
+    Un partenaire déjà au-delà (quota abaissé) peut encore modifier ou
+    retirer des annonces, pas en publier davantage. Sans contrat actif
+    (expiré, suspendu), son quota est nul.
+    """
+    with transaction.atomic():
+        contract = active_contract(user, lock=True)
+        if contract:
+            limit = contract.max_publications
+        else:
+            limit = 0 if user.is_partner else None
+        before = published_count(user) if limit is not None else None
+        yield contract
+        if limit is not None:
+            after = published_count(user)
+            if after > limit and after > before:
+                raise PublicationQuotaExceeded(limit, after)
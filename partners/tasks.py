@@ -0,0 +1,30 @@
+from celery import shared_task
+import logging
+
+from .feeds import FeedImporter
+from .models import FeedImport
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def import_partner_feed(feed_import_id):
+    """Importe un flux d'annonces déposé par un partenaire"""
+    try:
+        feed_import = FeedImport.objects.select_related('partner__user').get(id=feed_import_id, status='pending')
+    except FeedImport.DoesNotExist:
+        logger.error(f"Feed import {feed_import_id} not found or already processed")
+        return
+    
+    try:
+        FeedImporter(feed_import).run()
+    except Exception as e:
+        feed_import.status = 'failed'
+        feed_import.errors = '\n'.join(filter(None, [feed_import.errors, str(e)]))
+        feed_import.save(update_fields=['status', 'errors'])
+        logger.error(f"Feed import {feed_import_id} failed: {str(e)}")
+        raise
+    
+    logger.info(
+        f"Feed import {feed_import_id} {feed_import.status}: {feed_import.rows_processed} rows "
+        f"({feed_import.rows_per_second} rows/s)"
+    )
@@ -0,0 +1,97 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from properties.models import Property
+from properties.tests import TemporaryMediaMixin
+
+User = get_user_model()
+
+class PartnerFeedImportTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        from datetime import date
+        from partners.models import Partner, Contract
+
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='agency',
+            email='agency@astremina.com',
+            password='test123',
+            is_partner=True
+        )
+        self.partner = Partner.objects.create(
+            user=self.user, company_name='Agence', address='Akwa',
+            contact_email='agence@astremina.com', contact_phone='600000000'
+        )
+        today = date.today()
+        Contract.objects.create(
+            partner=self.partner, start_date=today.replace(year=today.year - 1),
+            end_date=today.replace(year=today.year + 1)
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def upload(self, name, content):
+        from unittest import mock
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        with mock.patch('api.views.import_partner_feed.delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/feeds/', {'file': SimpleUploadedFile(name, content)}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        delay.assert_called_once_with(response.data['id'])
+        return response.data['id']
+
+    def run_import(self, feed_import_id):
+        from partners.tasks import import_partner_feed
+
+        with self.settings(FEED_IMPORT_CHUNK_SIZE=2):
+            import_partner_feed(feed_import_id)
+        return self.client.get(f'/api/feeds/{feed_import_id}/').json()
+
+    def test_csv_feed_upserts_by_reference(self):
+        header = 'reference,title,description,property_type,price,currency,city,neighborhood,address,latitude,longitude,bedrooms\n'
+        rows = [
+            'R1,Villa Bonapriso,Belle villa,house,50000000,XAF,Douala,Bonapriso,,4.03,9.69,4\n',
+            'R2,Studio Bastos,Studio meublé,apartment,150000,XAF,Yaoundé,Bastos,,3.89,11.51,1\n',
+            'R3,Terrain,Sans prix,land,-5,XAF,Kribi,,,,,\n',
+            'R4,"Bureau, centre",Plateau de bureaux,office,900000,XAF,Douala,Akwa,,4.05,9.7,\n',
+        ]
+        job = self.run_import(self.upload('inventory.csv', (header + ''.join(rows)).encode()))
+        self.assertEqual(job['status'], 'success')
+        self.assertEqual((job['rows_processed'], job['rows_created'], job['rows_failed']), (4, 3, 1))
+        self.assertEqual(job['progress'], 100.0)
+        self.assertIn('Row 3 (R3)', job['errors'])
+        self.assertEqual(Property.objects.get(partner_reference='R4').title, 'Bureau, centre')
+        self.assertEqual(Property.objects.get(partner_reference='R1').bedrooms, 4)
+
+        # Le flux du lendemain met à jour au lieu de dupliquer
+        rows[0] = rows[0].replace('50000000', '45000000')
+        job = self.run_import(self.upload('inventory.csv', (header + rows[0]).encode()))
+        self.assertEqual((job['rows_created'], job['rows_updated']), (0, 1))
+        self.assertEqual(Property.objects.filter(owner=self.user).count(), 3)
+        self.assertEqual(Property.objects.get(partner_reference='R1').price, 45000000)
+
+    def test_xml_feed(self):
+        content = b'''<?xml version="1.0" encoding="utf-8"?>
+<listings>
+  <listing><reference>X1</reference><title>Appartement Akwa</title><description>Vue sur le fleuve</description>
+    <property_type>apartment</property_type><price>300000</price><currency>XAF</currency><city>Douala</city></listing>
+  <listing><reference>X2</reference><title>Maison</title><description>Jardin</description>
+    <property_type>castle</property_type><price>1</price><currency>XAF</currency><city>Douala</city></listing>
+</listings>'''
+        job = self.run_import(self.upload('inventory.xml', content))
+        self.assertEqual(job['status'], 'success')
+        self.assertEqual((job['rows_created'], job['rows_failed']), (1, 1))
+        self.assertIn('property_type', job['errors'])
+
+    def test_malformed_feed_fails(self):
+        job = self.run_import(self.upload('inventory.xml', b'<listings><listing><title>Oops</listing>'))
+        self.assertEqual(job['status'], 'failed')
+        self.assertIn('Unreadable feed', job['errors'])
+
+    def test_unknown_format_rejected(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        response = self.client.post('/api/feeds/', {'file': SimpleUploadedFile('inventory.pdf', b'%PDF')}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -39,9 +39,16 @@ class PropertyAdmin(admin.ModelAdmin):
 
 @admin.register(PropertyImage)
 class PropertyImageAdmin(admin.ModelAdmin):
-    list_display = ('property', 'is_primary', 'created_at')
+    list_display = ('property', 'is_primary', 'content_hash', 'created_at')
     list_filter = ('is_primary', 'created_at')
-    search_fields = ('property__title',)
+    search_fields = ('property__title', 'content_hash')
+    readonly_fields = ('renditions_version', 'content_hash', 'perceptual_hash', 'near_duplicate_listings')
+
+    @admin.display(description=_('Near-duplicate listings'))
+    def near_duplicate_listings(self, obj):
+        return ', '.join(
+            f"{image.property.title} ({distance})" for image, distance in obj.near_duplicates()
+        ) or '-'
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
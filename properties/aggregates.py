@@ -0,0 +1,175 @@
+"""
+Agrégats des propriétés par (ville, type, statut) : nombre, somme des prix
+et esquisse des prix pour les quantiles (médiane…).
+
+Chaque écriture y reporte sa différence après le commit (signaux de
+properties.signals, écritures en masse) : l'ancien état de la propriété est
+retiré de sa ligne, le nouveau ajouté à la sienne. Lire un agrégat, ou en
+fusionner plusieurs (par ville, par type…), ne parcourt donc jamais la
+table des propriétés.
+
+L'esquisse est un histogramme à buckets logarithmiques (type DDSketch) :
+le prix p tombe dans le bucket ceil(log_γ(p)), γ = (1 + α) / (1 - α), et
+un quantile est estimé à α près en valeur relative (α =
+PROPERTY_AGGREGATE_ACCURACY). Contrairement aux esquisses par échantillons,
+elle accepte les retraits (un bucket est décrémenté), et deux esquisses se
+fusionnent en additionnant leurs buckets. Quelques centaines de buckets
+couvrent toute la plage des prix.
+"""
+import math
+from collections import Counter
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+# Champs de Property dont dépendent les agrégats (et les compteurs du dashboard)
+STATE_FIELDS = ('property_type', 'status', 'price', 'city')
+GROUP_FIELDS = ('city', 'property_type', 'status')
+
+def gamma():
+    accuracy = settings.PROPERTY_AGGREGATE_ACCURACY
+    return (1 + accuracy) / (1 - accuracy)
+
+def bucket(price):
+    """Bucket du prix (clé de l'esquisse) ; les prix sous 1 vont au bucket de 1"""
+    return str(math.ceil(math.log(max(float(price), 1.0), gamma())))
+
+def bucket_value(index):
+    """Prix représentatif d'un bucket : à α près de tous les prix qu'il contient"""
+    g = gamma()
+    return 2 * g ** int(index) / (g + 1)
+
+def quantile(sketch, q):
+    """Quantile q (0 à 1) des prix de l'esquisse, None si elle est vide"""
+    total = sum(sketch.values())
+    if total <= 0:
+        return None
+    rank = q * (total - 1)
+    seen = 0
+    for index, count in sorted(sketch.items(), key=lambda item: int(item[0])):
+        seen += count
+        if seen > rank:
+            return round(bucket_value(index), 2)
+    return round(bucket_value(max(sketch, key=int)), 2)
+
+def property_state(property_obj):
+    return {field: getattr(property_obj, field) for field in STATE_FIELDS}
+
+def key_of(state):
+    return tuple(state[field] for field in GROUP_FIELDS)
+
+class Delta:
+    """Différences à reporter, par (ville, type, statut)"""
+
+    def __init__(self):
+        self.rows = {}
+
+    def add(self, state, sign):
+        row = self.rows.setdefault(key_of(state), [0, Decimal(0), Counter()])
+        row[0] += sign
+        row[1] += sign * Decimal(str(state['price']))
+        row[2][bucket(state['price'])] += sign
+
+    def transition(self, before, after):
+        """Une propriété passe de l'état before à after (None : absente)"""
+        if before is not None:
+            self.add(before, -1)
+        if after is not None:
+            self.add(after, 1)
+        return self
+
+    def __bool__(self):
+        return any(count or price_sum or any(sketch.values()) for count, price_sum, sketch in self.rows.values())
+
+def record(transitions):
+    """Reporte [(état avant, état après)] après le commit (rien si la transaction est annulée)"""
+    delta = Delta()
+    for before, after in transitions:
+        delta.transition(before, after)
+    if delta:
+        transaction.on_commit(lambda: apply(delta))
+
+def _matching(keys):
+    return reduce(or_, (Q(city=city, property_type=property_type, status=status) for city, property_type, status in keys))
+
+def apply(delta):
+    """Applique les différences sous verrou des lignes concernées (lecture, modification, écriture)"""
+    from .models import ListingAggregate
+
+    keys = sorted(delta.rows)
+    now = timezone.now()
+    with transaction.atomic():
+        ListingAggregate.objects.bulk_create(
+            [ListingAggregate(city=city, property_type=property_type, status=status, updated_at=now)
+             for city, property_type, status in keys],
+            ignore_conflicts=True
+        )
+        rows = list(ListingAggregate.objects.select_for_update().filter(_matching(keys)).order_by('pk'))
+        for row in rows:
+            count, price_sum, sketch = delta.rows[(row.city, row.property_type, row.status)]
+            row.count += count
+            row.price_sum += price_sum
+            merged = Counter(row.price_sketch)
+            merged.update(sketch)
+            row.price_sketch = {index: value for index, value in merged.items() if value > 0}
+            row.updated_at = now
+        ListingAggregate.objects.bulk_update(rows, ['count', 'price_sum', 'price_sketch', 'updated_at'])
+        ListingAggregate.objects.filter(pk__in=[row.pk for row in rows if row.count <= 0]).delete()
+
+def rebuild(property_model=None, aggregate_model=None):
+    """Recalcule tous les agrégats à partir des propriétés ; rend le nombre de lignes.
+
+    Les modèles sont ceux de l'application, ou ceux d'une migration.
+    """
+    from .models import ListingAggregate, Property
+
+    property_model = property_model or Property
+    aggregate_model = aggregate_model or ListingAggregate
+    delta = Delta()
+    for values in property_model.objects.values_list(*STATE_FIELDS).iterator(chunk_size=2000):
+        delta.add(dict(zip(STATE_FIELDS, values)), 1)
+    now = timezone.now()
+    with transaction.atomic():
+        aggregate_model.objects.all().delete()
+        aggregate_model.objects.bulk_create([
+            aggregate_model(
+                city=city, property_type=property_type, status=status, count=count, price_sum=price_sum,
+                price_sketch={index: value for index, value in sketch.items() if value > 0}, updated_at=now
+            )
+            for (city, property_type, status), (count, price_sum, sketch) in delta.rows.items()
+        ])
+    return len(delta.rows)
+
+def summarize(rows, group_by):
+    """Fusionne les lignes par valeurs de group_by : nombre, prix moyen et médian, du plus fourni au moins fourni"""
+    groups = {}
+    for row in rows:
+        key = tuple(getattr(row, field) for field in group_by)
+        group = groups.setdefault(key, {'count': 0, 'price_sum': Decimal(0), 'sketch': Counter()})
+        group['count'] += row.count
+        group['price_sum'] += row.price_sum
+        group['sketch'].update(row.price_sketch)
+    results = [
+        {
+            **dict(zip(group_by, key)),
+            'count': group['count'],
+            'avg_price': round(group['price_sum'] / group['count'], 2) if group['count'] else None,
+            'median_price': quantile(group['sketch'], 0.5),
+        }
+        for key, group in groups.items()
+    ]
+    results.sort(key=lambda result: (-result['count'], [str(result[field]) for field in group_by]))
+    return results
+
+def top_cities(limit=10):
+    """Villes les plus fournies, tous types et statuts confondus (GROUP BY sur les agrégats)"""
+    from .models import ListingAggregate
+
+    return list(
+        ListingAggregate.objects.values('city').annotate(count=Sum('count')).order_by('-count', 'city')[:limit]
+    )
@@ -0,0 +1,114 @@
+"""
+Accès asynchrone au cache partagé, pour les vues servies par ASGI (api.async_views).
+
+django_redis n'a pas d'API asynchrone : les aget() de Django y passent
+par un thread. Avec ce backend, les commandes passent ici par redis.asyncio
+(un client par boucle d'événements), avec les clés (make_key) et
+l'encodage (encode / decode) du client django_redis : le cache synchrone
+lit et écrit les mêmes valeurs. Avec un autre backend (locmem des tests),
+ce sont les méthodes a*() de Django.
+"""
+import asyncio
+import weakref
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+try:
+    import redis.asyncio as aioredis
+    from django_redis.cache import RedisCache
+except ImportError:
+    aioredis = None
+    RedisCache = None
+
+# Boucle d'événements -> client redis.asyncio (un client ne sert qu'à sa boucle)
+_clients = weakref.WeakKeyDictionary()
+
+
+def _backend():
+    return caches['default']
+
+
+def _native(backend):
+    return RedisCache is not None and isinstance(backend, RedisCache)
+
+
+def _client(backend):
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        server = backend._server
+        # Plusieurs serveurs : le premier reçoit les écritures (comme DefaultClient)
+        location = (server.split(',') if isinstance(server, str) else list(server))[0]
+        options = backend._params.get('OPTIONS', {})
+        client = aioredis.from_url(
+            location,
+            password=options.get('PASSWORD'),
+            socket_timeout=options.get('SOCKET_TIMEOUT'),
+            socket_connect_timeout=options.get('SOCKET_CONNECT_TIMEOUT'),
+        )
+        _clients[loop] = client
+    return client
+
+
+def redis_client():
+    """Client redis.asyncio du cache, None avec un autre backend"""
+    backend = _backend()
+    return _client(backend) if _native(backend) else None
+
+
+def _expiry(backend, timeout):
+    """Durée de vie en millisecondes, None sans expiration"""
+    if timeout is DEFAULT_TIMEOUT:
+        timeout = backend.default_timeout
+    return None if timeout is None else max(int(timeout * 1000), 1)
+
+
+async def get(key, default=None):
+    backend = _backend()
+    if not _native(backend):
+        return await backend.aget(key, default)
+    value = await _client(backend).get(backend.client.make_key(key))
+    return default if value is None else backend.client.decode(value)
+
+
+async def get_many(keys):
+    backend = _backend()
+    if not _native(backend):
+        return await backend.aget_many(keys)
+    keys = list(keys)
+    if not keys:
+        return {}
+    values = await _client(backend).mget([backend.client.make_key(key) for key in keys])
+    return {key: backend.client.decode(value) for key, value in zip(keys, values) if value is not None}
+
+
+async def set(key, value, timeout=DEFAULT_TIMEOUT):
+    backend = _backend()
+    if not _native(backend):
+        return await backend.aset(key, value, timeout)
+    await _client(backend).set(
+        backend.client.make_key(key), backend.client.encode(value), px=_expiry(backend, timeout)
+    )
+
+
+async def add(key, value, timeout=DEFAULT_TIMEOUT):
+    """Écrit la valeur si la clé est absente ; True si elle a été écrite"""
+    backend = _backend()
+    if not _native(backend):
+        return await backend.aadd(key, value, timeout)
+    return bool(await _client(backend).set(
+        backend.client.make_key(key), backend.client.encode(value), px=_expiry(backend, timeout), nx=True
+    ))
+
+
+async def incr(key, delta=1):
+    """Incrémente un compteur existant, ValueError s'il est absent (comme cache.incr)"""
+    backend = _backend()
+    if not _native(backend):
+        return await backend.aincr(key, delta)
+    redis_key = backend.client.make_key(key)
+    client = _client(backend)
+    if not await client.exists(redis_key):
+        raise ValueError(f'Key {key!r} not found')
+    return await client.incrby(redis_key, delta)
@@ -0,0 +1,91 @@
+"""
+Séquence de changements des propriétés, pour la synchronisation incrémentale.
+
+Chaque écriture réécrit la ligne PropertyChange de la propriété avec un
+nouveau seq (clé primaire auto-incrémentée, donc indexée et croissante) :
+« les changements depuis N » sont les lignes seq > N, sans parcourir les
+propriétés sur updated_at. Une propriété non publiée ou supprimée est
+notée 'remove' : le client la retire de son cache.
+
+Les lignes sont écrites après le commit de la modification (on_commit) :
+un seq n'est attribué qu'à un changement déjà visible. Deux commits
+simultanés peuvent encore rendre leurs seq visibles dans le désordre ; les
+lignes de moins de PROPERTY_CHANGES_SETTLE_SECONDS ne sont donc pas encore
+servies, pour qu'un jeton ne dépasse jamais un changement non visible.
+"""
+import base64
+import binascii
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+UPSERT = 'upsert'
+REMOVE = 'remove'
+# Essais de record() face aux écritures simultanées d'une même propriété
+RECORD_ATTEMPTS = 3
+
+def kind_for(property_obj):
+    return UPSERT if property_obj.status == 'published' else REMOVE
+
+def record(changes):
+    """Enregistre [(property_id, kind)] : la ligne de chaque propriété est remplacée.
+
+    Suppression et insertion sont atomiques (une erreur ne perd pas le
+    tombstone). Une écriture simultanée de la même propriété peut insérer
+    sa ligne entre les deux : l'insertion échoue sur l'unicité de
+    property_id et l'ensemble est rejoué, la suppression voyant alors la
+    ligne concurrente.
+    """
+    from .models import PropertyChange
+
+    changes = dict(changes)
+    if not changes:
+        return
+    for attempt in range(RECORD_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                PropertyChange.objects.filter(property_id__in=list(changes)).delete()
+                PropertyChange.objects.bulk_create([
+                    PropertyChange(property_id=property_id, kind=kind) for property_id, kind in changes.items()
+                ])
+            return
+        except IntegrityError:
+            if attempt == RECORD_ATTEMPTS - 1:
+                raise
+
+def record_on_commit(changes):
+    """record() après le commit de la transaction en cours"""
+    changes = list(changes)
+    transaction.on_commit(lambda: record(changes))
+
+def record_properties(properties):
+    """Changements des propriétés, dans l'état où elles sont enregistrées"""
+    record_on_commit((property_obj.pk, kind_for(property_obj)) for property_obj in properties)
+
+def changes_since(seq, limit):
+    """(changements seq > N servis, encore d'autres) par seq croissant"""
+    from .models import PropertyChange
+
+    settled = timezone.now() - timedelta(seconds=settings.PROPERTY_CHANGES_SETTLE_SECONDS)
+    rows = list(
+        PropertyChange.objects.filter(seq__gt=seq, created_at__lte=settled).order_by('seq')[:limit + 1]
+    )
+    return rows[:limit], len(rows) > limit
+
+def encode_token(seq):
+    payload = json.dumps({'s': seq}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_token(token):
+    """seq du jeton, ValueError s'il est invalide"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        seq = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())['s']
+    except (TypeError, ValueError, KeyError, binascii.Error, UnicodeDecodeError):
+        raise ValueError('Invalid sync token')
+    if not isinstance(seq, int) or seq < 0:
+        raise ValueError('Invalid sync token')
+    return seq
@@ -0,0 +1,161 @@
+"""
+Geohash : clé de cellule précalculée sur Property pour les requêtes carte.
+
+Un geohash découpe le globe en cellules emboîtées : les n premiers caractères
+d'un geohash désignent la cellule de niveau n qui le contient. Regrouper ou
+présélectionner par préfixe revient donc à travailler sur une grille dont la
+finesse dépend de la longueur du préfixe.
+"""
+import math
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9  # ~5 m
+
+# Zoom de carte (Leaflet / OSM, 0-20) -> longueur du préfixe de regroupement
+ZOOM_PRECISION = [
+    (3, 1), (5, 2), (8, 3), (10, 4), (13, 5), (15, 6),
+]
+# Au-delà de ce zoom, les marqueurs sont renvoyés individuellement
+MARKER_ZOOM = 15
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# Nombre maximal de cellules d'une couverture (autant de LIKE 'préfixe%')
+MAX_COVER_CELLS = 16
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    latitude, longitude = float(latitude), float(longitude)
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits, bit_count, even = 0, 0, True
+    while len(chars) < precision:
+        value, value_range = (longitude, lng_range) if even else (latitude, lat_range)
+        middle = (value_range[0] + value_range[1]) / 2
+        if value >= middle:
+            bits = (bits << 1) | 1
+            value_range[0] = middle
+        else:
+            bits <<= 1
+            value_range[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+def precision_for_zoom(zoom):
+    for max_zoom, precision in ZOOM_PRECISION:
+        if zoom < max_zoom:
+            return precision
+    return ZOOM_PRECISION[-1][1] + 1
+
+def cell_size(precision):
+    """Dimensions (hauteur, largeur) en degrés d'une cellule de cette précision"""
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+def bounding_box(latitude, longitude, radius_km):
+    """(min_lat, min_lng, max_lat, max_lng) englobant le cercle"""
+    latitude, longitude = float(latitude), float(longitude)
+    lat_delta = radius_km / KM_PER_DEGREE
+    cos_lat = math.cos(math.radians(latitude))
+    if cos_lat * 180 <= lat_delta:
+        lng_delta = 180.0
+    else:
+        lng_delta = min(180.0, lat_delta / cos_lat)
+    return (
+        max(-90.0, latitude - lat_delta), longitude - lng_delta,
+        min(90.0, latitude + lat_delta), longitude + lng_delta,
+    )
+
+def cover(min_lat, min_lng, max_lat, max_lng, max_cells=MAX_COVER_CELLS):
+    """Préfixes geohash recouvrant la bounding box.
+
+    Choisit la précision la plus fine dont la couverture tient en max_cells
+    cellules. Une liste vide signifie que la zone couvre tout le globe.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = math.floor(max_lat / height) - math.floor(min_lat / height) + 1
+        cols = math.floor(max_lng / width) - math.floor(min_lng / width) + 1
+        if rows * cols <= max_cells:
+            break
+    else:
+        return []
+    if cols * width >= 360:
+        return []
+
+    cells = set()
+    for row in range(rows):
+        lat = min(max_lat, (math.floor(min_lat / height) + row + 0.5) * height)
+        for col in range(cols):
+            lng = (math.floor(min_lng / width) + col + 0.5) * width
+            lng = (lng + 180.0) % 360.0 - 180.0
+            cells.add(encode(max(-90.0, lat), lng, precision))
+    return sorted(cells)
+
+def cover_filter(min_lat, min_lng, max_lat, max_lng):
+    """Q sur les préfixes geohash de la couverture de la bounding box (index), None pour tout le globe"""
+    prefixes = cover(min_lat, min_lng, max_lat, max_lng)
+    if not prefixes:
+        return None
+    return reduce(or_, [Q(geohash__startswith=prefix) for prefix in prefixes])
+
+def distances_km(latitude, longitude, points):
+    """Distance haversine du point à chacun des (clé, lat, lng), en une passe.
+
+    Les termes constants (radians et cosinus du centre) sont calculés une
+    seule fois ; retourne [(distance, clé)].
+    """
+    lat0 = math.radians(float(latitude))
+    lng0 = math.radians(float(longitude))
+    cos_lat0 = math.cos(lat0)
+    radians, sin, cos, asin, sqrt = math.radians, math.sin, math.cos, math.asin, math.sqrt
+    diameter = 2 * EARTH_RADIUS_KM
+    results = []
+    for key, lat, lng in points:
+        lat, lng = radians(float(lat)), radians(float(lng))
+        a = sin((lat - lat0) / 2) ** 2 + cos_lat0 * cos(lat) * sin((lng - lng0) / 2) ** 2
+        results.append((diameter * asin(min(1.0, sqrt(a))), key))
+    return results
+
+def within_radius(queryset, latitude, longitude, radius_km):
+    """[(distance km, id)] des propriétés du queryset dans le cercle, par distance croissante.
+
+    Les candidats sont présélectionnés par préfixe de geohash (index) et
+    bounding box ; la distance exacte n'est calculée que pour eux, sur des
+    tuples (id, lat, lng) sans instancier de modèles.
+    """
+    min_lat, min_lng, max_lat, max_lng = bounding_box(latitude, longitude, radius_km)
+    candidates = queryset.filter(
+        latitude__gte=min_lat,
+        latitude__lte=max_lat,
+        latitude__isnull=False,
+        longitude__isnull=False
+    )
+    if min_lng >= -180 and max_lng <= 180:
+        candidates = candidates.filter(longitude__gte=min_lng, longitude__lte=max_lng)
+    prefixes = cover_filter(min_lat, min_lng, max_lat, max_lng)
+    if prefixes is not None:
+        candidates = candidates.filter(prefixes)
+
+    points = candidates.order_by().values_list('id', 'latitude', 'longitude')
+    return sorted(
+        (distance, key) for distance, key in distances_km(latitude, longitude, points)
+        if distance <= radius_km
+    )
+
+def nearest(queryset, latitude, longitude, limit, max_radius_km, start_radius_km=1.0):
+    """Les limit plus proches, en élargissant le rayon (x4) jusqu'à max_radius_km"""
+    radius_km = min(start_radius_km, max_radius_km)
+    while True:
+        found = within_radius(queryset, latitude, longitude, radius_km)
+        if len(found) >= limit or radius_km >= max_radius_km:
+            return found[:limit]
+        radius_km = min(radius_km * 4, max_radius_km)
\ No newline at end of file
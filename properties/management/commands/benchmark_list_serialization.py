@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from api.fastpath import property_rows
+from api.renderers import FastJSONRenderer
+from api.serializers import PropertyListSerializer
+
+from .benchmark_map_markers import sample_properties
+
+
+def value_rows(properties, columns):
+    """Lignes telles que les rend .values() (sans image principale)"""
+    return [
+        {column: None if '__' in column else getattr(obj, column) for column in columns}
+        for obj in properties
+    ]
+
+
+def encode_serializer(properties, rows):
+    serializer = PropertyListSerializer(properties, many=True, context={'favorite_ids': set()})
+    return JSONRenderer().render(serializer.data)
+
+
+def encode_fast(properties, rows):
+    return FastJSONRenderer().render(property_rows().convert(rows, set()))
+
+
+class Command(BaseCommand):
+    help = 'Compare rows/sec of PropertyListSerializer + JSONRenderer and of the fast list path (rows + orjson)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10000, help='Number of rows')
+        parser.add_argument('--repeat', type=int, default=5, help='Encodings per path (best time kept)')
+
+    def handle(self, *args, **options):
+        properties = sample_properties(options['count'])
+        rows = value_rows(properties, property_rows().columns)
+        encoders = [
+            ('serializer', encode_serializer),
+            ('fast', encode_fast),
+        ]
+
+        payloads, baseline = [], None
+        self.stdout.write(f"{options['count']} rows")
+        for name, encode in encoders:
+            best = None
+            for _ in range(max(1, options['repeat'])):
+                started = time.perf_counter()
+                payload = encode(properties, rows)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            payloads.append(payload)
+            rate = options['count'] / best if best else float('inf')
+            baseline = baseline or rate
+            self.stdout.write(
+                f"{name:>10}: {rate:12,.0f} rows/s (x{rate / baseline:5.1f}) "
+                f"encoded in {best * 1000:7.1f} ms"
+            )
+
+        if len(set(payloads)) != 1:
+            raise CommandError('The fast path output differs from the serializer output')
+        self.stdout.write('Outputs are byte-identical')
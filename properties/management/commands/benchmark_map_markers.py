@@ -0,0 +1,84 @@
+import gzip
+import random
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api import markers as marker_formats
+from api.serializers import PropertyListSerializer
+from properties.models import Property
+
+
+def sample_properties(count, seed=0):
+    """Propriétés en mémoire (jamais enregistrées) réparties sur le Cameroun"""
+    rng = random.Random(seed)
+    property_types = [value for value, _ in Property.PROPERTY_TYPES]
+    now = timezone.now()
+    return [
+        Property(
+            id=uuid.UUID(int=rng.getrandbits(128), version=4),
+            title=f'Property {index}',
+            slug=f'property-{index}',
+            property_type=rng.choice(property_types),
+            price=Decimal(rng.randrange(50, 5000) * 10000),
+            currency='XAF',
+            city='Douala',
+            neighborhood='Akwa',
+            latitude=Decimal(f'{rng.uniform(2.0, 13.0):.6f}'),
+            longitude=Decimal(f'{rng.uniform(8.5, 16.0):.6f}'),
+            created_at=now,
+        )
+        for index in range(count)
+    ]
+
+
+def encode_serializer(properties):
+    serializer = PropertyListSerializer(properties, many=True, context={'favorite_ids': set()})
+    return JSONRenderer().render(serializer.data)
+
+
+def encode_columns(properties):
+    rows = [tuple(getattr(obj, field) for field in marker_formats.MARKER_FIELDS) for obj in properties]
+    return JSONRenderer().render(marker_formats.to_columns(rows))
+
+
+def encode_binary(properties):
+    rows = [tuple(getattr(obj, field) for field in marker_formats.MARKER_FIELDS) for obj in properties]
+    return marker_formats.to_binary(rows)
+
+
+class Command(BaseCommand):
+    help = 'Compare payload size and encoding time of the map marker formats (full serializer, columns, binary)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10000, help='Number of markers')
+        parser.add_argument('--repeat', type=int, default=5, help='Encodings per format (best time kept)')
+
+    def handle(self, *args, **options):
+        properties = sample_properties(options['count'])
+        encoders = [
+            ('serializer', encode_serializer),
+            ('columns', encode_columns),
+            ('binary', encode_binary),
+        ]
+
+        baseline = None
+        self.stdout.write(f"{options['count']} markers")
+        for name, encode in encoders:
+            best = None
+            for _ in range(max(1, options['repeat'])):
+                started = time.perf_counter()
+                payload = encode(properties)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            gzipped = len(gzip.compress(payload))
+            baseline = baseline or len(payload)
+            self.stdout.write(
+                f"{name:>10}: {len(payload) / 1024:9.1f} KiB "
+                f"(gzip {gzipped / 1024:8.1f} KiB, x{baseline / len(payload):5.1f} smaller) "
+                f"encoded in {best * 1000:7.1f} ms"
+            )
@@ -0,0 +1,83 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+async def fetch(host, port, request):
+    """(statut HTTP, durée) d'une requête sur une connexion neuve"""
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(request)
+        await writer.drain()
+        status_line = await reader.readline()
+        # Corps lu jusqu'à la fermeture (Connection: close)
+        while await reader.read(65536):
+            pass
+    finally:
+        writer.close()
+    parts = status_line.split()
+    return int(parts[1]) if len(parts) > 1 else 0, time.perf_counter() - started
+
+
+async def client(host, port, request, deadline, results):
+    while time.perf_counter() < deadline:
+        try:
+            results.append(await fetch(host, port, request))
+        except OSError:
+            results.append((0, 0.0))
+
+
+class Command(BaseCommand):
+    help = (
+        'Load test a running server: requests/s and latency of a read endpoint at a given concurrency. '
+        'Run it against gunicorn (astremina.wsgi) then uvicorn (astremina.asgi) with the same worker count.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='e.g. http://127.0.0.1:8000/api/properties/')
+        parser.add_argument('--concurrency', type=int, default=200, help='Requests in flight')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds')
+        parser.add_argument('--token', help='JWT access token (Authorization: Bearer)')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError('Expected an http:// URL')
+        target = (url.path or '/') + (f'?{url.query}' if url.query else '')
+        headers = [
+            f'GET {target} HTTP/1.1',
+            f'Host: {url.netloc}',
+            'Accept: application/json',
+            'Connection: close',
+        ]
+        if options['token']:
+            headers.append(f"Authorization: Bearer {options['token']}")
+        request = ('\r\n'.join(headers) + '\r\n\r\n').encode()
+
+        results = []
+
+        async def run():
+            deadline = time.perf_counter() + options['duration']
+            await asyncio.gather(*[
+                client(url.hostname, url.port or 80, request, deadline, results)
+                for _ in range(max(1, options['concurrency']))
+            ])
+
+        started = time.perf_counter()
+        asyncio.run(run())
+        elapsed = time.perf_counter() - started
+
+        succeeded = sorted(duration for status, duration in results if 200 <= status < 400)
+        failed = len(results) - len(succeeded)
+        self.stdout.write(f"{options['concurrency']} concurrent clients, {elapsed:.1f} s")
+        self.stdout.write(f'{len(succeeded) / elapsed:10,.1f} requests/s ({failed} failed)')
+        if succeeded:
+            quantiles = statistics.quantiles(succeeded, n=100) if len(succeeded) > 1 else succeeded * 99
+            self.stdout.write(
+                f'latency p50 {quantiles[49] * 1000:7.1f} ms, p95 {quantiles[94] * 1000:7.1f} ms, '
+                f'p99 {quantiles[98] * 1000:7.1f} ms'
+            )
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from properties import aggregates
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the per city/type/status listing aggregates from the properties '
+        '(needed after changing PROPERTY_AGGREGATE_ACCURACY or writing with update())'
+    )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        row_count = aggregates.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {row_count} listing aggregates in {time.monotonic() - started:.1f}s"
+        ))
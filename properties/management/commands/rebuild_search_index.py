@@ -0,0 +1,19 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from properties import search
+from properties.models import Property, SearchPosting, SearchTerm
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of every property (needed after changing normalization or field weights)'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        term_count = search.rebuild_index(Property, SearchTerm, SearchPosting)
+        cache.delete(search.DOCUMENT_COUNT_KEY)
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {Property.objects.count()} properties, {term_count} terms in {time.monotonic() - started:.1f}s"
+        ))
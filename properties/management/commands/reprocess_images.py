@@ -0,0 +1,148 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from properties.models import PropertyImage
+from properties.tasks import (
+    find_current_duplicate, image_fingerprint, keep_original, render_image, rendition_signature,
+    reuse_renditions, save_renditions
+)
+
+
+def _render_job(job):
+    """Exécuté dans un processus du pool : aucun accès à la base ni au stockage"""
+    image_id, data, max_size, thumbnail_size, quality = job
+    try:
+        fingerprint = image_fingerprint(data)
+        return image_id, fingerprint, render_image(data, max_size, thumbnail_size, quality), None
+    except Exception as e:
+        return image_id, None, None, str(e)
+
+
+class Command(BaseCommand):
+    help = 'Regenerate renditions (resized image and thumbnail) of every PropertyImage, in id order, on a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Number of worker processes (default: CPU count)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=50,
+            help='Images loaded and checkpointed per batch'
+        )
+        parser.add_argument(
+            '--checkpoint', default=str(Path(settings.BASE_DIR) / 'logs' / 'reprocess_images.json'),
+            help='File recording the last processed image id'
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Ignore the existing checkpoint and start from the first image'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Also reprocess images whose renditions are already current'
+        )
+
+    def handle(self, *args, **options):
+        signature = rendition_signature()
+        checkpoint_path = Path(options['checkpoint'])
+        last_id = 0 if options['restart'] else self.read_checkpoint(checkpoint_path, signature)
+        if last_id:
+            self.stdout.write(f"Resuming after image {last_id}")
+
+        images = PropertyImage.objects.order_by('id')
+        if not options['force']:
+            images = images.exclude(renditions_version=signature)
+
+        processed = reused = failed = bytes_saved = 0
+        started = time.monotonic()
+
+        # Les processus sont forkés : ne pas leur transmettre de connexions ouvertes
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                batch = list(images.filter(id__gt=last_id)[:options['batch_size']])
+                if not batch:
+                    break
+
+                # Doublons exacts déjà rendus avec les réglages courants : partager leurs fichiers
+                to_render = []
+                for image_obj in batch:
+                    keep_original(image_obj)
+                    duplicate = find_current_duplicate(image_obj)
+                    if duplicate:
+                        bytes_saved += reuse_renditions(image_obj, duplicate)
+                        reused += 1
+                    else:
+                        to_render.append(image_obj)
+
+                by_id = {image_obj.id: image_obj for image_obj in to_render}
+                jobs = self.iter_jobs(to_render)
+                for image_id, fingerprint, renditions, error in pool.map(_render_job, jobs):
+                    image_obj = by_id[image_id]
+                    if error:
+                        failed += 1
+                        self.stderr.write(f"Image {image_id}: {error}")
+                        continue
+                    if not image_obj.content_hash:
+                        image_obj.content_hash = fingerprint[0]
+                        image_obj.set_perceptual_hash(fingerprint[1])
+                    # Fichiers effectivement supprimés, moins les rendus écrits (l'original est conservé)
+                    bytes_saved += save_renditions(image_obj, *renditions) - sum(len(data) for data in renditions)
+                    processed += 1
+
+                last_id = batch[-1].id
+                self.write_checkpoint(checkpoint_path, signature, last_id)
+                self.report(processed, reused, failed, bytes_saved, started)
+
+        self.report(processed, reused, failed, bytes_saved, started, final=True)
+        checkpoint_path.unlink(missing_ok=True)
+
+    def iter_jobs(self, batch):
+        """Lit les fichiers source du lot à transmettre au pool"""
+        max_size = settings.PROPERTY_IMAGE_MAX_SIZE
+        thumbnail_size = settings.PROPERTY_IMAGE_THUMBNAIL_SIZE
+        quality = settings.PROPERTY_IMAGE_QUALITY
+        for image_obj in batch:
+            # Depuis l'original : les rendus ne se dégradent pas d'un retraitement à l'autre
+            try:
+                with image_obj.source_file().open('rb') as source:
+                    data = source.read()
+            except (OSError, ValueError) as e:
+                data = b''
+                self.stderr.write(f"Image {image_obj.id}: cannot read {image_obj.source_file().name}: {e}")
+            yield image_obj.id, data, max_size, thumbnail_size, quality
+
+    def read_checkpoint(self, path, signature):
+        """Reprend après le dernier id traité, si le point de reprise vise les mêmes rendus"""
+        try:
+            checkpoint = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return 0
+        if checkpoint.get('signature') != signature:
+            return 0
+        return checkpoint.get('last_id', 0)
+
+    def write_checkpoint(self, path, signature, last_id):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps({'signature': signature, 'last_id': last_id}))
+        os.replace(tmp_path, path)
+
+    def report(self, processed, reused, failed, bytes_saved, started, final=False):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        message = (
+            f"{processed} images processed, {reused} reused from duplicates, {failed} failed, "
+            f"{processed / elapsed:.1f} images/sec, {bytes_saved / 1024:.1f} KiB saved"
+        )
+        if final:
+            self.stdout.write(self.style.SUCCESS(message))
+        else:
+            self.stdout.write(message)
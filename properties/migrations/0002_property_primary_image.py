@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-19 16:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_primary_image(apps, schema_editor):
+    Property = apps.get_model('properties', 'Property')
+    PropertyImage = apps.get_model('properties', 'PropertyImage')
+    for image in PropertyImage.objects.order_by('property_id', '-is_primary', 'created_at', 'id'):
+        Property.objects.filter(pk=image.property_id, primary_image__isnull=True).update(primary_image=image)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='primary_image',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='properties.propertyimage', verbose_name='primary image'),
+        ),
+        migrations.RunPython(backfill_primary_image, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 16:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0002_property_primary_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertyimage',
+            name='renditions_version',
+            field=models.CharField(blank=True, editable=False, help_text='Rendition settings the stored image and thumbnail were generated with', max_length=50, verbose_name='renditions version'),
+        ),
+    ]
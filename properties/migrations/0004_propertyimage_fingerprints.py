@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-19 16:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0003_propertyimage_renditions_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertyimage',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, verbose_name='content hash'),
+        ),
+        migrations.AddField(
+            model_name='propertyimage',
+            name='perceptual_hash',
+            field=models.CharField(blank=True, editable=False, max_length=16, verbose_name='perceptual hash'),
+        ),
+        migrations.AddField(
+            model_name='propertyimage',
+            name='phash_band_0',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='perceptual hash band 0'),
+        ),
+        migrations.AddField(
+            model_name='propertyimage',
+            name='phash_band_1',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='perceptual hash band 1'),
+        ),
+        migrations.AddField(
+            model_name='propertyimage',
+            name='phash_band_2',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='perceptual hash band 2'),
+        ),
+        migrations.AddField(
+            model_name='propertyimage',
+            name='phash_band_3',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='perceptual hash band 3'),
+        ),
+    ]
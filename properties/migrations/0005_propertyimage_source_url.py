@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 16:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0004_propertyimage_fingerprints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertyimage',
+            name='source_url',
+            field=models.URLField(blank=True, max_length=500, verbose_name='source URL'),
+        ),
+    ]
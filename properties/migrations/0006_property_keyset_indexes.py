@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-19 16:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0005_propertyimage_source_url'),
+        ('scraping', '__first__'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['created_at', 'id'], name='properties__created_25bd25_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['price', 'id'], name='properties__price_b10c54_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-19 16:41
+
+from django.db import migrations, models
+
+from properties import geo
+
+
+def backfill_geohash(apps, schema_editor):
+    Property = apps.get_model('properties', 'Property')
+    located = Property.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    for property_obj in located.only('id', 'latitude', 'longitude').iterator():
+        Property.objects.filter(pk=property_obj.pk).update(
+            geohash=geo.encode(property_obj.latitude, property_obj.longitude)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0006_property_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Map cell key computed from latitude and longitude', max_length=12, verbose_name='geohash'),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
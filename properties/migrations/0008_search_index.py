@@ -0,0 +1,51 @@
+# Generated by Django 5.2 on 2026-10-19 16:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from properties import search
+
+
+def backfill_search_index(apps, schema_editor):
+    search.rebuild_index(
+        apps.get_model('properties', 'Property'),
+        apps.get_model('properties', 'SearchTerm'),
+        apps.get_model('properties', 'SearchPosting'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0007_property_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, unique=True, verbose_name='term')),
+                ('document_count', models.PositiveIntegerField(default=0, verbose_name='document count')),
+            ],
+            options={
+                'verbose_name': 'Search term',
+                'verbose_name_plural': 'Search terms',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weight', models.PositiveSmallIntegerField(verbose_name='weight')),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_postings', to='properties.property', verbose_name='property')),
+                ('term', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='properties.searchterm', verbose_name='term')),
+            ],
+            options={
+                'verbose_name': 'Search posting',
+                'verbose_name_plural': 'Search postings',
+                'unique_together': {('term', 'property')},
+            },
+        ),
+        migrations.RunPython(backfill_search_index, migrations.RunPython.noop),
+    ]
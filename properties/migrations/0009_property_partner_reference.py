@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-19 17:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0008_search_index'),
+        ('scraping', '__first__'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='partner_reference',
+            field=models.CharField(blank=True, help_text="Listing identifier in the partner's own system, used by bulk upserts", max_length=100, verbose_name='partner reference'),
+        ),
+        migrations.AddConstraint(
+            model_name='property',
+            constraint=models.UniqueConstraint(condition=models.Q(('partner_reference', ''), _negated=True), fields=('owner', 'partner_reference'), name='unique_partner_reference_per_owner'),
+        ),
+    ]
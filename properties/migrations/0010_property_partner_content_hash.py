@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 17:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0009_property_partner_reference'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='partner_content_hash',
+            field=models.CharField(blank=True, help_text='Hash of the listing content as last sent by the partner, compared by delta sync', max_length=64, verbose_name='partner content hash'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-19 17:15
+
+from django.db import migrations, models
+
+
+def backfill_changes(apps, schema_editor):
+    """Une ligne par propriété existante, dans l'ordre de création : un premier jeton couvre tout le catalogue"""
+    Property = apps.get_model('properties', 'Property')
+    PropertyChange = apps.get_model('properties', 'PropertyChange')
+    changes = (
+        PropertyChange(property_id=property_id, kind='upsert' if status == 'published' else 'remove')
+        for property_id, status in Property.objects.order_by('created_at', 'id').values_list('id', 'status').iterator()
+    )
+    PropertyChange.objects.bulk_create(changes, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0010_property_partner_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyChange',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('property_id', models.UUIDField(unique=True, verbose_name='property')),
+                ('kind', models.CharField(choices=[('upsert', 'Created or updated'), ('remove', 'Removed')], max_length=6, verbose_name='kind')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+            ],
+            options={
+                'verbose_name': 'Property change',
+                'verbose_name_plural': 'Property changes',
+                'ordering': ['seq'],
+            },
+        ),
+        migrations.RunPython(backfill_changes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-19 17:40
+
+from django.db import migrations, models
+
+
+def backfill_aggregates(apps, schema_editor):
+    """Agrégats des propriétés existantes"""
+    from properties import aggregates
+
+    aggregates.rebuild(apps.get_model('properties', 'Property'), apps.get_model('properties', 'ListingAggregate'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0011_property_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100, verbose_name='city')),
+                ('property_type', models.CharField(choices=[('house', 'House'), ('apartment', 'Apartment'), ('land', 'Land'), ('hotel', 'Hotel'), ('office', 'Office'), ('commercial', 'Commercial')], max_length=20, verbose_name='property type')),
+                ('status', models.CharField(choices=[('published', 'Published'), ('draft', 'Draft'), ('disabled', 'Disabled')], max_length=10, verbose_name='status')),
+                ('count', models.IntegerField(default=0, verbose_name='count')),
+                ('price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='price sum')),
+                ('price_sketch', models.JSONField(default=dict, help_text='Property count per logarithmic price bucket', verbose_name='price sketch')),
+                ('updated_at', models.DateTimeField(verbose_name='updated at')),
+            ],
+            options={
+                'verbose_name': 'Listing aggregate',
+                'verbose_name_plural': 'Listing aggregates',
+                'unique_together': {('city', 'property_type', 'status')},
+            },
+        ),
+        migrations.RunPython(backfill_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0012_listing_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertyimage',
+            name='original',
+            field=models.ImageField(blank=True, editable=False, help_text='Uploaded file the image and thumbnail are rendered from', null=True, upload_to='properties/originals/', verbose_name='original'),
+        ),
+    ]
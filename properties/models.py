@@ -1,7 +1,12 @@
 from django.db import models
+from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 from django.utils.text import slugify
+from django.urls import reverse
+from django.utils import timezone
+from . import geo
+from .renditions import source_version
 import uuid
 
 User = get_user_model()
@@ -50,6 +55,14 @@ class Property(models.Model):
         blank=True, 
         null=True
     )
+    geohash = models.CharField(
+        _('geohash'),
+        max_length=12,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text=_('Map cell key computed from latitude and longitude')
+    )
     bedrooms = models.PositiveIntegerField(_('bedrooms'), blank=True, null=True)
     bathrooms = models.PositiveIntegerField(_('bathrooms'), blank=True, null=True)
     surface_area = models.PositiveIntegerField(_('surface area (m²)'), blank=True, null=True)
@@ -73,6 +86,27 @@ class Property(models.Model):
         verbose_name=_('source')
     )
     source_url = models.URLField(_('source URL'), blank=True)
+    partner_reference = models.CharField(
+        _('partner reference'),
+        max_length=100,
+        blank=True,
+        help_text=_("Listing identifier in the partner's own system, used by bulk upserts")
+    )
+    partner_content_hash = models.CharField(
+        _('partner content hash'),
+        max_length=64,
+        blank=True,
+        help_text=_('Hash of the listing content as last sent by the partner, compared by delta sync')
+    )
+    primary_image = models.ForeignKey(
+        'PropertyImage',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        editable=False,
+        related_name='+',
+        verbose_name=_('primary image')
+    )
     created_at = models.DateTimeField(_('created at'), auto_now_add=True)
     updated_at = models.DateTimeField(_('updated at'), auto_now=True)
 
@@ -86,6 +120,16 @@ class Property(models.Model):
             models.Index(fields=['price']),
             models.Index(fields=['status']),
             models.Index(fields=['created_at']),
+            # Clés de la pagination par curseur (api.pagination.PropertyKeysetPagination)
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['price', 'id']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['owner', 'partner_reference'],
+                condition=~Q(partner_reference=''),
+                name='unique_partner_reference_per_owner'
+            ),
         ]
 
     def __str__(self):
@@ -94,8 +138,31 @@ class Property(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
+        self.geohash = self.compute_geohash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
         super().save(*args, **kwargs)
 
+    def compute_geohash(self):
+        if self.latitude is None or self.longitude is None:
+            return ''
+        return geo.encode(self.latitude, self.longitude)
+
+    def refresh_primary_image(self):
+        """Recalcule l'image principale dénormalisée à partir des images"""
+        # Même règle que l'ancien PropertyListSerializer : l'image marquée
+        # principale, sinon la première image (cf. PropertyImage.Meta.ordering)
+        primary_image = self.images.order_by('-is_primary', 'created_at', 'id').first()
+        primary_image_id = primary_image.id if primary_image else None
+        if primary_image_id != self.primary_image_id:
+            self.primary_image = primary_image
+            Property.objects.filter(pk=self.pk).update(
+                primary_image=primary_image,
+                updated_at=timezone.now()
+            )
+        return primary_image
+
 class PropertyImage(models.Model):
     property = models.ForeignKey(
         Property, 
@@ -105,9 +172,40 @@ class PropertyImage(models.Model):
     )
     image = models.ImageField(_('image'), upload_to='properties/')
     thumbnail = models.ImageField(_('thumbnail'), upload_to='properties/thumbnails/', blank=True, null=True)
+    original = models.ImageField(
+        _('original'),
+        upload_to='properties/originals/',
+        blank=True,
+        null=True,
+        editable=False,
+        help_text=_('Uploaded file the image and thumbnail are rendered from')
+    )
     is_primary = models.BooleanField(_('is primary'), default=False)
+    source_url = models.URLField(_('source URL'), max_length=500, blank=True)
+    renditions_version = models.CharField(
+        _('renditions version'),
+        max_length=50,
+        blank=True,
+        editable=False,
+        help_text=_('Rendition settings the stored image and thumbnail were generated with')
+    )
+    content_hash = models.CharField(_('content hash'), max_length=64, blank=True, db_index=True, editable=False)
+    perceptual_hash = models.CharField(_('perceptual hash'), max_length=16, blank=True, editable=False)
+    # Le hash perceptuel (64 bits) découpé en 4 bandes de 16 bits indexées : deux images
+    # à une distance de Hamming <= 3 partagent forcément au moins une bande
+    phash_band_0 = models.PositiveIntegerField(_('perceptual hash band 0'), blank=True, null=True, db_index=True, editable=False)
+    phash_band_1 = models.PositiveIntegerField(_('perceptual hash band 1'), blank=True, null=True, db_index=True, editable=False)
+    phash_band_2 = models.PositiveIntegerField(_('perceptual hash band 2'), blank=True, null=True, db_index=True, editable=False)
+    phash_band_3 = models.PositiveIntegerField(_('perceptual hash band 3'), blank=True, null=True, db_index=True, editable=False)
     created_at = models.DateTimeField(_('created at'), auto_now_add=True)
 
+    PHASH_BANDS = 4
+    PHASH_MAX_DISTANCE = PHASH_BANDS - 1
+    FINGERPRINT_FIELDS = [
+        'content_hash', 'perceptual_hash',
+        'phash_band_0', 'phash_band_1', 'phash_band_2', 'phash_band_3',
+    ]
+
     class Meta:
         verbose_name = _('Property Image')
         verbose_name_plural = _('Property Images')
@@ -116,6 +214,50 @@ class PropertyImage(models.Model):
     def __str__(self):
         return f"Image for {self.property.title}"
 
+    def save(self, *args, **kwargs):
+        # Un nouveau fichier déposé remplace l'original : il le deviendra au traitement
+        if self.image and not self.image._committed:
+            self.original = None
+        super().save(*args, **kwargs)
+
+    def source_file(self):
+        """Fichier dont partent les rendus : l'original déposé, ou l'image tant qu'elle n'est pas traitée"""
+        return self.original or self.image
+
+    def set_perceptual_hash(self, value):
+        """Enregistre le hash perceptuel (entier 64 bits) et ses bandes indexées"""
+        self.perceptual_hash = f"{value:016x}"
+        for band in range(self.PHASH_BANDS):
+            setattr(self, f'phash_band_{band}', (value >> (16 * band)) & 0xFFFF)
+
+    def near_duplicates(self, max_distance=PHASH_MAX_DISTANCE):
+        """Images visuellement proches, triées par distance de Hamming.
+
+        Les bandes indexées présélectionnent les candidats en base, la distance
+        exacte est ensuite calculée sur ce petit ensemble.
+        """
+        if not self.perceptual_hash:
+            return []
+        value = int(self.perceptual_hash, 16)
+        bands = Q()
+        for band in range(self.PHASH_BANDS):
+            bands |= Q(**{f'phash_band_{band}': getattr(self, f'phash_band_{band}')})
+
+        matches = []
+        candidates = PropertyImage.objects.filter(bands).exclude(pk=self.pk).select_related('property')
+        for candidate in candidates:
+            distance = bin(value ^ int(candidate.perceptual_hash, 16)).count('1')
+            if distance <= max_distance:
+                matches.append((candidate, distance))
+        return sorted(matches, key=lambda match: match[1])
+
+    def get_rendition_url(self, width, fmt='webp'):
+        """URL d'un rendu à la demande (voir properties.views.image_rendition)"""
+        # La version du source dans l'URL : un nouveau fichier source a une nouvelle URL
+        return reverse('properties:image_rendition', kwargs={
+            'image_id': self.id, 'version': source_version(self), 'width': width, 'fmt': fmt
+        })
+
 class Favorite(models.Model):
     user = models.ForeignKey(
         User, 
@@ -157,4 +299,82 @@ class Alert(models.Model):
         verbose_name_plural = _('Alerts')
 
     def __str__(self):
-        return f"{self.user.email} - {self.name}"
\ No newline at end of file
+        return f"{self.user.email} - {self.name}"
+
+class SearchTerm(models.Model):
+    """Vocabulaire de l'index de recherche (termes normalisés : minuscules, sans accents, racinisés)"""
+    term = models.CharField(_('term'), max_length=64, unique=True)
+    document_count = models.PositiveIntegerField(_('document count'), default=0)
+
+    class Meta:
+        verbose_name = _('Search term')
+        verbose_name_plural = _('Search terms')
+
+    def __str__(self):
+        return self.term
+
+class SearchPosting(models.Model):
+    """Index inversé : présence pondérée d'un terme dans une propriété"""
+    term = models.ForeignKey(
+        SearchTerm,
+        on_delete=models.CASCADE,
+        related_name='postings',
+        verbose_name=_('term')
+    )
+    property = models.ForeignKey(
+        Property,
+        on_delete=models.CASCADE,
+        related_name='search_postings',
+        verbose_name=_('property')
+    )
+    weight = models.PositiveSmallIntegerField(_('weight'))
+
+    class Meta:
+        verbose_name = _('Search posting')
+        verbose_name_plural = _('Search postings')
+        unique_together = ['term', 'property']
+
+
+class PropertyChange(models.Model):
+    """Journal des changements pour la synchronisation incrémentale (voir properties.changelog).
+
+    Une ligne par propriété, réécrite à chaque changement : seq, croissant,
+    donne l'ordre des changements ; une propriété supprimée ou dépubliée
+    garde sa ligne 'remove' (tombstone).
+    """
+    KIND_CHOICES = [
+        ('upsert', _('Created or updated')),
+        ('remove', _('Removed')),
+    ]
+
+    seq = models.BigAutoField(primary_key=True)
+    property_id = models.UUIDField(_('property'), unique=True)
+    kind = models.CharField(_('kind'), max_length=6, choices=KIND_CHOICES)
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('Property change')
+        verbose_name_plural = _('Property changes')
+        ordering = ['seq']
+
+class ListingAggregate(models.Model):
+    """Agrégat des propriétés d'une ville, d'un type et d'un statut (voir properties.aggregates)"""
+    city = models.CharField(_('city'), max_length=100)
+    property_type = models.CharField(_('property type'), max_length=20, choices=Property.PROPERTY_TYPES)
+    status = models.CharField(_('status'), max_length=10, choices=Property.STATUS_CHOICES)
+    count = models.IntegerField(_('count'), default=0)
+    price_sum = models.DecimalField(_('price sum'), max_digits=20, decimal_places=2, default=0)
+    price_sketch = models.JSONField(
+        _('price sketch'),
+        default=dict,
+        help_text=_('Property count per logarithmic price bucket')
+    )
+    updated_at = models.DateTimeField(_('updated at'))
+
+    class Meta:
+        verbose_name = _('Listing aggregate')
+        verbose_name_plural = _('Listing aggregates')
+        unique_together = ['city', 'property_type', 'status']
+
+    def __str__(self):
+        return f"{self.city} / {self.property_type} / {self.status}: {self.count}"
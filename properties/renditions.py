@@ -0,0 +1,132 @@
+import fcntl
+import hashlib
+import os
+import threading
+from io import BytesIO
+
+from PIL import Image
+from django.conf import settings
+
+FORMATS = {
+    'jpeg': ('JPEG', 'image/jpeg'),
+    'webp': ('WEBP', 'image/webp'),
+    'png': ('PNG', 'image/png'),
+}
+
+class RenditionCache:
+    """Cache disque borné des rendus d'images, avec éviction LRU.
+
+    La date de modification des fichiers sert d'horodatage d'accès : elle est
+    rafraîchie à chaque lecture et les fichiers les plus anciens sont supprimés
+    quand la taille totale dépasse max_bytes. Les demandes concurrentes d'un
+    même rendu sont regroupées (verrou par clé dans le processus, flock entre
+    processus) pour ne redimensionner qu'une fois.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        # Verrous répartis par clé : bornés en mémoire, une clé donnée a toujours le même
+        self._locks = [threading.Lock() for _ in range(64)]
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def get_or_create(self, key, render):
+        """Retourne le chemin du rendu, en appelant render() une seule fois en cas d'absence"""
+        path = self.get(key)
+        if path:
+            return path
+
+        with self._key_lock(key):
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path_for(key) + '.lock', 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    # Un autre thread/processus a pu produire le rendu entre-temps
+                    path = self.get(key)
+                    if path:
+                        return path
+                    data = render()
+                    path = self.path_for(key)
+                    tmp_path = f"{path}.{os.getpid()}.tmp"
+                    with open(tmp_path, 'wb') as f:
+                        f.write(data)
+                    os.replace(tmp_path, path)
+                finally:
+                    os.unlink(lock_file.name)
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None):
+        """Supprime les rendus les moins récemment utilisés au-delà de max_bytes"""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.is_file() or entry.name.endswith(('.lock', '.tmp')):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+
+        # Descendre sous 90 % de la limite pour ne pas évincer à chaque écriture
+        target = self.max_bytes * 0.9
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+
+    def _key_lock(self, key):
+        return self._locks[hash(key) % len(self._locks)]
+
+def source_version(image_obj):
+    """Version du fichier source : change avec son nom de stockage (retraitement, dédoublonnage)"""
+    return hashlib.sha1(image_obj.image.name.encode()).hexdigest()[:12]
+
+def rendition_key(image_obj, width, fmt):
+    """Clé de cache : change quand le fichier source change"""
+    return f"{image_obj.id}-{source_version(image_obj)}-{width}.{fmt}"
+
+def render_rendition(image_obj, width, fmt):
+    """Redimensionne l'original à la largeur demandée (sans agrandissement)"""
+    pil_format, _ = FORMATS[fmt]
+    with image_obj.source_file().open('rb') as source:
+        img = Image.open(BytesIO(source.read()))
+        img.load()
+
+    if img.width > width:
+        height = max(1, round(img.height * width / img.width))
+        img = img.resize((width, height), Image.Resampling.LANCZOS)
+    if pil_format == 'JPEG' and img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+
+    buffer = BytesIO()
+    img.save(buffer, format=pil_format, quality=settings.PROPERTY_IMAGE_QUALITY)
+    return buffer.getvalue()
+
+_cache = None
+
+def get_rendition_cache():
+    global _cache
+    if _cache is None:
+        _cache = RenditionCache(settings.PROPERTY_IMAGE_CACHE_DIR, settings.PROPERTY_IMAGE_CACHE_MAX_BYTES)
+    return _cache
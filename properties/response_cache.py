@@ -0,0 +1,135 @@
+"""
+Cache des résultats de recherche de propriétés, dans le cache partagé (Redis).
+
+La clé combine l'espace (vue), les paramètres de filtre canonisés (ordre,
+casse, valeurs vides, écriture des nombres) et les versions de
+properties.versions dont dépend la requête : une écriture fait avancer la
+version de son type et du catalogue, les entrées calculées sur les
+anciennes versions ne sont plus lues et expirent d'elles-mêmes.
+"""
+import hashlib
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import async_cache, versions
+
+# Espaces suivis par les statistiques (tableau de bord)
+NAMESPACES = ('api:list', 'api:facets', 'list', 'home', 'home:recent')
+
+# Filtres en icontains : la casse et les espaces superflus ne changent pas le résultat
+TEXT_PARAMS = {'city', 'neighborhood', 'search'}
+NUMBER_PARAMS = {
+    'min_price', 'max_price', 'bedrooms', 'min_bedrooms', 'max_bedrooms',
+    'min_surface', 'max_surface',
+}
+
+def _normalize(name, value):
+    value = value.strip()
+    if name in TEXT_PARAMS:
+        return ' '.join(value.split()).casefold()
+    if name in NUMBER_PARAMS:
+        try:
+            number = Decimal(value)
+        except InvalidOperation:
+            return value
+        if number.is_finite():
+            return format(number.normalize(), 'f')
+    return value
+
+def canonical_query(params, allowed=None):
+    """Paramètres triés et normalisés, sans valeurs vides (ni paramètres hors allowed)"""
+    items = []
+    for name in sorted(params):
+        if allowed is not None and name not in allowed:
+            continue
+        values = [_normalize(name, value) for value in params.getlist(name)]
+        values = [value for value in values if value]
+        if values:
+            items.append((name, values))
+    return '&'.join(f'{name}={",".join(values)}' for name, values in items)
+
+def scopes_for(params):
+    """Un filtre de type ne dépend que de la version de ce type"""
+    property_types = [value for value in params.getlist('property_type') if value.strip()]
+    if len(property_types) == 1:
+        return [versions.type_scope(property_types[0].strip())]
+    return [versions.CATALOGUE]
+
+def cache_key(namespace, query, scopes, current=None):
+    if current is None:
+        current = versions.get_versions(scopes)
+    version = '-'.join(str(current[scope]) for scope in scopes)
+    digest = hashlib.md5(query.encode()).hexdigest()
+    return f'properties:response:{namespace}:{digest}:{version}'
+
+def _query(params, allowed, extra):
+    query = canonical_query(params, allowed)
+    return f'{extra}|{query}' if extra else query
+
+def get_or_set(namespace, params, compute, allowed=None, scopes=None, extra=''):
+    """Résultat en cache pour ces paramètres, sinon compute() mis en cache"""
+    scopes = scopes if scopes is not None else scopes_for(params)
+    key = cache_key(namespace, _query(params, allowed, extra), scopes)
+
+    value = cache.get(key)
+    if value is not None:
+        _count(namespace, 'hits')
+        return value
+    _count(namespace, 'misses')
+    value = compute()
+    cache.set(key, value, settings.PROPERTY_RESPONSE_CACHE_TIMEOUT)
+    return value
+
+async def aget_or_set(namespace, params, compute, allowed=None, scopes=None, extra=''):
+    """get_or_set pour les vues asynchrones : compute() est une coroutine"""
+    scopes = scopes if scopes is not None else scopes_for(params)
+    current = await versions.aget_versions(scopes)
+    key = cache_key(namespace, _query(params, allowed, extra), scopes, current)
+
+    value = await async_cache.get(key)
+    if value is not None:
+        await _acount(namespace, 'hits')
+        return value
+    await _acount(namespace, 'misses')
+    value = await compute()
+    await async_cache.set(key, value, settings.PROPERTY_RESPONSE_CACHE_TIMEOUT)
+    return value
+
+def _stats_key(namespace, kind):
+    return f'properties:response_cache:{kind}:{namespace}'
+
+def _count(namespace, kind):
+    key = _stats_key(namespace, kind)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Compteur absent (premier accès ou cache vidé)
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+async def _acount(namespace, kind):
+    key = _stats_key(namespace, kind)
+    try:
+        await async_cache.incr(key)
+    except ValueError:
+        if not await async_cache.add(key, 1, None):
+            await async_cache.incr(key)
+
+def stats():
+    """Succès / échecs par espace depuis le dernier vidage du cache (compteurs sans expiration)"""
+    keys = {(namespace, kind): _stats_key(namespace, kind) for namespace in NAMESPACES for kind in ('hits', 'misses')}
+    found = cache.get_many(list(keys.values()))
+    result = []
+    for namespace in NAMESPACES:
+        hits = found.get(keys[namespace, 'hits'], 0)
+        misses = found.get(keys[namespace, 'misses'], 0)
+        total = hits + misses
+        result.append({
+            'namespace': namespace,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(100 * hits / total, 1) if total else None,
+        })
+    return result
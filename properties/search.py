@@ -0,0 +1,279 @@
+"""
+Recherche plein texte des annonces sur un index inversé (SearchTerm / SearchPosting).
+
+Le texte est normalisé de la même façon à l'indexation et à la requête :
+minuscules, accents supprimés (« Yaoundé » = « yaounde »), mots vides
+français et anglais ignorés, pluriels ramenés au singulier. Chaque
+propriété est réindexée à l'enregistrement (properties.signals), seulement
+pour les termes qui ont changé.
+
+Une requête exige tous ses termes (ET). Un terme absent du vocabulaire
+est remplacé par les termes à une faute près (deux au-delà de 8 lettres)
+partageant ses deux premières lettres. Le score additionne, pour chaque
+terme, le poids du champ où il apparaît multiplié par son idf.
+"""
+import math
+import re
+import unicodedata
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, ExpressionWrapper, F, FloatField, OuterRef, Subquery, Sum, Value, When
+
+FIELD_WEIGHTS = {
+    'title': 3,
+    'city': 2,
+    'neighborhood': 2,
+    'description': 1,
+}
+# Au-delà, une répétition n'ajoute plus rien (descriptions bourrées de mots-clés)
+MAX_TERM_FREQUENCY = 3
+MAX_TERM_LENGTH = 64
+TYPO_FACTOR = 0.6
+TYPO_CANDIDATES = 200
+DOCUMENT_COUNT_KEY = 'properties:search:document_count'
+DOCUMENT_COUNT_TIMEOUT = 300
+
+STOP_WORDS = frozenset('''
+    a au aux avec ce ces cet cette d dans de des du elle en et il la le les l leur
+    ma mais me mes mon ne ni nos notre nous on ou par pas pour qu que qui s sa sans se
+    ses son sur ta te tes ton tres un une vos votre vous y
+    an and are as at be by for from in is it of on or the this to with
+'''.split())
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+def fold(text):
+    """Minuscules sans accents ni ligatures"""
+    text = text.replace('œ', 'oe').replace('Œ', 'oe').replace('æ', 'ae').replace('Æ', 'ae')
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+def stem(token):
+    """Pluriels français et anglais courants : bureaux -> bureau, locaux -> local, maisons -> maison"""
+    if len(token) > 4 and token.endswith('eaux'):
+        return token[:-1]
+    if len(token) > 4 and token.endswith('aux'):
+        return token[:-3] + 'al'
+    if len(token) > 3 and token[-1] in 'sx' and not token.endswith('ss') and not token.isdigit():
+        return token[:-1]
+    return token
+
+def tokenize(text):
+    terms = []
+    for token in _TOKEN_RE.findall(fold(text or '')):
+        if token in STOP_WORDS or (len(token) < 2 and not token.isdigit()):
+            continue
+        terms.append(stem(token)[:MAX_TERM_LENGTH])
+    return terms
+
+def document_terms(title, description, city, neighborhood):
+    """{terme: poids} d'une propriété ; fonction pure, utilisable en migration"""
+    fields = {'title': title, 'description': description, 'city': city, 'neighborhood': neighborhood}
+    weights = Counter()
+    for field, text in fields.items():
+        for term, frequency in Counter(tokenize(text)).items():
+            weights[term] += FIELD_WEIGHTS[field] * min(frequency, MAX_TERM_FREQUENCY)
+    return weights
+
+def query_terms(query):
+    return list(dict.fromkeys(tokenize(query)))
+
+def edit_distance(left, right, limit):
+    """Distance de Levenshtein, arrêtée dès qu'elle dépasse limit"""
+    if abs(len(left) - len(right)) > limit:
+        return limit + 1
+    previous = list(range(len(right) + 1))
+    for i, left_char in enumerate(left, 1):
+        current = [i]
+        for j, right_char in enumerate(right, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (left_char != right_char)
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+def index_property(property_obj):
+    index_properties([property_obj])
+
+def index_properties(properties):
+    """Met à jour les postings des propriétés : seuls les termes ajoutés, retirés ou repondérés sont écrits.
+
+    Le nombre de requêtes ne dépend pas du nombre de propriétés (écritures en masse).
+    """
+    from .models import SearchPosting, SearchTerm
+
+    properties = list(properties)
+    if not properties:
+        return
+    with transaction.atomic():
+        existing = {}
+        postings = SearchPosting.objects.filter(property__in=[property_obj.pk for property_obj in properties])
+        for posting in postings.select_related('term'):
+            existing.setdefault(posting.property_id, {})[posting.term.term] = posting
+
+        added, removed, changed = [], [], []
+        deltas = Counter()
+        for property_obj in properties:
+            weights = document_terms(
+                property_obj.title, property_obj.description, property_obj.city, property_obj.neighborhood
+            )
+            current = existing.get(property_obj.pk, {})
+            for term in weights.keys() - current.keys():
+                added.append((term, property_obj.pk, weights[term]))
+                deltas[term] += 1
+            for term in current.keys() - weights.keys():
+                removed.append(current[term])
+                deltas[term] -= 1
+            for term in weights.keys() & current.keys():
+                posting = current[term]
+                if posting.weight != weights[term]:
+                    posting.weight = weights[term]
+                    changed.append(posting)
+
+        if added:
+            new_terms = {term for term, _, _ in added}
+            SearchTerm.objects.bulk_create([SearchTerm(term=term) for term in new_terms], ignore_conflicts=True)
+            term_ids = dict(SearchTerm.objects.filter(term__in=new_terms).values_list('term', 'pk'))
+            SearchPosting.objects.bulk_create([
+                SearchPosting(term_id=term_ids[term], property_id=property_id, weight=weight)
+                for term, property_id, weight in added
+            ])
+        if removed:
+            SearchPosting.objects.filter(pk__in=[posting.pk for posting in removed]).delete()
+        if changed:
+            SearchPosting.objects.bulk_update(changed, ['weight'])
+
+        # Une requête par valeur d'écart (le plus souvent +1 et -1)
+        by_delta = {}
+        for term, delta in deltas.items():
+            if delta:
+                by_delta.setdefault(delta, []).append(term)
+        for delta, terms in by_delta.items():
+            SearchTerm.objects.filter(term__in=terms).update(document_count=F('document_count') + delta)
+
+def rebuild_index(property_model, term_model, posting_model, batch_size=5000):
+    """Reconstruit tout l'index. Les modèles sont passés en paramètre pour servir aussi en migration"""
+    posting_model.objects.all().delete()
+    term_model.objects.all().delete()
+    term_ids = {}
+    document_counts = Counter()
+    postings = []
+    properties = property_model.objects.only('id', 'title', 'description', 'city', 'neighborhood')
+    for property_obj in properties.iterator(chunk_size=1000):
+        weights = document_terms(
+            property_obj.title, property_obj.description, property_obj.city, property_obj.neighborhood
+        )
+        new_terms = [term for term in weights if term not in term_ids]
+        if new_terms:
+            term_model.objects.bulk_create([term_model(term=term) for term in new_terms])
+            term_ids.update(term_model.objects.filter(term__in=new_terms).values_list('term', 'pk'))
+        document_counts.update(weights.keys())
+        postings.extend(
+            posting_model(term_id=term_ids[term], property_id=property_obj.pk, weight=weight)
+            for term, weight in weights.items()
+        )
+        if len(postings) >= batch_size:
+            posting_model.objects.bulk_create(postings)
+            postings = []
+    posting_model.objects.bulk_create(postings)
+
+    terms = [term_model(pk=term_ids[term], term=term, document_count=count) for term, count in document_counts.items()]
+    term_model.objects.bulk_update(terms, ['document_count'], batch_size=batch_size)
+    return len(term_ids)
+
+def unindex_property(property_obj):
+    """Avant suppression : les postings partent en cascade, il reste à décompter leurs termes"""
+    from .models import SearchTerm
+
+    SearchTerm.objects.filter(postings__property=property_obj).update(document_count=F('document_count') - 1)
+
+def _document_count():
+    from .models import Property
+
+    total = cache.get(DOCUMENT_COUNT_KEY)
+    if total is None:
+        total = Property.objects.count()
+        cache.set(DOCUMENT_COUNT_KEY, total, DOCUMENT_COUNT_TIMEOUT)
+    return total
+
+def _variants(tokens):
+    """{token: {term_id: (document_count, facteur)}} ; vide si un token n'a aucun équivalent"""
+    from .models import SearchTerm
+
+    exact = {
+        term.term: term
+        for term in SearchTerm.objects.filter(term__in=tokens, document_count__gt=0)
+    }
+    variants = {}
+    for token in tokens:
+        if token in exact:
+            variants[token] = {exact[token].pk: (exact[token].document_count, 1.0)}
+            continue
+        if len(token) < 4:
+            return {}
+        limit = 2 if len(token) > 8 else 1
+        candidates = SearchTerm.objects.filter(
+            term__startswith=token[:2], document_count__gt=0
+        ).order_by('-document_count')[:TYPO_CANDIDATES]
+        found = {
+            term.pk: (term.document_count, TYPO_FACTOR)
+            for term in candidates
+            if edit_distance(token, term.term, limit) <= limit
+        }
+        if not found:
+            return {}
+        variants[token] = found
+    return variants
+
+def matches(query, queryset=None):
+    """Propriétés qui contiennent tous les termes : lignes {property_id, score} (sans tri ni limite).
+
+    None si la requête ne contient aucun terme.
+    """
+    from .models import SearchPosting
+
+    tokens = query_terms(query)
+    if not tokens:
+        return None
+    variants = _variants(tokens)
+    if not variants:
+        return SearchPosting.objects.none().values('property_id').annotate(score=Value(0.0, output_field=FloatField()))
+
+    total = max(_document_count(), 1)
+    scores, groups = [], []
+    for index, token_variants in enumerate(variants.values()):
+        for term_id, (document_count, factor) in token_variants.items():
+            idf = math.log(1 + total / max(document_count, 1)) * factor
+            scores.append(When(term_id=term_id, then=ExpressionWrapper(
+                F('weight') * Value(idf), output_field=FloatField()
+            )))
+        groups.append(When(term_id__in=list(token_variants), then=Value(index)))
+
+    postings = SearchPosting.objects.filter(term_id__in=[
+        term_id for token_variants in variants.values() for term_id in token_variants
+    ])
+    if queryset is not None:
+        postings = postings.filter(property__in=queryset.order_by().values('pk'))
+    return postings.values('property_id').annotate(
+        score=Sum(Case(*scores, default=Value(0.0), output_field=FloatField())),
+        matched=Count(Case(*groups), distinct=True),
+    ).filter(matched=len(variants))
+
+def rank(query, queryset):
+    """queryset réduit à toutes les propriétés trouvées, triées par pertinence ; None sans terme.
+
+    Le score est une sous-requête : le tri se fait en base, et une page
+    (LIMIT), un COUNT ou des facettes portent sur l'ensemble des résultats,
+    sans plafond.
+    """
+    ranked = matches(query, queryset)
+    if ranked is None:
+        return None
+    score = Subquery(ranked.filter(property_id=OuterRef('pk')).values('score')[:1], output_field=FloatField())
+    return queryset.filter(pk__in=ranked.values('property_id')).alias(search_score=score).order_by('-search_score', 'pk')
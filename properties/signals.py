@@ -1,11 +1,109 @@
-from django.db.models.signals import post_save
+from django.contrib.auth import get_user_model
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.dispatch import receiver
-from .models import Property
+from . import aggregates, changelog, search, versions
+from .models import Property, PropertyImage, Favorite
+from accounts.models import Profile
 from scraping.tasks import geocode_property
 
+User = get_user_model()
+
+# Champs du propriétaire sérialisés dans le détail de ses annonces (api.serializers)
+OWNER_FIELDS = {
+    User: ('email', 'first_name', 'last_name', 'is_partner'),
+    Profile: ('photo', 'phone_number', 'preferred_language', 'ui_theme', 'bio'),
+}
+
 @receiver(post_save, sender=Property)
 def property_post_save(sender, instance, created, **kwargs):
     """Déclenche des actions après la sauvegarde d'une propriété"""
     if created and instance.address and instance.city:
         # Lancer la tâche de géocodage si l'adresse est présente
-        geocode_property.delay(instance.id)
\ No newline at end of file
+        geocode_property.delay(instance.id)
+
+@receiver(pre_save, sender=Property)
+def property_pre_save(sender, instance, **kwargs):
+    """Retient l'état enregistré : un changement de type invalide aussi l'ancien,
+    les agrégats et les compteurs du dashboard passent de l'ancien état au nouveau"""
+    if instance.pk and not instance._state.adding:
+        instance._previous_state = Property.objects.filter(pk=instance.pk).values(*aggregates.STATE_FIELDS).first()
+        instance._previous_property_type = (instance._previous_state or {}).get('property_type')
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+def property_changed(sender, instance, **kwargs):
+    """Invalide les réponses (ETag, cache) calculées sur l'ancien catalogue"""
+    versions.bump_property_on_commit(instance.property_type, getattr(instance, '_previous_property_type', None))
+
+@receiver(post_save, sender=Property)
+def property_change_recorded(sender, instance, **kwargs):
+    """Nouveau seq pour la synchronisation incrémentale (tombstone si la propriété n'est plus publiée)"""
+    changelog.record_properties([instance])
+
+@receiver(post_delete, sender=Property)
+def property_tombstone(sender, instance, **kwargs):
+    changelog.record_on_commit([(instance.pk, changelog.REMOVE)])
+
+@receiver(post_save, sender=Property)
+def property_aggregated(sender, instance, created, **kwargs):
+    """Retire l'état enregistré de son agrégat (ville, type, statut), ajoute le nouveau au sien"""
+    before = None if created else getattr(instance, '_previous_state', None)
+    aggregates.record([(before, aggregates.property_state(instance))])
+
+@receiver(post_delete, sender=Property)
+def property_unaggregated(sender, instance, **kwargs):
+    aggregates.record([(aggregates.property_state(instance), None)])
+
+@receiver(post_save, sender=Property)
+def property_index(sender, instance, created, update_fields=None, **kwargs):
+    """Réindexe le texte de la propriété, sauf si les champs enregistrés n'en font pas partie"""
+    if created or update_fields is None or set(search.FIELD_WEIGHTS) & set(update_fields):
+        search.index_property(instance)
+
+@receiver(pre_delete, sender=Property)
+def property_unindex(sender, instance, **kwargs):
+    search.unindex_property(instance)
+
+@receiver(post_save, sender=PropertyImage)
+def property_image_post_save(sender, instance, **kwargs):
+    """Maintient l'image principale de la propriété (création, modification, is_primary)"""
+    instance.property.refresh_primary_image()
+    versions.bump_property_on_commit(instance.property.property_type)
+    changelog.record_properties([instance.property])
+
+@receiver(post_delete, sender=PropertyImage)
+def property_image_post_delete(sender, instance, **kwargs):
+    """Désigne une nouvelle image principale après la suppression d'une image"""
+    property_obj = Property.objects.filter(pk=instance.property_id).first()
+    if property_obj:
+        property_obj.refresh_primary_image()
+        versions.bump_property_on_commit(property_obj.property_type)
+        changelog.record_properties([property_obj])
+    else:
+        versions.bump_on_commit()
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def favorite_changed(sender, instance, **kwargs):
+    """is_favorited dépend de l'utilisateur : version propre à ses favoris"""
+    versions.bump_on_commit(versions.favorites_scope(instance.user_id))
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Profile)
+def owner_pre_save(sender, instance, update_fields=None, **kwargs):
+    """Retient les champs sérialisés avec les annonces (une connexion, qui ne touche que last_login, n'en lit aucun)"""
+    fields = OWNER_FIELDS[sender]
+    if instance._state.adding or (update_fields is not None and not set(fields) & set(update_fields)):
+        return
+    instance._previous_owner_state = sender.objects.filter(pk=instance.pk).values(*fields).first()
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Profile)
+def owner_changed(sender, instance, **kwargs):
+    """Le propriétaire est sérialisé avec ses annonces : le modifier invalide leurs réponses (ETag, cache)"""
+    previous = instance.__dict__.pop('_previous_owner_state', None)
+    if previous is None or all(getattr(instance, field) == previous[field] for field in OWNER_FIELDS[sender]):
+        return
+    owner_id = instance.pk if sender is User else instance.user_id
+    for property_type in set(Property.objects.filter(owner_id=owner_id).values_list('property_type', flat=True)):
+        versions.bump_property_on_commit(property_type)
@@ -1,31 +1,144 @@
 from celery import shared_task
 from PIL import Image
+from django.conf import settings
 from django.core.files.base import ContentFile
+from django.db.models import Q
 from io import BytesIO
 from .models import PropertyImage
+import hashlib
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
+RENDITION_FIELDS = ['image', 'thumbnail', 'original', 'renditions_version']
+
+def rendition_signature():
+    """Identifie les paramètres de rendu courants (taille, vignette, qualité)"""
+    max_w, max_h = settings.PROPERTY_IMAGE_MAX_SIZE
+    thumb_w, thumb_h = settings.PROPERTY_IMAGE_THUMBNAIL_SIZE
+    return f"{max_w}x{max_h}-{thumb_w}x{thumb_h}-q{settings.PROPERTY_IMAGE_QUALITY}"
+
+def perceptual_hash(img):
+    """dHash 64 bits : compare la luminosité des pixels voisins d'une réduction 9x8"""
+    small = img.convert('L').resize((9, 8), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+def image_fingerprint(data):
+    """Retourne (hash du contenu, hash perceptuel) des octets d'une image"""
+    return hashlib.sha256(data).hexdigest(), perceptual_hash(Image.open(BytesIO(data)))
+
+def render_image(data, max_size, thumbnail_size, quality):
+    """Calcule l'image redimensionnée et sa vignette à partir des octets source.
+
+    Fonction pure (sans accès à la base ni au stockage) pour pouvoir tourner
+    dans un pool de processus. Retourne (image, vignette) en octets.
+    """
+    img = Image.open(BytesIO(data))
+    img_format = img.format or 'JPEG'
+
+    # Redimensionner l'image principale
+    img.thumbnail(max_size, Image.Resampling.LANCZOS)
+    buffer = BytesIO()
+    img.save(buffer, format=img_format, quality=quality)
+
+    # Générer une vignette
+    thumb = img.copy()
+    thumb.thumbnail(thumbnail_size, Image.Resampling.LANCZOS)
+    thumb_buffer = BytesIO()
+    thumb.save(thumb_buffer, format=img_format, quality=quality)
+
+    return buffer.getvalue(), thumb_buffer.getvalue()
+
+def keep_original(image_obj):
+    """Au premier traitement, le fichier déposé devient l'original : les rendus suivants repartent de lui"""
+    if not image_obj.original:
+        image_obj.original.name = image_obj.image.name
+
+def save_renditions(image_obj, image_data, thumb_data):
+    """Enregistre les rendus d'une image et marque la version de rendu ; octets libérés dans le stockage"""
+    keep_original(image_obj)
+    old_names = {image_obj.image.name, image_obj.thumbnail.name}
+    image_name = os.path.basename(image_obj.image.name)
+    image_obj.image.save(image_name, ContentFile(image_data), save=False)
+    image_obj.thumbnail.save(f"thumb_{image_name}", ContentFile(thumb_data), save=False)
+    image_obj.renditions_version = rendition_signature()
+    image_obj.save(update_fields=RENDITION_FIELDS + PropertyImage.FINGERPRINT_FIELDS)
+
+    # Le stockage attribue un nouveau nom : supprimer les anciens fichiers
+    return delete_unreferenced_files(image_obj, old_names)
+
+def find_current_duplicate(image_obj):
+    """Autre image de même contenu dont les rendus sont à jour, s'il y en a une"""
+    if not image_obj.content_hash:
+        return None
+    return PropertyImage.objects.filter(
+        content_hash=image_obj.content_hash,
+        renditions_version=rendition_signature()
+    ).exclude(pk=image_obj.pk).exclude(thumbnail='').exclude(thumbnail__isnull=True).first()
+
+def reuse_renditions(image_obj, duplicate):
+    """Pointe une image vers les fichiers déjà traités d'un doublon exact (original compris) ; octets libérés"""
+    keep_original(image_obj)
+    old_names = {image_obj.image.name, image_obj.thumbnail.name, image_obj.original.name}
+    image_obj.image.name = duplicate.image.name
+    image_obj.thumbnail.name = duplicate.thumbnail.name
+    if duplicate.original:
+        image_obj.original.name = duplicate.original.name
+    image_obj.renditions_version = duplicate.renditions_version
+    image_obj.save(update_fields=RENDITION_FIELDS + PropertyImage.FINGERPRINT_FIELDS)
+    return delete_unreferenced_files(image_obj, old_names)
+
+def delete_unreferenced_files(image_obj, names):
+    """Supprime les anciens fichiers, sauf ceux encore partagés par une autre image ; octets libérés"""
+    names = set(names) - {None, '', image_obj.image.name, image_obj.thumbnail.name, image_obj.original.name}
+    storage = image_obj.image.storage
+    freed = 0
+    for name in names:
+        shared = PropertyImage.objects.filter(
+            Q(image=name) | Q(thumbnail=name) | Q(original=name)
+        ).exclude(pk=image_obj.pk).exists()
+        if not shared:
+            try:
+                freed += storage.size(name)
+            except OSError:
+                pass
+            storage.delete(name)
+    return freed
+
 @shared_task
 def process_images(image_id):
     """Redimensionne l'image et génère une vignette"""
     try:
         image_obj = PropertyImage.objects.get(id=image_id)
-        img = Image.open(image_obj.image)
-        
-        # Redimensionner l'image principale (max 1200x1200)
-        img.thumbnail((1200, 1200), Image.Resampling.LANCZOS)
-        buffer = BytesIO()
-        img.save(buffer, format=img.format or 'JPEG', quality=85)
-        image_name = os.path.basename(image_obj.image.name)
-        image_obj.image.save(image_name, ContentFile(buffer.getvalue()), save=True)
-        
-        # Générer une vignette (200x200)
-        thumb = img.copy()
-        thumb.thumbnail((200, 200), Image.Resampling.LANCZOS)
-        thumb_buffer = BytesIO()
-        thumb.save(thumb_buffer, format=img.format or 'JPEG', quality=85)
-        thumb_name = f"thumb_{image_name}"
-        image_obj.thumbnail.save(thumb_name, ContentFile(thumb_buffer.getvalue()), save=True)
-        
+        # Toujours depuis l'original : pas de recompression d'un rendu déjà réduit
+        with image_obj.source_file().open('rb') as source:
+            data = source.read()
+
+        content_hash, phash = image_fingerprint(data)
+        image_obj.content_hash = content_hash
+        image_obj.set_perceptual_hash(phash)
+
+        # Doublon exact déjà traité avec les réglages courants : réutiliser ses fichiers
+        duplicate = find_current_duplicate(image_obj)
+        if duplicate:
+            reuse_renditions(image_obj, duplicate)
+            return
+
+        image_data, thumb_data = render_image(
+            data,
+            settings.PROPERTY_IMAGE_MAX_SIZE,
+            settings.PROPERTY_IMAGE_THUMBNAIL_SIZE,
+            settings.PROPERTY_IMAGE_QUALITY
+        )
+        save_renditions(image_obj, image_data, thumb_data)
+
     except Exception as e:
-        print(f"Error processing image {image_id}: {str(e)}")
\ No newline at end of file
+        logger.error(f"Error processing image {image_id}: {str(e)}")
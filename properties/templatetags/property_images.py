@@ -0,0 +1,8 @@
+from django import template
+
+register = template.Library()
+
+@register.simple_tag
+def rendition_url(image, width, fmt='webp'):
+    """URL du rendu d'une image à la largeur voulue : {% rendition_url image 400 %}"""
+    return image.get_rendition_url(width, fmt)
@@ -1,11 +1,16 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework import status
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
-from properties.models import Property, Favorite
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from properties.models import Property, PropertyImage, Favorite
 from datetime import datetime
+import os
+import shutil
+import tempfile
 
 User = get_user_model()
 
@@ -133,4 +138,1939 @@ class FavoriteAPITest(TestCase):
         Favorite.objects.create(user=self.user, property=self.property)
         response = self.client.get(reverse('api:favorite-list'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertContains(response, 'Test House')
\ No newline at end of file
+        self.assertContains(response, 'Test House')
+
+def make_test_image(name='photo.png'):
+    from io import BytesIO
+    from PIL import Image
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    buffer = BytesIO()
+    Image.new('RGB', (64, 48), 'red').save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+def create_user(username, **fields):
+    """Utilisateur de test : email {username}@astremina.com, mot de passe test123"""
+    return User.objects.create_user(username=username, email=f'{username}@astremina.com', password='test123', **fields)
+
+def create_property(owner, **fields):
+    """Maison publiée à Douala ; fields remplace ces valeurs par défaut"""
+    defaults = {
+        'title': 'Test House', 'description': 'A house', 'property_type': 'house',
+        'price': 1000000, 'city': 'Douala', 'status': 'published',
+    }
+    return Property.objects.create(owner=owner, **{**defaults, **fields})
+
+class TemporaryMediaMixin:
+    """Fichiers déposés pendant les tests dans un MEDIA_ROOT temporaire, supprimé après la classe"""
+
+    @classmethod
+    def setUpClass(cls):
+        media_root = tempfile.mkdtemp()
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        cls.addClassCleanup(media_settings.disable)
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        super().setUpClass()
+
+class PropertyPrimaryImageTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        self.user = create_user('owner')
+        self.property = create_property(self.user, title='Image House', description='A house with images')
+
+    def test_primary_image_follows_images(self):
+        first = PropertyImage.objects.create(property=self.property, image=make_test_image())
+        self.property.refresh_from_db()
+        self.assertEqual(self.property.primary_image, first)
+
+        second = PropertyImage.objects.create(property=self.property, image=make_test_image(), is_primary=True)
+        self.property.refresh_from_db()
+        self.assertEqual(self.property.primary_image, second)
+
+        second.is_primary = False
+        second.save()
+        self.property.refresh_from_db()
+        self.assertEqual(self.property.primary_image, first)
+
+        first.delete()
+        self.property.refresh_from_db()
+        self.assertEqual(self.property.primary_image, second)
+
+        second.delete()
+        self.property.refresh_from_db()
+        self.assertIsNone(self.property.primary_image)
+
+    def test_list_query_count_is_constant(self):
+        def count_list_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = APIClient().get('/api/properties/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PropertyImage.objects.create(property=self.property, image=make_test_image())
+        single = count_list_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                other = create_property(self.user, title=f'Other House {i}', description='Another house', price=500000)
+                PropertyImage.objects.create(property=other, image=make_test_image())
+        self.assertEqual(count_list_queries(), single)
+
+class ReprocessImagesCommandTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        self.user = create_user('owner')
+        self.property = create_property(self.user, title='Image House', description='A house with images')
+        self.images = [
+            PropertyImage.objects.create(property=self.property, image=make_test_image())
+            for _ in range(3)
+        ]
+
+    def test_reprocess_and_skip_current(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from properties.tasks import rendition_signature
+
+        checkpoint = os.path.join(tempfile.mkdtemp(), 'checkpoint.json')
+        out = StringIO()
+        call_command('reprocess_images', workers=2, batch_size=2, checkpoint=checkpoint, stdout=out)
+        self.assertIn('3 images processed', out.getvalue())
+        for image_obj in self.images:
+            image_obj.refresh_from_db()
+            self.assertEqual(image_obj.renditions_version, rendition_signature())
+            self.assertTrue(image_obj.thumbnail)
+        self.assertFalse(os.path.exists(checkpoint))
+
+        out = StringIO()
+        call_command('reprocess_images', workers=2, checkpoint=checkpoint, stdout=out)
+        self.assertIn('0 images processed', out.getvalue())
+
+    def test_renders_from_the_kept_original(self):
+        from io import StringIO
+        from PIL import Image
+        from django.core.management import call_command
+
+        checkpoint = os.path.join(tempfile.mkdtemp(), 'checkpoint.json')
+        image_obj = self.images[0]
+        uploaded_name = image_obj.image.name
+        out = StringIO()
+        with self.settings(PROPERTY_IMAGE_MAX_SIZE=(32, 32)):
+            call_command('reprocess_images', workers=1, checkpoint=checkpoint, stdout=out)
+        image_obj.refresh_from_db()
+        self.assertEqual(image_obj.original.name, uploaded_name)
+        self.assertNotEqual(image_obj.image.name, uploaded_name)
+        # L'original est conservé : les rendus écrits s'ajoutent au stockage
+        written = sum(
+            image.image.size + image.thumbnail.size
+            for image in PropertyImage.objects.filter(pk__in=[image.pk for image in self.images])
+        )
+        self.assertIn(f'{-written / 1024:.1f} KiB saved', out.getvalue())
+        with image_obj.image.open('rb') as stored:
+            self.assertEqual(Image.open(stored).size, (32, 24))
+
+        # Réglages plus larges : le rendu repart de l'original (64x48), pas du rendu 32x24
+        with self.settings(PROPERTY_IMAGE_MAX_SIZE=(1200, 1200)):
+            call_command('reprocess_images', workers=1, checkpoint=checkpoint, force=True, stdout=StringIO())
+        image_obj.refresh_from_db()
+        self.assertEqual(image_obj.original.name, uploaded_name)
+        with image_obj.image.open('rb') as stored:
+            self.assertEqual(Image.open(stored).size, (64, 48))
+
+    def test_resume_from_checkpoint(self):
+        import json
+        from io import StringIO
+        from django.core.management import call_command
+        from properties.tasks import rendition_signature
+
+        checkpoint = os.path.join(tempfile.mkdtemp(), 'checkpoint.json')
+        with open(checkpoint, 'w') as f:
+            json.dump({'signature': rendition_signature(), 'last_id': self.images[0].id}, f)
+        out = StringIO()
+        call_command('reprocess_images', workers=1, checkpoint=checkpoint, stdout=out)
+        self.assertIn('2 images processed', out.getvalue())
+        self.images[0].refresh_from_db()
+        self.assertEqual(self.images[0].renditions_version, '')
+
+class ImageRenditionTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        from properties import renditions
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        renditions._cache = renditions.RenditionCache(self.cache_dir, 10 * 1024 * 1024)
+        self.addCleanup(setattr, renditions, '_cache', None)
+
+        self.user = create_user('owner')
+        self.property = create_property(self.user, title='Image House', description='A house with images')
+        self.image = PropertyImage.objects.create(property=self.property, image=make_test_image())
+
+    def test_rendition_is_generated_and_cached(self):
+        url = self.image.get_rendition_url(200, 'webp')
+        # L'image et son original (source du rendu) en une requête
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+    def test_rendition_urls_are_exposed(self):
+        from rest_framework.test import APIClient
+
+        data = APIClient().get(f'/api/properties/{self.property.pk}/').json()
+        self.assertEqual(
+            data['images'][0]['renditions']['400'],
+            'http://testserver' + self.image.get_rendition_url(400)
+        )
+
+        response = self.client.get(reverse('properties:detail', kwargs={'slug': self.property.slug}))
+        self.assertContains(response, self.image.get_rendition_url(200))
+
+    def test_replaced_source_gets_a_new_url(self):
+        url = self.image.get_rendition_url(200, 'webp')
+        self.image.image = make_test_image()
+        self.image.save()
+        new_url = self.image.get_rendition_url(200, 'webp')
+        self.assertNotEqual(new_url, url)
+
+        # Une ancienne URL (page en cache) renvoie vers le rendu courant, sans cache long
+        response = self.client.get(url)
+        self.assertRedirects(response, new_url, fetch_redirect_response=False)
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get(new_url).status_code, 200)
+
+    def test_rendition_evicted_before_open_is_rendered_again(self):
+        from unittest import mock
+        from properties import renditions
+
+        cache = renditions.get_rendition_cache()
+        get_or_create = cache.get_or_create
+        missing = os.path.join(self.cache_dir, 'evicted.webp')
+        calls = []
+
+        def evicted_once(key, render):
+            calls.append(key)
+            return missing if len(calls) == 1 else get_or_create(key, render)
+
+        with mock.patch.object(cache, 'get_or_create', side_effect=evicted_once):
+            response = self.client.get(self.image.get_rendition_url(200, 'webp'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(calls), 2)
+
+    def test_rendition_whitelist(self):
+        response = self.client.get(self.image.get_rendition_url(333, 'webp'))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(self.image.get_rendition_url(200, 'gif'))
+        self.assertEqual(response.status_code, 404)
+
+    def test_concurrent_requests_render_once(self):
+        import threading
+        import time
+        from properties.renditions import RenditionCache
+
+        cache = RenditionCache(self.cache_dir, 1024 * 1024)
+        calls = []
+
+        def render():
+            calls.append(1)
+            time.sleep(0.05)
+            return b'rendition'
+
+        threads = [threading.Thread(target=cache.get_or_create, args=('key.webp', render)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+
+    def test_least_recently_used_is_evicted(self):
+        from properties.renditions import RenditionCache
+
+        cache = RenditionCache(self.cache_dir, 250)
+        cache.get_or_create('a', lambda: b'a' * 100)
+        cache.get_or_create('b', lambda: b'b' * 100)
+        os.utime(cache.path_for('a'), (0, 0))
+        os.utime(cache.path_for('b'), (1, 1))
+        cache.get('a')
+        cache.get_or_create('c', lambda: b'c' * 100)
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+
+class ImageFingerprintTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        self.user = create_user('owner')
+        self.property = create_property(self.user, title='Image House', description='A house with images')
+
+    def make_gradient_image(self, name='gradient.png', fmt='PNG', size=(128, 96)):
+        from io import BytesIO
+        from PIL import Image
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        import math
+        width, height = size
+        img = Image.new('L', size)
+        img.putdata([
+            int(127 + 64 * math.sin(9 * x / width) + 63 * math.cos(7 * y / height))
+            for y in range(height) for x in range(width)
+        ])
+        img = img.convert('RGB')
+        buffer = BytesIO()
+        img.save(buffer, format=fmt)
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type=f'image/{fmt.lower()}')
+
+    def test_exact_duplicate_reuses_renditions(self):
+        from properties.tasks import process_images
+        first = PropertyImage.objects.create(property=self.property, image=self.make_gradient_image())
+        process_images(first.id)
+        first.refresh_from_db()
+
+        second = PropertyImage.objects.create(property=self.property, image=self.make_gradient_image())
+        uploaded_name = second.image.name
+        process_images(second.id)
+        second.refresh_from_db()
+
+        self.assertEqual(second.content_hash, first.content_hash)
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(second.thumbnail.name, first.thumbnail.name)
+        self.assertEqual(second.original.name, first.original.name)
+        self.assertFalse(second.image.storage.exists(uploaded_name))
+        self.assertTrue(first.original.storage.exists(first.original.name))
+
+    def test_new_upload_replaces_the_original(self):
+        from properties.tasks import process_images
+        image_obj = PropertyImage.objects.create(property=self.property, image=self.make_gradient_image())
+        process_images(image_obj.id)
+        image_obj.refresh_from_db()
+        self.assertTrue(image_obj.original)
+
+        image_obj.image = make_test_image('new.png')
+        image_obj.save()
+        self.assertFalse(image_obj.original)
+        process_images(image_obj.id)
+        image_obj.refresh_from_db()
+        self.assertTrue(image_obj.original.name.startswith('properties/new'))
+
+    def test_near_duplicates_by_perceptual_hash(self):
+        from properties.tasks import process_images
+        original = PropertyImage.objects.create(property=self.property, image=self.make_gradient_image())
+        resized = PropertyImage.objects.create(
+            property=self.property,
+            image=self.make_gradient_image('resized.jpg', fmt='JPEG', size=(256, 192))
+        )
+        other = PropertyImage.objects.create(property=self.property, image=make_test_image())
+        for image_obj in (original, resized, other):
+            process_images(image_obj.id)
+            image_obj.refresh_from_db()
+
+        self.assertNotEqual(original.content_hash, resized.content_hash)
+        matches = [image for image, distance in original.near_duplicates()]
+        self.assertIn(resized, matches)
+        self.assertNotIn(other, matches)
+
+class FavoriteBatchLookupTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user('visitor')
+        self.client.force_authenticate(user=self.user)
+        self.properties = []
+        self.add_properties(2)
+
+    def add_properties(self, count):
+        for _ in range(count):
+            index = len(self.properties)
+            property_obj = create_property(
+                self.user,
+                title=f'House {index}',
+                price=1000000 + index,
+                latitude=4.05,
+                longitude=9.7
+            )
+            self.properties.append(property_obj)
+            if index % 2 == 0:
+                Favorite.objects.create(user=self.user, property=property_obj)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response.json()
+
+    def test_list_favorites_in_constant_queries(self):
+        bbox_url = '/api/properties/search_by_bbox/?min_lat=0&min_lng=0&max_lat=10&max_lng=10'
+        list_queries, _ = self.count_queries('/api/properties/')
+        bbox_queries, _ = self.count_queries(bbox_url)
+        self.add_properties(5)
+
+        queries, data = self.count_queries('/api/properties/')
+        self.assertEqual(queries, list_queries)
+        favorited = {item['title']: item['is_favorited'] for item in data['results']}
+        self.assertTrue(favorited['House 0'])
+        self.assertFalse(favorited['House 1'])
+
+        queries, data = self.count_queries(bbox_url)
+        self.assertEqual(queries, bbox_queries)
+        self.assertEqual(sum(item['is_favorited'] for item in data), 4)
+
+    def test_detail_is_favorited(self):
+        _, data = self.count_queries(f'/api/properties/{self.properties[0].id}/')
+        self.assertTrue(data['is_favorited'])
+        _, data = self.count_queries(f'/api/properties/{self.properties[1].id}/')
+        self.assertFalse(data['is_favorited'])
+
+    def test_anonymous_is_not_favorited(self):
+        self.client.force_authenticate(user=None)
+        _, data = self.count_queries('/api/properties/')
+        self.assertFalse(any(item['is_favorited'] for item in data['results']))
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user('owner')
+        for index in range(7):
+            create_property(
+                self.user,
+                title=f'House {index}',
+                price=1000 * (index % 3),
+                latitude=4.05,
+                longitude=9.7
+            )
+
+    def walk(self, url):
+        ids = []
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            pages.append(data)
+            ids.extend(item['id'] for item in data['results'])
+            url = data['next']
+        return ids, pages
+
+    def test_walks_every_row_once_in_order(self):
+        ids, pages = self.walk('/api/properties/?page_size=3')
+        expected = [str(pk) for pk in Property.objects.order_by('-created_at', '-id').values_list('id', flat=True)]
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(pages), 3)
+        self.assertNotIn('count', pages[0])
+
+        ids, _ = self.walk('/api/properties/?page_size=2&ordering=price')
+        expected = [str(pk) for pk in Property.objects.order_by('price', 'id').values_list('id', flat=True)]
+        self.assertEqual(ids, expected)
+
+    def test_previous_link_returns_previous_page(self):
+        first = self.client.get('/api/properties/?page_size=3&ordering=-price').json()
+        second = self.client.get(first['next']).json()
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+
+    def test_page_cost_does_not_depend_on_depth(self):
+        def count(url):
+            with CaptureQueriesContext(connection) as queries:
+                data = self.client.get(url).json()
+            return len(queries), data
+        first_queries, data = count('/api/properties/?page_size=2')
+        deep_queries, _ = count(data['next'])
+        self.assertEqual(first_queries, deep_queries)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/properties/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_legacy_page_number(self):
+        data = self.client.get('/api/properties/?page=1').json()
+        self.assertEqual(data['count'], 7)
+
+    def test_page_number_is_default(self):
+        data = self.client.get('/api/properties/').json()
+        self.assertEqual(data['count'], 7)
+        self.assertEqual(len(data['results']), 7)
+        self.assertIsNone(data['next'])
+
+    def test_bbox_paginates_on_request(self):
+        url = '/api/properties/search_by_bbox/?min_lat=0&min_lng=0&max_lat=10&max_lng=10'
+        self.assertEqual(len(self.client.get(url).json()), 7)
+        ids, pages = self.walk(url + '&page_size=4')
+        self.assertEqual(len(ids), 7)
+        self.assertEqual(len(pages), 2)
+
+class MapClusterTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user('owner')
+        # Deux groupes éloignés : Douala (3) et Yaoundé (2)
+        points = [
+            ('Douala', 4.0511, 9.7679, 100), ('Douala', 4.0520, 9.7690, 300), ('Douala', 4.0530, 9.7700, 200),
+            ('Yaoundé', 3.8480, 11.5021, 500), ('Yaoundé', 3.8490, 11.5030, 700),
+        ]
+        for index, (city, latitude, longitude, price) in enumerate(points):
+            create_property(
+                self.user,
+                title=f'House {index}',
+                price=price,
+                city=city,
+                latitude=latitude,
+                longitude=longitude
+            )
+        self.bbox = 'min_lat=2&min_lng=8&max_lat=6&max_lng=13'
+
+    def test_geohash_is_maintained(self):
+        from properties import geo
+        property_obj = Property.objects.get(title='House 0')
+        self.assertEqual(property_obj.geohash, geo.encode(4.0511, 9.7679))
+        self.assertEqual(geo.encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+
+        property_obj.latitude = None
+        property_obj.save()
+        self.assertEqual(property_obj.geohash, '')
+
+    def test_clusters_at_city_zoom(self):
+        response = self.client.get(f'/api/properties/clusters/?{self.bbox}&zoom=9')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data['markers'], [])
+        clusters = sorted(data['clusters'], key=lambda cluster: cluster['count'])
+        self.assertEqual([cluster['count'] for cluster in clusters], [2, 3])
+        self.assertEqual(clusters[1]['min_price'], 100)
+        self.assertEqual(clusters[1]['max_price'], 300)
+        self.assertAlmostEqual(clusters[0]['latitude'], 3.8485, places=4)
+
+    def test_bbox_is_prefiltered_by_geohash_prefix(self):
+        from properties import geo
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get('/api/properties/clusters/?min_lat=4&min_lng=9.5&max_lat=4.2&max_lng=9.9&zoom=9').json()
+        self.assertEqual([cluster['count'] for cluster in data['clusters']], [3])
+        sql = queries.captured_queries[-1]['sql']
+        for prefix in geo.cover(4, 9.5, 4.2, 9.9):
+            self.assertIn(f"LIKE '{prefix}%'", sql)
+
+        # Box collée à Douala : la couverture ne retire que des voisines, les bords sont filtrés exactement
+        data = self.client.get('/api/properties/search_by_bbox/?min_lat=4.0515&min_lng=9.76&max_lat=4.06&max_lng=9.78').json()
+        self.assertEqual(sorted(item['title'] for item in data), ['House 1', 'House 2'])
+
+    def test_markers_at_high_zoom(self):
+        response = self.client.get(f'/api/properties/clusters/?{self.bbox}&zoom=16')
+        data = response.json()
+        self.assertEqual(data['clusters'], [])
+        self.assertEqual(len(data['markers']), 5)
+
+    def test_compact_columns(self):
+        response = self.client.get(f'/api/properties/search_by_bbox/?{self.bbox}&compact=columns')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data['count'], 5)
+        self.assertEqual(set(data), {'count', 'types', 'id', 'lat', 'lng', 'price', 'type'})
+        cheapest = data['price'].index(100)
+        self.assertEqual(data['id'][cheapest], str(Property.objects.get(title='House 0').id))
+        self.assertAlmostEqual(data['lat'][cheapest], 4.0511, places=6)
+        self.assertEqual(data['types'][data['type'][cheapest]], 'house')
+        
+        # Même format dans les marqueurs du zoom rapproché
+        data = self.client.get(f'/api/properties/clusters/?{self.bbox}&zoom=16&compact').json()
+        self.assertEqual(data['clusters'], [])
+        self.assertEqual(data['markers']['count'], 5)
+
+    def test_compact_binary(self):
+        import struct
+        import uuid
+        from api import markers
+
+        response = self.client.get(f'/api/properties/search_by_bbox/?{self.bbox}&compact=binary')
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        self.assertEqual(response['X-Marker-Types'].split(','), markers.TYPE_NAMES)
+        magic, count = markers.HEADER.unpack_from(response.content)
+        self.assertEqual((magic, count), (b'AMK1', 5))
+        self.assertEqual(len(response.content), markers.HEADER.size + 5 * markers.RECORD.size)
+        
+        records = struct.iter_unpack(markers.RECORD.format, response.content[markers.HEADER.size:])
+        decoded = {uuid.UUID(bytes=raw_id): (lat, price, code) for raw_id, lat, lng, price, code in records}
+        property_obj = Property.objects.get(title='House 3')
+        lat, price, code = decoded[property_obj.id]
+        self.assertAlmostEqual(lat, 3.8480, places=5)
+        self.assertEqual(price, 500)
+        self.assertEqual(markers.TYPE_NAMES[code], 'house')
+
+    def test_compact_is_smaller(self):
+        from properties.management.commands.benchmark_map_markers import (
+            encode_binary, encode_columns, encode_serializer, sample_properties
+        )
+        properties = sample_properties(500)
+        full = len(encode_serializer(properties))
+        self.assertLess(len(encode_columns(properties)) * 4, full)
+        self.assertLess(len(encode_binary(properties)) * 10, full)
+
+    def test_invalid_compact_format(self):
+        response = self.client.get(f'/api/properties/search_by_bbox/?{self.bbox}&compact=xml')
+        self.assertEqual(response.status_code, 400)
+
+    def test_missing_parameters(self):
+        self.assertEqual(self.client.get('/api/properties/clusters/?zoom=5').status_code, 400)
+        self.assertEqual(self.client.get(f'/api/properties/clusters/?{self.bbox}').status_code, 400)
+
+
+class NearbySearchTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user('owner')
+        self.center = (4.0511, 9.7679)
+        # ~0.5 km, ~1.6 km, ~3.3 km du centre, puis Yaoundé (~190 km)
+        points = [
+            ('Near', 4.0556, 9.7679, 'house'), ('Mid', 4.0511, 9.7824, 'apartment'),
+            ('Far', 4.0811, 9.7679, 'house'), ('Yaounde', 3.8480, 11.5021, 'house'),
+        ]
+        for title, latitude, longitude, property_type in points:
+            create_property(
+                self.user,
+                title=title,
+                property_type=property_type,
+                price=100,
+                latitude=latitude,
+                longitude=longitude
+            )
+
+    def get(self, query):
+        return self.client.get(f'/api/properties/nearby/?lat={self.center[0]}&lng={self.center[1]}&{query}')
+
+    def test_radius_sorted_by_distance(self):
+        response = self.get('radius=2')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual([item['title'] for item in data], ['Near', 'Mid'])
+        self.assertAlmostEqual(data[0]['distance'], 0.5, places=1)
+        self.assertAlmostEqual(data[1]['distance'], 1.6, places=1)
+
+    def test_radius_returns_every_listing_and_paginates_on_request(self):
+        data = self.get('radius=5&limit=1').json()
+        self.assertEqual([item['title'] for item in data], ['Near', 'Mid', 'Far'])
+
+        first = self.get('radius=5&page_size=2').json()
+        self.assertEqual(first['count'], 3)
+        self.assertEqual([item['title'] for item in first['results']], ['Near', 'Mid'])
+        second = self.client.get(first['next']).json()
+        self.assertEqual([item['title'] for item in second['results']], ['Far'])
+        self.assertAlmostEqual(second['results'][0]['distance'], 3.3, places=1)
+
+    def test_nearest_expands_radius(self):
+        data = self.get('limit=3').json()
+        self.assertEqual([item['title'] for item in data], ['Near', 'Mid', 'Far'])
+        # Yaoundé est au-delà de PROPERTY_NEARBY_MAX_RADIUS_KM
+        self.assertEqual(len(self.get('limit=20').json()), 3)
+        self.assertEqual([item['title'] for item in self.get('limit=20&property_type=house').json()], ['Near', 'Far'])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get('/api/properties/nearby/?lat=4').status_code, 400)
+        self.assertEqual(self.get('radius=-1').status_code, 400)
+        self.assertEqual(self.client.get('/api/properties/nearby/?lat=95&lng=9').status_code, 400)
+
+    def test_prefilter_matches_brute_force(self):
+        import random
+        from properties import geo
+
+        rng = random.Random(1)
+        Property.objects.bulk_create([
+            Property(
+                title=f'Random {index}',
+                slug=f'random-{index}',
+                description='A house',
+                property_type='house',
+                price=100,
+                city='Douala',
+                latitude=round(self.center[0] + rng.uniform(-0.2, 0.2), 6),
+                longitude=round(self.center[1] + rng.uniform(-0.2, 0.2), 6),
+                geohash='',
+                owner=self.user,
+                status='published'
+            )
+            for index in range(300)
+        ])
+        for property_obj in Property.objects.filter(geohash=''):
+            property_obj.save(update_fields=['latitude', 'longitude'])
+
+        queryset = Property.objects.all()
+        for radius in (0.3, 2, 7, 15):
+            expected = sorted(
+                (distance, key) for distance, key in geo.distances_km(
+                    *self.center, queryset.values_list('id', 'latitude', 'longitude')
+                ) if distance <= radius
+            )
+            self.assertEqual(geo.within_radius(queryset, *self.center, radius), expected)
+
+    def test_cover_and_haversine(self):
+        from properties import geo
+
+        # Paris - Londres : ~344 km
+        (distance, _), = geo.distances_km(48.8566, 2.3522, [(None, 51.5074, -0.1278)])
+        self.assertAlmostEqual(distance, 343.5, delta=1)
+        cells = geo.cover(*geo.bounding_box(*self.center, 2))
+        self.assertLessEqual(len(cells), geo.MAX_COVER_CELLS)
+        self.assertTrue(any(geo.encode(*self.center).startswith(cell) for cell in cells))
+        self.assertEqual(geo.cover(-90, -180, 90, 180), [])
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user('owner')
+        self.property = create_property(self.user)
+        self.detail_url = f'/api/properties/{self.property.id}/'
+
+    def test_list_not_modified_without_queries(self):
+        response = self.client.get('/api/properties/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/properties/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+        # Une autre page ou d'autres filtres ont leur propre ETag
+        self.assertNotEqual(self.client.get('/api/properties/?city=Douala')['ETag'], etag)
+
+    def test_write_invalidates(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.property.price = 900000
+            self.property.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['price'], '900000.00')
+
+    def test_contract_expiration_invalidates(self):
+        from datetime import date
+        from partners.models import Partner, Contract
+        from scraping.tasks import check_contract_expirations
+
+        etag = self.client.get('/api/properties/')['ETag']
+        partner = Partner.objects.create(
+            user=self.user, company_name='Agence', address='Akwa',
+            contact_email='agence@astremina.com', contact_phone='600000000'
+        )
+        Contract.objects.create(partner=partner, start_date=date(2020, 1, 1), end_date=date(2020, 12, 31))
+        with self.captureOnCommitCallbacks(execute=True):
+            check_contract_expirations()
+        response = self.client.get('/api/properties/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_favorites_are_per_user(self):
+        self.client.force_authenticate(user=self.user)
+        etag = self.client.get(self.detail_url)['ETag']
+        self.client.force_authenticate(user=None)
+        self.assertNotEqual(self.client.get(self.detail_url)['ETag'], etag)
+
+        self.client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            Favorite.objects.create(user=self.user, property=self.property)
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()['is_favorited'])
+
+    def test_if_modified_since_is_not_compared(self):
+        # À la seconde près, une écriture de la même seconde rendrait un 304 périmé
+        last_modified = self.client.get('/api/properties/')['Last-Modified']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.property.price = 900000
+            self.property.save()
+        response = self.client.get('/api/properties/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_owner_changes_invalidate(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        self.client.login(username='owner', password='test123')
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Awa'
+            self.user.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['owner']['first_name'], 'Awa')
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.profile.bio = 'Agence immobilière'
+            self.user.profile.save()
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_missing_property_has_no_validators(self):
+        response = self.client.get('/api/properties/00000000-0000-0000-0000-000000000000/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(response.has_header('ETag'))
+
+
+class ResponseCacheTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from properties import response_cache
+
+        cache.clear()
+        self.response_cache = response_cache
+        self.client = APIClient()
+        self.user = create_user('owner')
+        self.house = self.create_property('House', 'house')
+        self.apartment = self.create_property('Apartment', 'apartment')
+
+    def create_property(self, title, property_type):
+        return create_property(self.user, title=title, description='A property', property_type=property_type)
+
+    def stats(self, namespace):
+        return next(entry for entry in self.response_cache.stats() if entry['namespace'] == namespace)
+
+    def test_canonical_query(self):
+        from django.http import QueryDict
+
+        canonical = self.response_cache.canonical_query
+        self.assertEqual(
+            canonical(QueryDict('city=%20DOUALA&min_price=50000.00&bedrooms=&property_type=house')),
+            canonical(QueryDict('property_type=house&min_price=5E4&city=douala'))
+        )
+        self.assertNotEqual(canonical(QueryDict('city=douala')), canonical(QueryDict('city=yaounde')))
+        self.assertEqual(canonical(QueryDict('utm_source=x&page=2'), allowed={'page'}), 'page=2')
+
+    def test_api_list_served_from_cache(self):
+        first = self.client.get('/api/properties/?property_type=house&city=Douala')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/properties/?city=%20douala&property_type=house')
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(self.stats('api:list')['hits'], 1)
+        self.assertEqual(self.stats('api:list')['misses'], 1)
+
+        # Les utilisateurs connectés ne passent pas par le cache
+        self.client.force_authenticate(user=self.user)
+        self.client.get('/api/properties/?property_type=house&city=Douala')
+        self.assertEqual(self.stats('api:list')['hits'], 1)
+
+    def test_writes_bump_only_relevant_types(self):
+        self.client.get('/api/properties/?property_type=house')
+        self.client.get('/api/properties/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_property('Second apartment', 'apartment')
+        with self.assertNumQueries(0):
+            self.client.get('/api/properties/?property_type=house')
+        self.assertEqual(len(self.client.get('/api/properties/').json()['results']), 3)
+
+        # Changer de type invalide l'ancien type comme le nouveau
+        with self.captureOnCommitCallbacks(execute=True):
+            self.house.property_type = 'villa'
+            self.house.save()
+        self.assertEqual(self.client.get('/api/properties/?property_type=house').json()['results'], [])
+
+    def test_bump_waits_for_commit(self):
+        from django.db import transaction
+        from properties import versions
+
+        scopes = [versions.CATALOGUE, versions.type_scope('house')]
+        before = versions.get_versions(scopes)
+        self.client.get('/api/properties/?property_type=house')
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.house.title = 'Renamed house'
+                self.house.save()
+                # Avant le commit, une lecture concurrente ne voit pas encore la nouvelle version :
+                # rien n'est mis en cache sous une version dont les lignes ne sont pas visibles
+                self.assertEqual(versions.get_versions(scopes), before)
+        after = versions.get_versions(scopes)
+        self.assertTrue(all(after[scope] > before[scope] for scope in scopes))
+        results = self.client.get('/api/properties/?property_type=house').json()['results']
+        self.assertEqual([item['title'] for item in results], ['Renamed house'])
+
+    def test_html_pages_cached(self):
+        self.client.get('/properties/?city=Douala')
+        self.client.get('/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/properties/?city=DOUALA&utm_source=mail')
+        self.assertContains(response, 'House')
+        with self.assertNumQueries(0):
+            self.client.get('/')
+        self.assertEqual(self.stats('list')['hit_rate'], 50.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_property('New villa', 'villa')
+        self.assertContains(self.client.get('/properties/?city=Douala'), 'New villa')
+
+
+class SearchEngineTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user('owner')
+        self.villa = self.create_property('Belle villa à Yaoundé', 'Grande villa avec piscine', 'Yaoundé', 'house')
+        self.flat = self.create_property('Appartement meublé', 'Deux chambres, proche des écoles', 'Yaoundé', 'apartment')
+        self.house = self.create_property('Maison avec jardin', 'A 20 minutes de Yaounde', 'Douala', 'house')
+
+    def create_property(self, title, description, city, property_type):
+        return create_property(
+            self.user,
+            title=title,
+            description=description,
+            property_type=property_type,
+            city=city
+        )
+
+    def search(self, query):
+        response = self.client.get('/api/properties/', {'search': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['title'] for item in response.json()['results']]
+
+    def test_normalization(self):
+        from properties.search import tokenize
+
+        self.assertEqual(tokenize("L'appartement des Écoles à Yaoundé"), ['appartement', 'ecole', 'yaounde'])
+        self.assertEqual(tokenize('bureaux locaux maisons'), ['bureau', 'local', 'maison'])
+
+    def test_accents_and_ranking(self):
+        # Titre et ville pèsent plus que la description
+        self.assertEqual(self.search('yaounde'), ['Belle villa à Yaoundé', 'Appartement meublé', 'Maison avec jardin'])
+        self.assertEqual(self.search('YAOUNDÉ villa'), ['Belle villa à Yaoundé'])
+        self.assertEqual(self.search('appartements meublés'), ['Appartement meublé'])
+        self.assertEqual(self.search('yaounde chateau'), [])
+
+    def test_typo_tolerance(self):
+        self.assertEqual(self.search('apartement'), ['Appartement meublé'])
+        self.assertEqual(self.search('piscyne'), ['Belle villa à Yaoundé'])
+
+    def test_combined_with_filters(self):
+        response = self.client.get('/api/properties/', {'search': 'yaounde', 'property_type': 'house'})
+        self.assertEqual(
+            [item['title'] for item in response.json()['results']],
+            ['Belle villa à Yaoundé', 'Maison avec jardin']
+        )
+
+    def test_every_match_is_counted_and_paginated(self):
+        for index in range(25):
+            self.create_property(f'Studio {index}', 'Studio meublé', 'Douala', 'apartment')
+        for index in range(5):
+            self.create_property(f'Chambre {index}', 'Proche du studio photo', 'Douala', 'apartment')
+
+        first = self.client.get('/api/properties/', {'search': 'studio'}).json()
+        self.assertEqual(first['count'], 30)
+        second = self.client.get(first['next']).json()
+        self.assertIsNone(second['next'])
+        titles = [item['title'] for item in first['results'] + second['results']]
+        self.assertEqual(len(set(titles)), 30)
+        # Titre avant description, sur toutes les pages
+        self.assertTrue(all(title.startswith('Studio') for title in titles[:25]))
+        self.assertTrue(all(title.startswith('Chambre') for title in titles[25:]))
+
+    def test_incremental_index(self):
+        from properties.models import SearchTerm
+
+        self.assertEqual(SearchTerm.objects.get(term='maison').document_count, 1)
+        self.house.title = 'Duplex avec jardin'
+        self.house.save()
+        self.assertEqual(SearchTerm.objects.get(term='maison').document_count, 0)
+        self.assertEqual(self.search('maison'), [])
+        self.assertEqual(self.search('duplex'), ['Duplex avec jardin'])
+
+        # Un enregistrement qui ne touche pas au texte ne réindexe pas
+        with self.assertNumQueries(2):
+            self.house.save(update_fields=['price'])
+
+        self.villa.delete()
+        self.assertEqual(SearchTerm.objects.get(term='piscine').document_count, 0)
+        self.assertEqual(SearchTerm.objects.get(term='yaounde').document_count, 2)
+
+    def test_rebuild_command(self):
+        from django.core.management import call_command
+        from io import StringIO
+        from properties.models import SearchPosting, SearchTerm
+
+        before = sorted(SearchPosting.objects.values_list('term__term', 'property_id', 'weight'))
+        counts = dict(SearchTerm.objects.filter(document_count__gt=0).values_list('term', 'document_count'))
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(sorted(SearchPosting.objects.values_list('term__term', 'property_id', 'weight')), before)
+        self.assertEqual(dict(SearchTerm.objects.values_list('term', 'document_count')), counts)
+
+
+class FacetsTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user('owner')
+        listings = [
+            ('Douala', 'house', 3, 4000000), ('Douala', 'house', 3, 12000000),
+            ('Douala', 'apartment', 2, 8000000), ('Yaoundé', 'house', 4, 30000000),
+            ('Yaoundé', 'land', None, 300000000),
+        ]
+        # Les agrégats sont tenus à jour après le commit
+        with self.captureOnCommitCallbacks(execute=True):
+            for index, (city, property_type, bedrooms, price) in enumerate(listings):
+                create_property(
+                    self.user,
+                    title=f'Listing {index}',
+                    description='A property',
+                    property_type=property_type,
+                    price=price,
+                    city=city,
+                    bedrooms=bedrooms
+                )
+
+    def test_all_facets(self):
+        # Ville, type et total lus dans les agrégats, chambres et prix groupés sur les annonces
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/properties/facets/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        facets = data['facets']
+        self.assertEqual(data['count'], 5)
+        self.assertEqual(facets['city'], [{'value': 'Douala', 'count': 3}, {'value': 'Yaoundé', 'count': 2}])
+        self.assertEqual(facets['property_type'][0], {'value': 'house', 'label': 'House', 'count': 3})
+        self.assertEqual(
+            [(item['value'], item['count']) for item in facets['bedrooms']],
+            [(2, 1), (3, 2), (4, 1), (None, 1)]
+        )
+        self.assertEqual(facets['price'], [
+            {'min': None, 'max': 5000000, 'count': 1},
+            {'min': 5000000, 'max': 10000000, 'count': 1},
+            {'min': 10000000, 'max': 25000000, 'count': 1},
+            {'min': 25000000, 'max': 50000000, 'count': 1},
+            {'min': 250000000, 'max': None, 'count': 1},
+        ])
+
+    def test_other_filters_group_the_listings(self):
+        with self.assertNumQueries(1):
+            data = self.client.get('/api/properties/facets/', {'city': 'douala', 'min_price': 5000000}).json()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(data['facets']['city'], [{'value': 'Douala', 'count': 2}])
+
+        data = self.client.get('/api/properties/facets/', {'city': 'douala'}).json()
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(
+            [(item['value'], item['count']) for item in data['facets']['property_type']],
+            [('house', 2), ('apartment', 1)]
+        )
+
+    def test_facets_follow_filters_and_writes(self):
+        data = self.client.get('/api/properties/facets/?property_type=house').json()
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(data['facets']['city'], [{'value': 'Douala', 'count': 2}, {'value': 'Yaoundé', 'count': 1}])
+        with self.assertNumQueries(0):
+            self.client.get('/api/properties/facets/?property_type=house')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Property.objects.filter(city='Douala', price=4000000).get().delete()
+        data = self.client.get('/api/properties/facets/?property_type=house').json()
+        self.assertEqual(data['facets']['city'], [{'value': 'Douala', 'count': 1}, {'value': 'Yaoundé', 'count': 1}])
+
+    def test_search_facets_count_every_match(self):
+        for index in range(30):
+            create_property(
+                self.user,
+                title=f'Studio {index}',
+                description='Studio meublé',
+                property_type='apartment',
+                price=6000000,
+                city='Kribi' if index % 3 else 'Limbé'
+            )
+        with self.assertNumQueries(3):
+            data = self.client.get('/api/properties/facets/', {'search': 'studio'}).json()
+        self.assertEqual(data['count'], 30)
+        self.assertEqual(data['facets']['city'], [{'value': 'Kribi', 'count': 20}, {'value': 'Limbé', 'count': 10}])
+        self.assertEqual(data['count'], self.client.get('/api/properties/', {'search': 'studio'}).json()['count'])
+
+
+class FieldExpansionTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user('owner')
+        self.property = create_property(self.user)
+        self.detail_url = f'/api/properties/{self.property.id}/'
+
+    def test_sparse_fields(self):
+        data = self.client.get(self.detail_url, {'fields': 'id,title'}).json()
+        self.assertEqual(set(data), {'id', 'title'})
+        data = self.client.get(self.detail_url, {'fields': 'id,owner.email'}).json()
+        self.assertEqual(data, {'id': str(self.property.id), 'owner': {'email': 'owner@astremina.com'}})
+
+    def test_expand(self):
+        default = self.client.get(self.detail_url).json()
+        self.assertEqual(default['owner']['email'], 'owner@astremina.com')
+        self.assertIn('images', default)
+
+        # Relations non demandées : clé primaire ou omises
+        data = self.client.get(self.detail_url, {'expand': ''}).json()
+        self.assertEqual(data['owner'], self.user.pk)
+        self.assertNotIn('images', data)
+        data = self.client.get(self.detail_url, {'expand': 'owner'}).json()
+        self.assertEqual(data['owner']['email'], 'owner@astremina.com')
+        self.assertNotIn('profile', data['owner'])
+
+    def test_queryset_follows_requested_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/properties/', {'fields': 'id,title', 'expand': ''})
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('properties_propertyimage', sql)
+        self.assertNotIn('accounts_user', sql)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.detail_url, {'expand': 'owner.profile,images'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('accounts_profile', queries[0]['sql'])
+
+    def test_nested_contract_expansion(self):
+        from datetime import date
+        from partners.models import Partner, Contract
+
+        staff = create_user('staff', is_staff=True)
+        partner = Partner.objects.create(
+            user=self.user, company_name='Agence', address='Akwa',
+            contact_email='agence@astremina.com', contact_phone='600000000'
+        )
+        Contract.objects.create(partner=partner, start_date=date(2026, 1, 1), end_date=date(2026, 12, 31))
+        self.client.force_authenticate(user=staff)
+
+        data = self.client.get('/api/contracts/', {'expand': 'partner', 'fields': 'id,partner.company_name,partner.user'}).json()
+        contract = data['results'][0]
+        self.assertEqual(contract['partner'], {'company_name': 'Agence', 'user': self.user.pk})
+
+@override_settings(API_FAST_LIST_SERIALIZATION=True)
+class FastListSerializationTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user('visitor')
+        self.properties = [
+            create_property(
+                self.user,
+                title=f'Maison à Akwa {index}  ',
+                description='Une maison' * 100,
+                price=1000000 + index,
+                latitude=4.05 + index / 1000,
+                longitude=9.7
+            )
+            for index in range(3)
+        ]
+        PropertyImage.objects.create(property=self.properties[0], image='properties/house.jpg', is_primary=True)
+        Favorite.objects.create(user=self.user, property=self.properties[1])
+
+    def get_both(self, url, params=None):
+        """Réponses du chemin rapide et du serializer, en octets"""
+        from django.core.cache import cache
+
+        responses = []
+        for fast in (True, False):
+            cache.clear()
+            with self.settings(API_FAST_LIST_SERIALIZATION=fast):
+                response = self.client.get(url, params or {})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            responses.append(response.content)
+        return responses
+
+    def test_list_is_byte_identical(self):
+        fast, slow = self.get_both('/api/properties/')
+        self.assertEqual(fast, slow)
+        self.assertIn('/media/properties/house.jpg', fast.decode())
+
+        self.client.force_authenticate(user=self.user)
+        for params in ({}, {'page': 1}, {'page_size': 2}, {'ordering': 'price'}):
+            fast, slow = self.get_both('/api/properties/', params)
+            self.assertEqual(fast, slow)
+        data = self.client.get('/api/properties/').json()
+        self.assertEqual(sum(item['is_favorited'] for item in data['results']), 1)
+
+    def test_bbox_is_byte_identical(self):
+        self.client.force_authenticate(user=self.user)
+        bbox = {'min_lat': 0, 'min_lng': 0, 'max_lat': 10, 'max_lng': 10}
+        for params in (bbox, {**bbox, 'page_size': 2}):
+            fast, slow = self.get_both('/api/properties/search_by_bbox/', params)
+            self.assertEqual(fast, slow)
+
+    def test_list_skips_unused_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/properties/')
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('description', sql)
+        self.assertNotIn('accounts_user', sql)
+
+    def test_fields_fall_back_to_serializer(self):
+        data = self.client.get('/api/properties/', {'fields': 'id,title'}).json()
+        self.assertEqual(set(data['results'][0]), {'id', 'title'})
+
+class StreamingExportTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.partner = create_user('partner', is_partner=True)
+        self.other = create_user('other')
+        for index, (owner, city, status_value) in enumerate([
+            (self.partner, 'Douala', 'published'),
+            (self.partner, 'Yaoundé', 'draft'),
+            (self.other, 'Douala', 'published'),
+        ]):
+            create_property(
+                owner,
+                title=f'Maison, "{index}"',
+                description='Ligne 1\nLigne 2',
+                price=1000000 + index,
+                city=city,
+                status=status_value
+            )
+        self.url = '/api/properties/export/'
+
+    def read(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('attachment;', response['Content-Disposition'])
+        return b''.join(response.streaming_content).decode()
+
+    def test_partner_exports_own_listings_as_ndjson(self):
+        import json
+
+        self.client.force_authenticate(user=self.partner)
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual(len(records), 2)
+        self.assertEqual({record['status'] for record in records}, {'published', 'draft'})
+        self.assertTrue(all(record['owner_email'] == 'partner@astremina.com' for record in records))
+        self.assertIn(records[0]['price'], ('1000000.00', '1000001.00'))
+
+        records = self.read(self.client.get(self.url, {'city': 'yaoun'})).splitlines()
+        self.assertEqual(len(records), 1)
+
+    def test_admin_exports_csv(self):
+        import csv
+        import io
+
+        admin = create_user('admin', is_staff=True)
+        self.client.force_authenticate(user=admin)
+        with self.settings(EXPORT_CHUNK_SIZE=2):
+            response = self.client.get(self.url, {'format': 'csv', 'city': 'Douala'})
+            rows = list(csv.DictReader(io.StringIO(self.read(response))))
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['description'], 'Ligne 1\nLigne 2')
+        self.assertEqual({row['title'] for row in rows}, {'Maison, "0"', 'Maison, "2"'})
+
+    def test_csv_neutralizes_formulas(self):
+        import csv
+        import io
+        import json
+
+        create_property(
+            self.partner,
+            title='=HYPERLINK("http://evil.example","Voir")',
+            description='@SUM(A1:A2)',
+            latitude='-3.5'
+        )
+        self.client.force_authenticate(user=self.partner)
+        rows = list(csv.DictReader(io.StringIO(self.read(self.client.get(self.url, {'format': 'csv', 'search': 'hyperlink'})))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], '\'=HYPERLINK("http://evil.example","Voir")')
+        self.assertEqual(rows[0]['description'], "'@SUM(A1:A2)")
+        self.assertEqual(rows[0]['latitude'], '-3.50000000')
+        # NDJSON n'est pas lu par un tableur : valeurs inchangées
+        record = json.loads(self.read(self.client.get(self.url, {'search': 'hyperlink'})))
+        self.assertEqual(record['title'], '=HYPERLINK("http://evil.example","Voir")')
+
+    def test_search_exports_every_match(self):
+        for index in range(25):
+            create_property(
+                self.partner,
+                title=f'Studio {index}',
+                description='Studio',
+                property_type='apartment',
+                status='draft'
+            )
+        self.client.force_authenticate(user=self.partner)
+        records = self.read(self.client.get(self.url, {'search': 'studio'})).splitlines()
+        self.assertEqual(len(records), 25)
+
+    def test_export_requires_partner_or_admin(self):
+        self.client.force_authenticate(user=self.other)
+        response = self.client.get(self.url, {'format': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(user=None)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+class BulkListingTest(TestCase):
+    def setUp(self):
+        from datetime import date
+        from django.core.cache import cache
+        from partners.models import Partner, Contract
+
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user('partner', is_partner=True)
+        partner = Partner.objects.create(
+            user=self.user, company_name='Agence', address='Akwa',
+            contact_email='agence@astremina.com', contact_phone='600000000'
+        )
+        today = date.today()
+        self.contract = Contract.objects.create(
+            partner=partner, start_date=today.replace(year=today.year - 1),
+            end_date=today.replace(year=today.year + 1), max_publications=3
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = '/api/properties/bulk/'
+
+    def listing(self, reference, **fields):
+        return {
+            'title': f'Villa {reference}',
+            'description': 'Villa avec piscine',
+            'property_type': 'house',
+            'price': '25000000',
+            'city': 'Douala',
+            'latitude': '4.05',
+            'longitude': '9.7',
+            'partner_reference': reference,
+            **fields,
+        }
+
+    def test_create_then_upsert(self):
+        from properties import search
+
+        response = self.client.post(self.url, [self.listing('A-1'), self.listing('A-2')], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        created = Property.objects.get(partner_reference='A-1', owner=self.user)
+        self.assertEqual(created.slug, 'villa-a-1')
+        self.assertNotEqual(created.geohash, '')
+        self.assertEqual(search.rank('piscine', Property.objects.all()).count(), 2)
+
+        response = self.client.post(self.url, [
+            {'partner_reference': 'A-1', 'price': '30000000', 'title': 'Villa rénovée'},
+            self.listing('A-3', title='Villa A-1'),
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([item['status'] for item in response.data['results']], ['updated', 'created'])
+        created.refresh_from_db()
+        self.assertEqual(created.price, 30000000)
+        self.assertEqual(created.description, 'Villa avec piscine')
+        self.assertEqual([title for title, in Property.objects.filter(search_postings__term__term='renovee').values_list('title')], ['Villa rénovée'])
+        # Slug déjà pris : suffixé
+        self.assertNotEqual(Property.objects.get(partner_reference='A-3').slug, 'villa-a-1')
+
+    def test_invalid_item_writes_nothing(self):
+        response = self.client.post(self.url, [
+            self.listing('B-1'), self.listing('B-2', price='abc'), self.listing('B-1'),
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([item['status'] for item in response.data['results']], ['valid', 'invalid', 'invalid'])
+        self.assertIn('price', response.data['results'][1]['errors'])
+        self.assertFalse(Property.objects.exists())
+
+    def test_non_string_reference_is_an_item_error(self):
+        response = self.client.post(self.url, [
+            self.listing('D-1'), self.listing(['D-1']), self.listing({'ref': 1}), self.listing(7),
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([item['status'] for item in response.data['results']], ['valid', 'invalid', 'invalid', 'invalid'])
+        self.assertIn('partner_reference', response.data['results'][1]['errors'])
+        self.assertFalse(Property.objects.exists())
+
+    def test_quota_is_enforced(self):
+        response = self.client.post(self.url, [self.listing(f'C-{index}') for index in range(4)], format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.data['limit'], 3)
+        self.assertFalse(Property.objects.exists())
+
+        # Les brouillons ne comptent pas
+        items = [self.listing(f'C-{index}') for index in range(3)] + [self.listing('C-3', status='draft')]
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.post('/api/properties/', self.listing('C-4'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Property.objects.count(), 4)
+
+    def test_no_active_contract_means_no_publication(self):
+        self.contract.status = 'expired'
+        self.contract.save()
+        response = self.client.post(self.url, [self.listing('F-1')], format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.data['limit'], 0)
+
+        response = self.client.post(self.url, [self.listing('F-1', status='draft')], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_duplicate_reference_is_rejected(self):
+        from unittest import mock
+        from django.db import IntegrityError
+
+        self.client.post(self.url, [self.listing('H-1'), self.listing('H-2')], format='json')
+        response = self.client.post('/api/properties/', self.listing('H-1'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('partner_reference', response.data)
+
+        listing = Property.objects.get(partner_reference='H-2')
+        response = self.client.patch(f'/api/properties/{listing.pk}/', {'partner_reference': 'H-1'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.patch(f'/api/properties/{listing.pk}/', {'partner_reference': 'H-2', 'price': '1'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Course entre deux lots : la contrainte d'unicité tranche
+        with mock.patch('api.views.write_listings', side_effect=IntegrityError):
+            response = self.client.post(self.url, [self.listing('H-3')], format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_partner_fields_are_not_public(self):
+        self.client.post(self.url, [self.listing('G-1', partner_content_hash='h-G-1')], format='json')
+        listing = Property.objects.get(partner_reference='G-1')
+
+        response = self.client.patch(f'/api/properties/{listing.pk}/', {'price': '26000000'}, format='json')
+        self.assertEqual((response.data['partner_reference'], response.data['partner_content_hash']), ('G-1', 'h-G-1'))
+
+        self.client.force_authenticate(user=None)
+        data = self.client.get(f'/api/properties/{listing.pk}/').json()
+        self.assertNotIn('partner_reference', data)
+        self.assertNotIn('partner_content_hash', data)
+
+    def test_quota_is_enforced_on_updates(self):
+        response = self.client.post(self.url, [self.listing(f'E-{index}') for index in range(3)], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # Quota abaissé : les annonces publiées restent modifiables
+        self.contract.max_publications = 2
+        self.contract.save()
+        listing = Property.objects.get(partner_reference='E-0')
+        response = self.client.patch(f'/api/properties/{listing.pk}/', {'price': '26000000'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_bulk_requires_partner(self):
+        other = create_user('other')
+        self.client.force_authenticate(user=other)
+        response = self.client.post(self.url, [self.listing('D-1')], format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class DeltaSyncTest(TestCase):
+    def setUp(self):
+        from datetime import date
+        from django.core.cache import cache
+        from partners.models import Partner, Contract
+
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user('agency', is_partner=True)
+        partner = Partner.objects.create(
+            user=self.user, company_name='Agence', address='Akwa',
+            contact_email='agence@astremina.com', contact_phone='600000000'
+        )
+        today = date.today()
+        Contract.objects.create(
+            partner=partner, start_date=today.replace(year=today.year - 1),
+            end_date=today.replace(year=today.year + 1)
+        )
+        self.client.force_authenticate(user=self.user)
+        for reference in ('S1', 'S2', 'S3'):
+            create_property(
+                self.user,
+                title=f'Maison {reference}',
+                description='Maison',
+                partner_reference=reference,
+                partner_content_hash=f'h-{reference}'
+            )
+        # Annonce saisie à la main : hors synchronisation
+        create_property(self.user, title='Manuelle', description='Maison', price=1)
+
+    def test_manifest_diff(self):
+        manifest = {'listings': [
+            {'reference': 'S1', 'hash': 'h-S1'},
+            {'reference': 'S2', 'hash': 'changed'},
+            {'reference': 'S4', 'hash': 'h-S4'},
+        ]}
+        with self.assertNumQueries(1):
+            response = self.client.post('/api/properties/sync/manifest/', manifest, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'upload': ['S2', 'S4'], 'delete': ['S3'], 'unchanged': 1})
+
+        response = self.client.post('/api/properties/sync/manifest/', {'listings': [{'reference': 'S1'}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_apply_changes(self):
+        response = self.client.post('/api/properties/sync/apply/', {
+            'upsert': [
+                {'partner_reference': 'S2', 'partner_content_hash': 'changed', 'price': '900000'},
+                {
+                    'partner_reference': 'S4', 'partner_content_hash': 'h-S4', 'title': 'Maison S4',
+                    'description': 'Maison', 'property_type': 'house', 'price': '2000000', 'city': 'Kribi',
+                },
+            ],
+            'delete': ['S3'],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['deleted']), (1, 1, 1))
+        self.assertEqual(Property.objects.get(partner_reference='S2').price, 900000)
+        self.assertFalse(Property.objects.filter(partner_reference='S3').exists())
+        self.assertTrue(Property.objects.filter(title='Manuelle').exists())
+
+        manifest = {'listings': [{'reference': reference, 'hash': content_hash} for reference, content_hash in [
+            ('S1', 'h-S1'), ('S2', 'changed'), ('S4', 'h-S4'),
+        ]]}
+        response = self.client.post('/api/properties/sync/manifest/', manifest, format='json')
+        self.assertEqual(response.data, {'upload': [], 'delete': [], 'unchanged': 3})
+
+    def test_apply_requires_references(self):
+        response = self.client.post('/api/properties/sync/apply/', {
+            'upsert': [{'title': 'Sans référence', 'description': 'x', 'property_type': 'house', 'price': '1', 'city': 'Douala'}],
+            'delete': ['S1'],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Property.objects.filter(partner_reference='S1').exists())
+
+class ChangesFeedTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user('owner')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first = self.create('Maison 1')
+            self.second = self.create('Maison 2')
+
+    def create(self, title):
+        return create_property(self.user, title=title, description='Maison')
+
+    def sync(self, token=None):
+        params = {'token': token} if token else {}
+        with self.settings(PROPERTY_CHANGES_SETTLE_SECONDS=0):
+            response = self.client.get('/api/properties/changes/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_initial_then_incremental_sync(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            draft = self.create('Brouillon')
+            draft.status = 'draft'
+            draft.save()
+        data = self.sync()
+        self.assertEqual([item['title'] for item in data['results']], ['Maison 1', 'Maison 2'])
+        self.assertEqual(data['removed'], [])
+        token = data['token']
+
+        data = self.sync(token)
+        self.assertEqual((data['results'], data['removed']), ([], []))
+        self.assertEqual(data['token'], token)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first.price = 900000
+            self.first.save()
+            self.second.status = 'disabled'
+            self.second.save()
+            third = self.create('Maison 3')
+            third_id = third.id
+            third.delete()
+
+        data = self.sync(token)
+        self.assertEqual([item['title'] for item in data['results']], ['Maison 1'])
+        self.assertEqual(data['results'][0]['price'], '900000.00')
+        self.assertEqual(data['removed'], [str(self.second.id), str(third_id)])
+        self.assertEqual(self.sync(data['token'])['results'], [])
+
+    def test_pages_and_settle_window(self):
+        with self.settings(PROPERTY_CHANGES_PAGE_SIZE=1):
+            data = self.sync()
+            self.assertTrue(data['has_more'])
+            data = self.sync(data['token'])
+        self.assertEqual([item['title'] for item in data['results']], ['Maison 2'])
+        self.assertFalse(data['has_more'])
+
+        # Changement trop récent : pas encore servi
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first.save()
+        response = self.client.get('/api/properties/changes/', {'token': data['token']})
+        self.assertEqual(response.json()['results'], [])
+        self.assertEqual(response.json()['token'], data['token'])
+
+    def test_contract_expiration_writes_tombstones(self):
+        from datetime import date
+        from partners.models import Partner, Contract
+        from scraping.tasks import check_contract_expirations
+
+        token = self.sync()['token']
+        partner = Partner.objects.create(
+            user=self.user, company_name='Agence', address='Akwa',
+            contact_email='agence@astremina.com', contact_phone='600000000'
+        )
+        Contract.objects.create(partner=partner, start_date=date(2020, 1, 1), end_date=date(2020, 12, 31))
+        with self.captureOnCommitCallbacks(execute=True):
+            check_contract_expirations()
+        data = self.sync(token)
+        self.assertEqual(sorted(data['removed']), sorted([str(self.first.id), str(self.second.id)]))
+
+    def test_invalid_token(self):
+        response = self.client.get('/api/properties/changes/', {'token': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_record_is_atomic_and_retries_conflicts(self):
+        from unittest import mock
+        from django.db import IntegrityError
+        from properties import changelog
+        from properties.models import PropertyChange
+
+        real_bulk_create = PropertyChange.objects.bulk_create
+        calls = []
+
+        def conflicting(objs):
+            # Ligne insérée par une écriture simultanée : le premier essai échoue sur l'unicité
+            calls.append(objs)
+            if len(calls) == 1:
+                raise IntegrityError('duplicate key value violates unique constraint')
+            return real_bulk_create(objs)
+
+        with mock.patch.object(PropertyChange.objects, 'bulk_create', side_effect=conflicting):
+            changelog.record([(self.first.id, changelog.REMOVE)])
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(PropertyChange.objects.get(property_id=self.first.id).kind, changelog.REMOVE)
+
+        # Une erreur après la suppression ne perd pas la ligne
+        with mock.patch.object(PropertyChange.objects, 'bulk_create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                changelog.record([(self.first.id, changelog.UPSERT)])
+        self.assertEqual(PropertyChange.objects.get(property_id=self.first.id).kind, changelog.REMOVE)
+
+
+class AsyncURLConf:
+    """Routes de l'API avec les lectures asynchrones devant, comme sous ASGI"""
+    from django.urls import include, path
+
+    from api import urls as api_urls
+    from api.async_views import urlpatterns_for
+
+    urlpatterns = [
+        path('api/', include(urlpatterns_for(api_urls.router) + api_urls.urlpatterns)),
+        # URLs des rendus d'images, sérialisées avec les propriétés
+        path('', include('properties.urls')),
+    ]
+
+
+@override_settings(API_FAST_LIST_SERIALIZATION=True)
+class AsyncReadPathTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user('reader')
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.properties = [
+            create_property(
+                self.user,
+                title=f'Villa {index}',
+                description='Villa avec piscine',
+                property_type='villa',
+                price=2000000 + index,
+                latitude=4.05 + index / 1000,
+                longitude=9.7
+            )
+            for index in range(3)
+        ]
+        PropertyImage.objects.create(property=self.properties[0], image='properties/villa.jpg', is_primary=True)
+        Favorite.objects.create(user=self.user, property=self.properties[1])
+
+    def sync_get(self, url, authenticated=False, **params):
+        from django.core.cache import cache
+
+        cache.clear()
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.token}'} if authenticated else {}
+        return self.client.get(url, params, **headers)
+
+    async def async_get(self, url, authenticated=False, headers=None, clear=True, **params):
+        from django.core.cache import cache
+
+        if clear:
+            await cache.aclear()
+        headers = dict(headers or {})
+        if authenticated:
+            headers['Authorization'] = f'Bearer {self.token}'
+        with self.settings(ROOT_URLCONF=AsyncURLConf):
+            return await self.async_client.get(url, params, headers=headers)
+
+    async def assert_same(self, url, authenticated=False, served=True, **params):
+        """Même réponse que le viewset ; served : sans passer par la vue synchrone"""
+        from unittest import mock
+        from asgiref.sync import sync_to_async
+
+        expected = await sync_to_async(self.sync_get)(url, authenticated, **params)
+        if served:
+            with mock.patch('api.async_views.AsyncReadView.afallback', side_effect=AssertionError('fallback used')):
+                response = await self.async_get(url, authenticated, **params)
+        else:
+            response = await self.async_get(url, authenticated, **params)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.json(), expected.json())
+        return response, expected
+
+    async def test_list_matches_viewset(self):
+        from asgiref.sync import sync_to_async
+
+        await self.assert_same('/api/properties/')
+        await self.assert_same('/api/properties/', authenticated=True, page_size=2)
+        response, _ = await self.assert_same('/api/properties/', city='douala', ordering='price', page_size=2)
+
+        # Curseur suivi en asynchrone
+        cursor = response.json()['next'].split('cursor=')[1].split('&')[0]
+        await self.assert_same('/api/properties/', cursor=cursor, page_size=2)
+
+        # Mêmes versions : même ETag que le viewset, et 304 sans sérialisation
+        expected = await sync_to_async(self.sync_get)('/api/properties/')
+        response = await self.async_get('/api/properties/', clear=False)
+        self.assertEqual(response['ETag'], expected['ETag'])
+        not_modified = await self.async_get('/api/properties/', clear=False, headers={'If-None-Match': expected['ETag']})
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_detail_bbox_and_favorites_match_viewsets(self):
+        response, _ = await self.assert_same(f'/api/properties/{self.properties[1].id}/', authenticated=True)
+        self.assertTrue(response.json()['is_favorited'])
+        await self.assert_same(f'/api/properties/{self.properties[0].id}/')
+        bbox = {'min_lat': 4, 'max_lat': 5, 'min_lng': 9, 'max_lng': 10}
+        await self.assert_same('/api/properties/search_by_bbox/', **bbox)
+        await self.assert_same('/api/properties/search_by_bbox/', page_size=1, **bbox)
+        response, _ = await self.assert_same('/api/favorites/', authenticated=True)
+        self.assertEqual(response.json()['count'], 1)
+
+    async def test_unsupported_requests_use_viewset(self):
+        from asgiref.sync import sync_to_async
+
+        # Erreurs rendues par le viewset
+        await self.assert_same('/api/properties/search_by_bbox/', served=False, min_lat=4)
+        await self.assert_same('/api/properties/', served=False, cursor='garbage')
+        await self.assert_same('/api/favorites/', served=False)
+        await self.assert_same('/api/favorites/', served=False, authenticated=True, page=7)
+        # Paramètres que seul le viewset sert
+        await self.assert_same('/api/properties/', served=False, search='piscine')
+        await self.assert_same('/api/properties/', served=False, fields='id,title')
+        await self.assert_same(f'/api/properties/{self.properties[0].id}/', served=False, expand='owner')
+
+        response = await self.async_get('/api/properties/', headers={'Authorization': 'Bearer garbage'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        # Écriture confiée au viewset
+        with self.settings(ROOT_URLCONF=AsyncURLConf):
+            response = await self.async_client.post('/api/properties/', {
+                'title': 'Studio', 'description': 'Studio meublé', 'property_type': 'apartment',
+                'price': '150000', 'city': 'Douala', 'status': 'published',
+            }, content_type='application/json', headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(await sync_to_async(Property.objects.filter(title='Studio').exists)())
+
+    async def test_authentication_uses_the_viewset_authenticators(self):
+        from asgiref.sync import sync_to_async
+
+        # Session (client connecté) comme JWT, par les classes de DEFAULT_AUTHENTICATION_CLASSES
+        await sync_to_async(self.async_client.force_login)(self.user)
+        # Sessions en cache : ne pas le vider
+        response = await self.async_get(f'/api/properties/{self.properties[1].id}/', clear=False)
+        self.assertTrue(response.json()['is_favorited'])
+
+        # Jeton refusé : le viewset rend son 401
+        response = await self.async_get('/api/properties/', headers={'Authorization': 'Bearer invalid'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        # Une vue de lecture doit définir read()
+        from api.async_views import AsyncReadView
+        with self.assertRaises(TypeError):
+            AsyncReadView()
+
+
+class ThrottlingTest(TestCase):
+    def setUp(self):
+        from api.throttling import local_buckets
+
+        local_buckets.clear()
+        self.client = APIClient()
+        self.user = create_user('member')
+        self.partner = create_user('integration', is_partner=True)
+
+    def rates(self, **rates):
+        from django.conf import settings
+
+        return self.settings(REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_RATES': {'anon': '100/min', 'user': '100/min', 'partner': '100/min', 'bulk': '100/min', **rates},
+        })
+
+    def statuses(self, count, url='/api/properties/', method='get', **extra):
+        return [getattr(self.client, method)(url, **extra).status_code for _ in range(count)]
+
+    def test_scopes_have_separate_buckets(self):
+        with self.rates(anon='2/min', user='3/min', partner='4/min'):
+            self.assertEqual(self.statuses(3), [200, 200, 429])
+            response = self.client.get('/api/properties/')
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            # Un jeton toutes les 30 secondes
+            self.assertTrue(1 <= int(response['Retry-After']) <= 30)
+
+            self.client.force_authenticate(user=self.user)
+            self.assertEqual(self.statuses(4), [200, 200, 200, 429])
+            self.client.force_authenticate(user=self.partner)
+            self.assertEqual(self.statuses(5), [200, 200, 200, 200, 429])
+
+    def test_bulk_endpoints_use_bulk_scope(self):
+        self.client.force_authenticate(user=self.partner)
+        with self.rates(bulk='1/min', partner='100/min'):
+            self.assertEqual(self.statuses(2, '/api/properties/bulk/', 'post', data=[], format='json'), [400, 429])
+            self.assertEqual(self.client.get('/api/properties/').status_code, status.HTTP_200_OK)
+
+    def test_tokens_refill(self):
+        from unittest import mock
+
+        with self.rates(anon='60/min'), mock.patch('api.throttling.time.monotonic', return_value=1000.0) as clock:
+            self.assertEqual(self.statuses(61).count(429), 1)
+            clock.return_value = 1002.5
+            self.assertEqual(self.statuses(3), [200, 200, 429])
+
+    def test_falls_back_to_local_buckets_without_redis(self):
+        from unittest import mock
+        from redis.exceptions import ConnectionError as RedisConnectionError
+        from api import throttling
+
+        backend = mock.Mock()
+        backend.make_key.side_effect = lambda key: key
+        backend.client.get_client.return_value.evalsha.side_effect = RedisConnectionError('down')
+        self.addCleanup(setattr, throttling, '_redis_retry_at', 0.0)
+        with self.rates(anon='1/min'), mock.patch.object(throttling, 'RedisCache', mock.Mock), \
+                mock.patch.object(throttling, 'caches', {'default': backend}):
+            self.assertEqual(self.statuses(2), [200, 429])
+        # Redis n'est pas réessayé à chaque requête après une erreur
+        self.assertEqual(backend.client.get_client.return_value.evalsha.call_count, 1)
+
+    async def test_async_reads_are_throttled(self):
+        with self.rates(anon='1/min'), self.settings(ROOT_URLCONF=AsyncURLConf):
+            self.assertEqual((await self.async_client.get('/api/properties/')).status_code, 200)
+            response = await self.async_client.get('/api/properties/')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+    async def test_async_fallback_takes_a_single_token(self):
+        # ?search= est confié au viewset : le jeton pris par la vue asynchrone suffit
+        with self.rates(anon='1/min'), self.settings(ROOT_URLCONF=AsyncURLConf):
+            self.assertEqual((await self.async_client.get('/api/properties/', {'search': 'villa'})).status_code, 200)
+            response = await self.async_client.get('/api/properties/', {'search': 'villa'})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+class ListingAggregatesTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user('owner')
+
+    def create(self, title, city, price, property_type='house', status='published'):
+        return create_property(
+            self.user,
+            title=title,
+            description='Maison',
+            property_type=property_type,
+            price=price,
+            city=city,
+            status=status
+        )
+
+    def stored(self):
+        from properties.models import ListingAggregate
+
+        return {
+            (row.city, row.property_type, row.status): (row.count, row.price_sum, row.price_sketch)
+            for row in ListingAggregate.objects.all()
+        }
+
+    def assertMatchesRebuild(self):
+        from properties import aggregates
+
+        stored = self.stored()
+        aggregates.rebuild()
+        self.assertEqual(stored, self.stored())
+
+    def test_quantiles_within_accuracy(self):
+        import random
+        import statistics
+        from collections import Counter
+        from properties import aggregates
+
+        prices = [random.Random(seed).randint(50_000, 500_000_000) for seed in range(1001)]
+        sketch = Counter(aggregates.bucket(price) for price in prices)
+        self.assertLess(len(sketch), 1000)
+        for q in (0.1, 0.5, 0.9):
+            exact = sorted(prices)[int(q * (len(prices) - 1))]
+            self.assertAlmostEqual(aggregates.quantile(sketch, q), exact, delta=exact * 0.01)
+        self.assertAlmostEqual(
+            aggregates.quantile(sketch, 0.5), statistics.median(prices), delta=statistics.median(prices) * 0.01
+        )
+        self.assertIsNone(aggregates.quantile({}, 0.5))
+
+    def test_writes_update_aggregates(self):
+        from datetime import date
+        from partners.models import Partner, Contract
+        from scraping.tasks import check_contract_expirations
+
+        with self.captureOnCommitCallbacks(execute=True):
+            house = self.create('Maison', 'Douala', 1000000)
+            villa = self.create('Villa', 'Douala', 3000000)
+            self.create('Studio', 'Yaoundé', 200000, property_type='apartment')
+        self.assertEqual(self.stored()[('Douala', 'house', 'published')][:2], (2, 4000000))
+        self.assertMatchesRebuild()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            house.price = 1500000
+            house.save()
+            villa.city = 'Kribi'
+            villa.status = 'draft'
+            villa.save()
+        self.assertMatchesRebuild()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            house.delete()
+        self.assertNotIn(('Douala', 'house', 'published'), self.stored())
+        self.assertMatchesRebuild()
+
+        # Désactivation par update() à l'expiration du contrat
+        partner = Partner.objects.create(
+            user=self.user, company_name='Agence', address='Akwa',
+            contact_email='agence@astremina.com', contact_phone='600000000'
+        )
+        Contract.objects.create(partner=partner, start_date=date(2025, 1, 1), end_date=date(2025, 12, 31))
+        with self.captureOnCommitCallbacks(execute=True):
+            check_contract_expirations()
+        self.assertIn(('Yaoundé', 'apartment', 'disabled'), self.stored())
+        self.assertMatchesRebuild()
+
+    def test_api(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create('Maison', 'Douala', 1000000)
+            self.create('Villa', 'Douala', 3000000)
+            self.create('Studio', 'Douala', 200000, property_type='apartment')
+            self.create('Case', 'Yaoundé', 500000)
+            self.create('Brouillon', 'Douala', 800000, status='draft')
+
+        # Une lecture de la table des agrégats, aucune de celle des propriétés
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/properties/aggregates/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data['count'], 4)
+        self.assertEqual(
+            [(row['city'], row['property_type'], row['count']) for row in data['results']],
+            [('Douala', 'house', 2), ('Douala', 'apartment', 1), ('Yaoundé', 'house', 1)]
+        )
+        self.assertEqual(data['results'][0]['avg_price'], 2000000)
+        self.assertAlmostEqual(data['results'][0]['median_price'], 1000000, delta=1000000 * 0.01)
+
+        data = self.client.get('/api/properties/aggregates/', {'group_by': 'city', 'city': 'Douala'}).json()
+        self.assertEqual([(row['city'], row['count']) for row in data['results']], [('Douala', 3)])
+
+        response = self.client.get('/api/properties/aggregates/', {'group_by': 'price'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/properties/aggregates/', {'status': 'draft'})
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+
+        admin = create_user('admin', is_staff=True)
+        self.client.force_authenticate(user=admin)
+        data = self.client.get('/api/properties/aggregates/', {'status': 'draft', 'group_by': 'status'}).json()
+        self.assertEqual([(row['status'], row['count'], row['avg_price']) for row in data['results']], [('draft', 1, 800000)])
+
@@ -12,4 +12,5 @@ urlpatterns = [
     path('create/', views.property_create, name='create'),
     path('property/<slug:slug>/edit/', views.property_edit, name='edit'),
     path('property/<slug:slug>/delete/', views.property_delete, name='delete'),
+    path('images/<int:image_id>/<str:version>/<int:width>.<str:fmt>', views.image_rendition, name='image_rendition'),
 ]
\ No newline at end of file
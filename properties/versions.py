@@ -0,0 +1,93 @@
+"""
+Compteurs de version du catalogue, stockés dans le cache partagé.
+
+Chaque écriture (signaux de properties.signals) fait avancer la version de
+sa portée ; les réponses calculées à partir d'une version (ETag, cache de
+réponses) deviennent caduques sans rien avoir à purger.
+
+Une version est un horodatage en nanosecondes, strictement croissant : elle
+sert aussi de Last-Modified, et un cache vidé redémarre à l'heure courante
+au lieu de réutiliser d'anciennes valeurs.
+"""
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db import transaction
+
+from . import async_cache
+
+CATALOGUE = 'catalogue'
+VERSION_TIMEOUT = None  # pas d'expiration
+
+def _key(scope):
+    return f'properties:version:{scope}'
+
+def favorites_scope(user_id):
+    return f'favorites:{user_id}'
+
+def type_scope(property_type):
+    """Sous-catalogue d'un type : seules les écritures sur ce type l'invalident"""
+    return f'{CATALOGUE}:type:{property_type}'
+
+def get_version(scope=CATALOGUE):
+    version = cache.get(_key(scope))
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(_key(scope), version, VERSION_TIMEOUT):
+            version = cache.get(_key(scope), version)
+    return version
+
+def get_versions(scopes):
+    """Versions de plusieurs portées en un aller-retour vers le cache"""
+    keys = {scope: _key(scope) for scope in scopes}
+    found = cache.get_many(list(keys.values()))
+    return {
+        scope: found[key] if key in found else get_version(scope)
+        for scope, key in keys.items()
+    }
+
+async def aget_version(scope=CATALOGUE):
+    version = await async_cache.get(_key(scope))
+    if version is None:
+        version = time.time_ns()
+        if not await async_cache.add(_key(scope), version, VERSION_TIMEOUT):
+            version = await async_cache.get(_key(scope), version)
+    return version
+
+async def aget_versions(scopes):
+    """get_versions pour les vues asynchrones"""
+    keys = {scope: _key(scope) for scope in scopes}
+    found = await async_cache.get_many(list(keys.values()))
+    return {
+        scope: found[key] if key in found else await aget_version(scope)
+        for scope, key in keys.items()
+    }
+
+def bump(scope=CATALOGUE):
+    """Avance la version. Deux bumps concurrents peuvent se confondre : la version change quand même"""
+    version = max(time.time_ns(), (cache.get(_key(scope)) or 0) + 1)
+    cache.set(_key(scope), version, VERSION_TIMEOUT)
+    return version
+
+def bump_property(property_type, previous_type=None):
+    """Écriture d'une propriété : catalogue entier, son type, et l'ancien type s'il a changé"""
+    bump()
+    for scope_type in {property_type, previous_type} - {None}:
+        bump(type_scope(scope_type))
+
+def bump_on_commit(scope=CATALOGUE):
+    """bump() après le commit de la transaction en cours.
+
+    Avancée avant le commit, la version serait lue avec les anciennes lignes
+    par une requête concurrente : ETag et réponse en cache de l'ancien
+    catalogue resteraient attachés à la nouvelle version.
+    """
+    transaction.on_commit(lambda: bump(scope))
+
+def bump_property_on_commit(property_type, previous_type=None):
+    """bump_property() après le commit de la transaction en cours"""
+    transaction.on_commit(lambda: bump_property(property_type, previous_type))
+
+def version_datetime(version):
+    return datetime.fromtimestamp(version / 1e9, tz=dt_timezone.utc)
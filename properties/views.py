@@ -1,40 +1,72 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.conf import settings
+from django.http import FileResponse, Http404, QueryDict
+from django.views.decorators.http import require_GET
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.paginator import Page, Paginator
 from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 from django.contrib import messages
-from .models import Property, Favorite
+from partners.quotas import PublicationQuotaExceeded, publication_quota
+from .models import Property, PropertyImage, Favorite
 from .forms import PropertySearchForm, PropertyForm, PropertyImageForm
 from .tasks import process_images
+from .renditions import FORMATS, get_rendition_cache, rendition_key, render_rendition, source_version
+from . import response_cache
+
+# Paramètres lus par chaque vue : les autres (suivi, etc.) ne fragmentent pas le cache
+HOME_SEARCH_PARAMS = {'city', 'property_type', 'min_price', 'max_price', 'page'}
+LIST_SEARCH_PARAMS = HOME_SEARCH_PARAMS | {'bedrooms'}
+
+def cached_page(namespace, request, build_queryset, allowed, per_page=12):
+    """Page de résultats servie par le cache de recherche.
+
+    Seuls les objets de la page et le nombre total sont mis en cache ; le
+    rendu reste propre à chaque requête (jeton CSRF, messages, utilisateur).
+    """
+    def compute():
+        paginator = Paginator(build_queryset(), per_page)
+        page_obj = paginator.get_page(request.GET.get('page'))
+        return list(page_obj.object_list), page_obj.number, paginator.count
+    
+    object_list, number, count = response_cache.get_or_set(namespace, request.GET, compute, allowed)
+    paginator = Paginator([], per_page)
+    paginator.count = count
+    return Page(object_list, number, paginator)
+
 
 def home(request):
     """Page d'accueil avec recherche et propriétés récentes"""
     search_form = PropertySearchForm(request.GET or None)
-    properties = Property.objects.filter(status='published').select_related('owner').prefetch_related('images')
     
-    if search_form.is_valid():
-        city = search_form.cleaned_data.get('city')
-        property_type = search_form.cleaned_data.get('property_type')
-        min_price = search_form.cleaned_data.get('min_price')
-        max_price = search_form.cleaned_data.get('max_price')
+    def build_page():
+        properties = Property.objects.filter(status='published').select_related('owner', 'primary_image')
+        
+        if search_form.is_valid():
+            city = search_form.cleaned_data.get('city')
+            property_type = search_form.cleaned_data.get('property_type')
+            min_price = search_form.cleaned_data.get('min_price')
+            max_price = search_form.cleaned_data.get('max_price')
+            
+            if city:
+                properties = properties.filter(city__icontains=city)
+            if property_type:
+                properties = properties.filter(property_type=property_type)
+            if min_price:
+                properties = properties.filter(price__gte=min_price)
+            if max_price:
+                properties = properties.filter(price__lte=max_price)
         
-        if city:
-            properties = properties.filter(city__icontains=city)
-        if property_type:
-            properties = properties.filter(property_type=property_type)
-        if min_price:
-            properties = properties.filter(price__gte=min_price)
-        if max_price:
-            properties = properties.filter(price__lte=max_price)
+        return properties
     
     # Pagination
-    paginator = Paginator(properties, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = cached_page('home', request, build_page, HOME_SEARCH_PARAMS)
     
     # Propriétés récentes pour la page d'accueil
-    recent_properties = Property.objects.filter(status='published')[:6]
+    recent_properties = response_cache.get_or_set(
+        'home:recent', QueryDict(),
+        lambda: list(Property.objects.filter(status='published').select_related('primary_image')[:6])
+    )
     
     context = {
         'search_form': search_form,
@@ -65,7 +97,7 @@ def property_detail(request, slug):
         city=property_obj.city,
         property_type=property_obj.property_type,
         status='published'
-    ).exclude(id=property_obj.id)[:4]
+    ).exclude(id=property_obj.id).select_related('primary_image')[:4]
     
     context = {
         'property': property_obj,
@@ -78,30 +110,32 @@ def property_detail(request, slug):
 def property_list(request):
     """Liste des propriétés avec filtres"""
     search_form = PropertySearchForm(request.GET or None)
-    properties = Property.objects.filter(status='published').select_related('owner').prefetch_related('images')
-    
-    if search_form.is_valid():
-        city = search_form.cleaned_data.get('city')
-        property_type = search_form.cleaned_data.get('property_type')
-        min_price = search_form.cleaned_data.get('min_price')
-        max_price = search_form.cleaned_data.get('max_price')
-        bedrooms = search_form.cleaned_data.get('bedrooms')
+    
+    def build_page():
+        properties = Property.objects.filter(status='published').select_related('owner', 'primary_image')
+        
+        if search_form.is_valid():
+            city = search_form.cleaned_data.get('city')
+            property_type = search_form.cleaned_data.get('property_type')
+            min_price = search_form.cleaned_data.get('min_price')
+            max_price = search_form.cleaned_data.get('max_price')
+            bedrooms = search_form.cleaned_data.get('bedrooms')
+            
+            if city:
+                properties = properties.filter(city__icontains=city)
+            if property_type:
+                properties = properties.filter(property_type=property_type)
+            if min_price:
+                properties = properties.filter(price__gte=min_price)
+            if max_price:
+                properties = properties.filter(price__lte=max_price)
+            if bedrooms:
+                properties = properties.filter(bedrooms__gte=bedrooms)
         
-        if city:
-            properties = properties.filter(city__icontains=city)
-        if property_type:
-            properties = properties.filter(property_type=property_type)
-        if min_price:
-            properties = properties.filter(price__gte=min_price)
-        if max_price:
-            properties = properties.filter(price__lte=max_price)
-        if bedrooms:
-            properties = properties.filter(bedrooms__gte=bedrooms)
+        return properties
     
     # Pagination
-    paginator = Paginator(properties, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = cached_page('list', request, build_page, LIST_SEARCH_PARAMS)
     
     context = {
         'search_form': search_form,
@@ -111,23 +145,13 @@ def property_list(request):
     return render(request, 'properties/list.html', context)
 
 def map_view(request):
-    """Vue carte des propriétés"""
-    properties = Property.objects.filter(
-        status='published',
-        latitude__isnull=False,
-        longitude__isnull=False
-    ).select_related('owner').prefetch_related('images')
-    
-    context = {
-        'properties': properties,
-    }
-    
-    return render(request, 'properties/map.html', context)
+    """Vue carte des propriétés (chargées par zone via /api/properties/clusters/)"""
+    return render(request, 'properties/map.html')
 
 @login_required
 def favorites(request):
     """Liste des favoris de l'utilisateur"""
-    favorites = Favorite.objects.filter(user=request.user).select_related('property').prefetch_related('property__images')
+    favorites = Favorite.objects.filter(user=request.user).select_related('property', 'property__primary_image')
     
     paginator = Paginator(favorites, 12)
     page_number = request.GET.get('page')
@@ -153,17 +177,21 @@ def property_create(request):
             property_obj = form.save(commit=False)
             property_obj.owner = request.user
             property_obj.status = 'published'
-            property_obj.save()
-            
-            if image_form.cleaned_data.get('image'):
-                image_obj = image_form.save(commit=False)
-                image_obj.property = property_obj
-                image_obj.save()
-                # Déclencher la tâche Celery pour redimensionner l'image
-                process_images.delay(image_obj.id)
-                
-            messages.success(request, _('Property created successfully.'))
-            return redirect('partners:my_properties')
+            try:
+                with publication_quota(request.user):
+                    property_obj.save()
+            except PublicationQuotaExceeded:
+                messages.error(request, _('Publication quota exceeded.'))
+            else:
+                if image_form.cleaned_data.get('image'):
+                    image_obj = image_form.save(commit=False)
+                    image_obj.property = property_obj
+                    image_obj.save()
+                    # Déclencher la tâche Celery pour redimensionner l'image
+                    process_images.delay(image_obj.id)
+                    
+                messages.success(request, _('Property created successfully.'))
+                return redirect('partners:my_properties')
         else:
             messages.error(request, _('Please correct the errors below.'))
     else:
@@ -187,15 +215,20 @@ def property_edit(request, slug):
         form = PropertyForm(request.POST, instance=property_obj)
         image_form = PropertyImageForm(request.POST, request.FILES)
         if form.is_valid() and image_form.is_valid():
-            form.save()
-            if image_form.cleaned_data.get('image'):
-                image_obj = image_form.save(commit=False)
-                image_obj.property = property_obj
-                image_obj.save()
-                # Déclencher la tâche Celery pour redimensionner l'image
-                process_images.delay(image_obj.id)
-            messages.success(request, _('Property updated successfully.'))
-            return redirect('partners:my_properties')
+            try:
+                with publication_quota(request.user):
+                    form.save()
+            except PublicationQuotaExceeded:
+                messages.error(request, _('Publication quota exceeded.'))
+            else:
+                if image_form.cleaned_data.get('image'):
+                    image_obj = image_form.save(commit=False)
+                    image_obj.property = property_obj
+                    image_obj.save()
+                    # Déclencher la tâche Celery pour redimensionner l'image
+                    process_images.delay(image_obj.id)
+                messages.success(request, _('Property updated successfully.'))
+                return redirect('partners:my_properties')
         else:
             messages.error(request, _('Please correct the errors below.'))
     else:
@@ -221,4 +254,42 @@ def property_delete(request, slug):
         messages.success(request, _('Property deleted successfully.'))
         return redirect('partners:my_properties')
     
-    return render(request, 'properties/delete.html', {'property': property_obj})
\ No newline at end of file
+    return render(request, 'properties/delete.html', {'property': property_obj})
+
+@require_GET
+def image_rendition(request, image_id, version, width, fmt):
+    """Sert un rendu redimensionné d'une image, généré à la première demande"""
+    if width not in settings.PROPERTY_IMAGE_RENDITION_WIDTHS or fmt not in settings.PROPERTY_IMAGE_RENDITION_FORMATS:
+        raise Http404(_('Unsupported image size or format.'))
+
+    image_obj = get_object_or_404(
+        PropertyImage.objects.only('id', 'image', 'original'),
+        id=image_id,
+        property__status='published'
+    )
+    if version != source_version(image_obj):
+        # Source remplacé depuis la génération de l'URL : rendu courant, sous sa propre URL
+        response = redirect(image_obj.get_rendition_url(width, fmt))
+        response['Cache-Control'] = 'public, max-age=300'
+        return response
+
+    key = rendition_key(image_obj, width, fmt)
+    cache = get_rendition_cache()
+    rendition = None
+    # Un rendu évincé entre la recherche et l'ouverture est regénéré une fois
+    for _attempt in range(2):
+        try:
+            path = cache.get_or_create(key, lambda: render_rendition(image_obj, width, fmt))
+            rendition = open(path, 'rb')
+            break
+        except FileNotFoundError:
+            continue
+        except (OSError, ValueError):
+            break
+    if rendition is None:
+        raise Http404(_('Image not available.'))
+
+    response = FileResponse(rendition, content_type=FORMATS[fmt][1])
+    # La version du source est dans l'URL : le rendu d'une URL donnée est immuable
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
\ No newline at end of file
@@ -0,0 +1,218 @@
+import ipaddress
+import logging
+import mimetypes
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse
+
+import requests
+from PIL import Image
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+# Images matricielles seulement (pas de SVG : script, ressources externes)
+RASTER_CONTENT_TYPES = {'image/jpeg', 'image/png', 'image/webp', 'image/gif'}
+RASTER_FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF'}
+MAX_REDIRECTS = 5
+
+class ImageDownloadError(Exception):
+    pass
+
+def _require_public(host, address):
+    """Refuse une adresse privée, locale ou réservée (IPv4 mappée en IPv6 comprise)"""
+    address = ipaddress.ip_address(address.split('%')[0])
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    if not address.is_global:
+        raise ImageDownloadError(f"{host} resolves to non-public address {address}")
+
+class _PublicPeerMixin:
+    """Vérifie l'adresse effectivement contactée, une fois la connexion ouverte.
+
+    Le nom est résolu à nouveau à la connexion : sans ce contrôle, un DNS qui
+    répond une adresse publique à _check_host puis une adresse interne
+    (rebinding) ferait contacter le réseau interne.
+    """
+
+    def _new_conn(self):
+        sock = super()._new_conn()
+        try:
+            _require_public(self.host, sock.getpeername()[0])
+        except ImageDownloadError:
+            sock.close()
+            raise
+        return sock
+
+class _PublicHTTPConnection(_PublicPeerMixin, HTTPConnection):
+    pass
+
+class _PublicHTTPSConnection(_PublicPeerMixin, HTTPSConnection):
+    pass
+
+class _PublicHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _PublicHTTPConnection
+
+class _PublicHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _PublicHTTPSConnection
+
+class _PublicHostAdapter(HTTPAdapter):
+    """Adaptateur requests dont les connexions directes n'aboutissent qu'à des adresses publiques"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _PublicHTTPConnectionPool,
+            'https': _PublicHTTPSConnectionPool,
+        }
+
+class _LimitedReader:
+    """Lit le flux HTTP par morceaux en refusant de dépasser max_bytes"""
+
+    def __init__(self, raw, max_bytes):
+        self.raw = raw
+        self.max_bytes = max_bytes
+        self.read_bytes = 0
+
+    def read(self, size=-1):
+        chunk = self.raw.read(size)
+        self.read_bytes += len(chunk)
+        if self.read_bytes > self.max_bytes:
+            raise ImageDownloadError(f"image larger than {self.max_bytes} bytes")
+        return chunk
+
+class ImageDownloader:
+    """Télécharge les photos des annonces en parallèle.
+
+    Le nombre de téléchargements simultanés est borné globalement (workers) et
+    par hôte (per_host). Chaque réponse est copiée par morceaux directement
+    vers le stockage, sans jamais garder le fichier entier en mémoire.
+
+    Les URL viennent des sites scrapés : seuls http(s) et les hôtes dont
+    toutes les adresses sont publiques sont contactés, à chaque redirection
+    (pas de requête vers le réseau interne) ; l'adresse de chaque connexion
+    est vérifiée à nouveau une fois ouverte. Le fichier reçu doit être une
+    image matricielle que Pillow sait lire, quel que soit son Content-Type.
+    """
+
+    def __init__(self, workers=None, per_host=None, max_bytes=None, timeout=None, storage=None, upload_to='properties/',
+                 allow_private_hosts=None):
+        self.workers = workers or settings.SCRAPING_IMAGE_WORKERS
+        self.per_host = per_host or settings.SCRAPING_IMAGE_PER_HOST
+        self.max_bytes = max_bytes or settings.SCRAPING_IMAGE_MAX_BYTES
+        self.timeout = timeout or settings.SCRAPING_IMAGE_TIMEOUT
+        self.storage = storage or default_storage
+        self.upload_to = upload_to
+        if allow_private_hosts is None:
+            allow_private_hosts = settings.SCRAPING_IMAGE_ALLOW_PRIVATE_HOSTS
+        self.allow_private_hosts = allow_private_hosts
+        self._host_slots = {}
+        self._host_slots_guard = threading.Lock()
+        self._local = threading.local()
+
+    def download_all(self, urls):
+        """Retourne {url: nom stocké}, sans les URL dont le téléchargement a échoué"""
+        urls = list(dict.fromkeys(urls))
+        stored = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for url, name in zip(urls, pool.map(self._download_or_none, urls)):
+                if name:
+                    stored[url] = name
+        return stored
+
+    def download(self, url):
+        with self._host_slot(urlparse(url).netloc):
+            with self._get(url) as response:
+                response.raise_for_status()
+                content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+                if content_type not in RASTER_CONTENT_TYPES:
+                    raise ImageDownloadError(f"unexpected content type {content_type!r}")
+                length = response.headers.get('Content-Length')
+                if length and length.isdigit() and int(length) > self.max_bytes:
+                    raise ImageDownloadError(f"image larger than {self.max_bytes} bytes")
+
+                response.raw.decode_content = True
+                name = self.storage.get_available_name(self._file_name(url, content_type))
+                try:
+                    name = self.storage.save(name, File(_LimitedReader(response.raw, self.max_bytes), name=name))
+                    self._check_raster(name)
+                    return name
+                except Exception:
+                    # Ne pas laisser de fichier tronqué ou refusé dans le stockage
+                    if self.storage.exists(name):
+                        self.storage.delete(name)
+                    raise
+
+    def _get(self, url):
+        """Réponse en flux, en suivant au plus MAX_REDIRECTS redirections vers des hôtes vérifiés"""
+        for _ in range(MAX_REDIRECTS + 1):
+            self._check_host(url)
+            response = self._session().get(url, stream=True, timeout=self.timeout, allow_redirects=False)
+            if not response.is_redirect:
+                return response
+            response.close()
+            url = urljoin(url, response.headers['Location'])
+        raise ImageDownloadError(f"more than {MAX_REDIRECTS} redirects")
+
+    def _check_host(self, url):
+        """Refuse les schémas autres que http(s) et les hôtes privés, locaux ou réservés"""
+        parts = urlparse(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ImageDownloadError(f"unsupported URL {url!r}")
+        if self.allow_private_hosts:
+            return
+        try:
+            infos = socket.getaddrinfo(parts.hostname, parts.port or None, proto=socket.IPPROTO_TCP)
+        except (socket.gaierror, UnicodeError) as e:
+            raise ImageDownloadError(f"cannot resolve {parts.hostname}: {e}")
+        for info in infos:
+            _require_public(parts.hostname, info[4][0])
+
+    def _check_raster(self, name):
+        """Le fichier enregistré doit être une image matricielle lisible"""
+        try:
+            with self.storage.open(name, 'rb') as f:
+                with Image.open(f) as img:
+                    image_format = img.format
+                    img.verify()
+        except Exception as e:
+            raise ImageDownloadError(f"not a readable image: {e}")
+        if image_format not in RASTER_FORMATS:
+            raise ImageDownloadError(f"unsupported image format {image_format}")
+
+    def _download_or_none(self, url):
+        try:
+            return self.download(url)
+        except (requests.RequestException, ImageDownloadError, OSError) as e:
+            logger.warning(f"Image download failed for {url}: {str(e)}")
+            return None
+
+    def _file_name(self, url, content_type):
+        extension = mimetypes.guess_extension(content_type) or os.path.splitext(urlparse(url).path)[1] or '.jpg'
+        return f"{self.upload_to}scraped_{uuid.uuid4().hex}{extension}"
+
+    def _host_slot(self, host):
+        with self._host_slots_guard:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return slot
+
+    def _session(self):
+        # Une session par thread : connexions keep-alive réutilisées, sans partage entre threads
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers['User-Agent'] = 'Astremina image fetcher'
+            if not self.allow_private_hosts:
+                session.mount('http://', _PublicHostAdapter())
+                session.mount('https://', _PublicHostAdapter())
+        return session
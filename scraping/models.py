@@ -15,7 +15,7 @@ class ScrapingSource(models.Model):
         _('scraper configuration'), 
         blank=True, 
         null=True,
-        help_text=_('CSS selectors and scraping rules')
+        help_text=_('CSS selectors and scraping rules (image_selector, image_attribute and max_images for photos)')
     )
     active = models.BooleanField(_('active'), default=True)
     created_at = models.DateTimeField(_('created at'), auto_now_add=True)
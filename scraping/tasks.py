@@ -2,13 +2,17 @@ from celery import shared_task
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from .models import ScrapingSource, ScrapeJobLog
-from properties.models import Property
+from properties.models import Property, PropertyImage
+from properties import changelog
+from properties.tasks import process_images
+from .images import ImageDownloader
 from partners.models import Partner, Contract
 from django.db.models import Count, Q
 import requests
 from bs4 import BeautifulSoup
 import logging
 import re
+from urllib.parse import urljoin
 from django.utils.text import slugify
 from hashlib import md5
 
@@ -46,6 +50,7 @@ def scrape_source(source_id):
         # Traitement des items
         items_created = 0
         items_updated = 0
+        scraped_images = []
         
         for item_data in items:
             property_obj, created = process_scraped_item(item_data, source)
@@ -53,6 +58,11 @@ def scrape_source(source_id):
                 items_created += 1
             else:
                 items_updated += 1
+            if item_data.get('image_urls'):
+                scraped_images.append((property_obj, item_data['image_urls']))
+        
+        # Télécharger les photos de toutes les annonces en une seule passe concurrente
+        ingest_scraped_images(scraped_images)
         
         # Mettre à jour le log
         job_log.status = 'success'
@@ -89,7 +99,8 @@ def scrape_jumia_house(source):
             'price_selector': 'span.price',
             'location_selector': 'span.location',
             'description_selector': 'p.description',
-            'url_selector': 'a'
+            'url_selector': 'a',
+            'image_selector': 'img'
         }
         
         property_cards = soup.select(config['card_selector'])
@@ -101,6 +112,7 @@ def scrape_jumia_house(source):
                 'location': card.select_one(config['location_selector']).text.strip() if card.select_one(config['location_selector']) else '',
                 'description': card.select_one(config['description_selector']).text.strip() if card.select_one(config['description_selector']) else '',
                 'source_url': (source.base_url.rstrip('/') + card.select_one(config['url_selector'])['href']) if card.select_one(config['url_selector']) else '',
+                'image_urls': extract_image_urls(card, config, source.base_url),
             }
             items.append(item)
             
@@ -123,7 +135,8 @@ def scrape_boncoin(source):
             'price_selector': 'span.price',
             'location_selector': 'span.location',
             'description_selector': 'p.description',
-            'url_selector': 'a.listing-link'
+            'url_selector': 'a.listing-link',
+            'image_selector': 'img'
         }
         
         listing_cards = soup.select(config['card_selector'])
@@ -135,6 +148,7 @@ def scrape_boncoin(source):
                 'location': card.select_one(config['location_selector']).text.strip() if card.select_one(config['location_selector']) else '',
                 'description': card.select_one(config['description_selector']).text.strip() if card.select_one(config['description_selector']) else '',
                 'source_url': (source.base_url.rstrip('/') + card.select_one(config['url_selector'])['href']) if card.select_one(config['url_selector']) else '',
+                'image_urls': extract_image_urls(card, config, source.base_url),
                 'property_type': extract_property_type(card, config)
             }
             items.append(item)
@@ -157,7 +171,8 @@ def scrape_expat(source):
             'price_selector': 'span.price',
             'location_selector': 'span.city',
             'description_selector': 'p.summary',
-            'url_selector': 'a.listing-link'
+            'url_selector': 'a.listing-link',
+            'image_selector': 'img'
         }
         
         listings = soup.select(config['card_selector'])
@@ -169,6 +184,7 @@ def scrape_expat(source):
                 'location': listing.select_one(config['location_selector']).text.strip() if listing.select_one(config['location_selector']) else '',
                 'description': listing.select_one(config['description_selector']).text.strip() if listing.select_one(config['description_selector']) else '',
                 'source_url': (source.base_url.rstrip('/') + listing.select_one(config['url_selector'])['href']) if listing.select_one(config['url_selector']) else '',
+                'image_urls': extract_image_urls(listing, config, source.base_url),
                 'property_type': extract_property_type(listing, config)
             }
             items.append(item)
@@ -194,7 +210,8 @@ def scrape_booking(source):
             'price_selector': 'div.bui-price-display__value',
             'location_selector': 'span.sr_card_address_line',
             'description_selector': 'div.hotel_desc',
-            'url_selector': 'a.hotel_name_link'
+            'url_selector': 'a.hotel_name_link',
+            'image_selector': 'img'
         }
         
         hotels = soup.select(config['card_selector'])
@@ -206,6 +223,7 @@ def scrape_booking(source):
                 'location': hotel.select_one(config['location_selector']).text.strip() if hotel.select_one(config['location_selector']) else '',
                 'description': hotel.select_one(config['description_selector']).text.strip() if hotel.select_one(config['description_selector']) else '',
                 'source_url': (source.base_url.rstrip('/') + hotel.select_one(config['url_selector'])['href']) if hotel.select_one(config['url_selector']) else '',
+                'image_urls': extract_image_urls(hotel, config, source.base_url),
                 'property_type': 'hotel'
             }
             items.append(item)
@@ -226,6 +244,23 @@ def extract_price(price_element):
         return float(price_match.group().replace(',', ''))
     return None
 
+def extract_image_urls(card, config, base_url):
+    """Extrait les URL des photos d'une annonce (image_selector, image_attribute, max_images)"""
+    image_selector = config.get('image_selector')
+    if not image_selector:
+        return []
+
+    attributes = [config.get('image_attribute', 'src'), 'data-src', 'src']
+    urls = []
+    for element in card.select(image_selector):
+        value = next((element.get(attr) for attr in attributes if element.get(attr)), '')
+        if not value or value.startswith('data:'):
+            continue
+        url = urljoin(base_url, value.strip())
+        if url not in urls:
+            urls.append(url)
+    return urls[:config.get('max_images', 10)]
+
 def extract_property_type(card, config):
     """Extrait le type de propriété"""
     type_selector = config.get('type_selector', 'span.property-type')
@@ -302,6 +337,41 @@ def process_scraped_item(item_data, source):
         property_obj = Property.objects.create(**property_data)
         return property_obj, True
 
+def ingest_scraped_images(scraped_images, downloader=None):
+    """Télécharge les photos des annonces scrapées et les envoie au traitement d'images.
+
+    scraped_images est une liste de (propriété, URL des photos). Les photos déjà
+    rattachées à la propriété (même URL source) ne sont pas retéléchargées.
+    """
+    pending = []
+    for property_obj, image_urls in scraped_images:
+        known_urls = set(property_obj.images.values_list('source_url', flat=True))
+        urls = [url for url in image_urls if url not in known_urls]
+        if urls:
+            pending.append((property_obj, urls))
+    if not pending:
+        return 0
+
+    downloader = downloader or ImageDownloader()
+    stored = downloader.download_all(url for _, urls in pending for url in urls)
+
+    images_created = 0
+    for property_obj, urls in pending:
+        for url in urls:
+            if url not in stored:
+                continue
+            image_obj = PropertyImage.objects.create(
+                property=property_obj,
+                image=stored[url],
+                source_url=url
+            )
+            # Même traitement que les images envoyées par les partenaires
+            process_images.delay(image_obj.id)
+            images_created += 1
+
+    logger.info(f"{images_created} scraped images ingested")
+    return images_created
+
 def extract_city(location_text):
     """Extrait la ville à partir du texte de localisation"""
     if not location_text:
@@ -320,6 +390,8 @@ def check_contract_expirations():
     """Vérifie les contrats expirés et désactive les propriétés"""
     from partners.models import Contract
     from django.utils import timezone
+    from dashboard import counters
+    from properties import aggregates, versions
     
     today = timezone.now().date()
     expired_contracts = Contract.objects.filter(
@@ -331,10 +403,20 @@ def check_contract_expirations():
         contract.status = 'expired'
         contract.save()
         
-        Property.objects.filter(
+        properties = Property.objects.filter(
             owner=contract.partner.user,
             status='published'
-        ).update(status='disabled')
+        )
+        # update() n'émet pas de signaux : tombstones de synchronisation, agrégats, compteurs du dashboard,
+        # versions du catalogue (ETag, réponses en cache)
+        disabled = list(properties.values('id', *aggregates.STATE_FIELDS))
+        properties.update(status='disabled')
+        changelog.record_on_commit((state['id'], changelog.REMOVE) for state in disabled)
+        transitions = [(state, dict(state, status='disabled')) for state in disabled]
+        aggregates.record(transitions)
+        counters.record(counters.property_deltas(transitions))
+        for property_type in {state['property_type'] for state in disabled}:
+            versions.bump_property_on_commit(property_type)
         
         logger.info(f"Contract expired for partner {contract.partner.company_name}")
 
@@ -360,6 +442,12 @@ def geocode_property(property_id):
     except Exception as e:
         logger.error(f"Geocoding failed for property {property_id}: {str(e)}")
 
+@shared_task
+def geocode_properties(property_ids):
+    """Géocode un lot de propriétés (créations en masse) : une tâche au lieu d'une par propriété"""
+    for property_id in property_ids:
+        geocode_property(property_id)
+
 @shared_task
 def stats_aggregate_daily():
     """Agrège les statistiques quotidiennes pour le dashboard"""
@@ -0,0 +1,167 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from unittest import mock
+from bs4 import BeautifulSoup
+from PIL import Image
+import tempfile
+import threading
+import time
+
+from django.core.files.storage import FileSystemStorage
+from properties.models import Property, PropertyImage
+from .images import ImageDownloader
+from .tasks import extract_image_urls, ingest_scraped_images
+
+User = get_user_model()
+
+def png_bytes(size=(32, 32)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'blue').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg"><script>alert(1)</script></svg>'
+
+class ImageStandInHandler(BaseHTTPRequestHandler):
+    """Serveur d'images local : /photo/<n>.png, /large.png, /page.html, /logo.svg, /disguised.png"""
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+        try:
+            time.sleep(0.05)
+            if self.path.startswith('/photo/'):
+                self.send_body(png_bytes(), 'image/png')
+            elif self.path == '/large.png':
+                self.send_body(b'\x89PNG' + b'0' * 4096, 'image/png', send_length=False)
+            elif self.path == '/page.html':
+                self.send_body(b'<html></html>', 'text/html')
+            elif self.path == '/logo.svg':
+                self.send_body(SVG, 'image/svg+xml')
+            elif self.path == '/disguised.png':
+                self.send_body(SVG, 'image/png')
+            else:
+                self.send_error(404)
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+    def send_body(self, body, content_type, send_length=True):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        if send_length:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+# Le serveur de test écoute sur 127.0.0.1
+@override_settings(SCRAPING_IMAGE_ALLOW_PRIVATE_HOSTS=True)
+class ImageIngestionTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), ImageStandInHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        ImageStandInHandler.max_active = 0
+        self.storage = FileSystemStorage(location=tempfile.mkdtemp())
+        self.user = User.objects.create_user(
+            username='owner',
+            email='owner@astremina.com',
+            password='test123'
+        )
+        self.property = Property.objects.create(
+            title='Scraped House',
+            description='A scraped house',
+            property_type='house',
+            price=1000000,
+            city='Douala',
+            owner=self.user,
+            status='published'
+        )
+
+    def test_extract_image_urls(self):
+        card = BeautifulSoup(
+            '<div><img src="/a.jpg"><img data-src="/b.jpg"><img src="data:image/png;base64,x"><img src="/a.jpg"></div>',
+            'html.parser'
+        )
+        urls = extract_image_urls(card, {'image_selector': 'img'}, 'https://example.com/listings/')
+        self.assertEqual(urls, ['https://example.com/a.jpg', 'https://example.com/b.jpg'])
+        self.assertEqual(extract_image_urls(card, {}, 'https://example.com/'), [])
+
+    def test_concurrent_download_respects_per_host_limit(self):
+        downloader = ImageDownloader(workers=8, per_host=2, storage=self.storage)
+        urls = [f"{self.base_url}/photo/{i}.png" for i in range(8)]
+        stored = downloader.download_all(urls)
+        self.assertEqual(set(stored), set(urls))
+        self.assertLessEqual(ImageStandInHandler.max_active, 2)
+        with self.storage.open(stored[urls[0]], 'rb') as f:
+            self.assertEqual(f.read(), png_bytes())
+
+    def test_rejected_downloads_leave_no_files(self):
+        downloader = ImageDownloader(max_bytes=1024, storage=self.storage)
+        stored = downloader.download_all([
+            f"{self.base_url}/large.png",
+            f"{self.base_url}/page.html",
+            f"{self.base_url}/missing.png",
+            f"{self.base_url}/logo.svg",
+            f"{self.base_url}/disguised.png",
+        ])
+        self.assertEqual(stored, {})
+        self.assertEqual(self.storage.listdir('properties')[1] if self.storage.exists('properties') else [], [])
+
+    def test_private_hosts_are_refused(self):
+        downloader = ImageDownloader(storage=self.storage, allow_private_hosts=False)
+        stored = downloader.download_all([
+            f"{self.base_url}/photo/1.png",
+            'http://169.254.169.254/latest/meta-data/',
+            'http://[::ffff:10.0.0.1]/photo.png',
+            'file:///etc/passwd',
+        ])
+        self.assertEqual(stored, {})
+        self.assertEqual(ImageStandInHandler.max_active, 0)
+
+    def test_redirect_to_private_host_is_refused(self):
+        downloader = ImageDownloader(storage=self.storage, allow_private_hosts=False)
+        redirect = mock.Mock(is_redirect=True, headers={'Location': f"{self.base_url}/photo/1.png"})
+        session = mock.Mock()
+        session.get.return_value = redirect
+        with mock.patch.object(downloader, '_session', return_value=session):
+            self.assertEqual(downloader.download_all(['http://93.184.216.34/photo.png']), {})
+        self.assertEqual(session.get.call_count, 1)
+        self.assertEqual(ImageStandInHandler.max_active, 0)
+
+    def test_rebound_host_is_refused_at_connection(self):
+        # Le DNS a répondu une adresse publique à la vérification, puis 127.0.0.1 à la connexion
+        downloader = ImageDownloader(storage=self.storage, allow_private_hosts=False)
+        with mock.patch.object(downloader, '_check_host'):
+            self.assertEqual(downloader.download_all([f"{self.base_url}/photo/1.png"]), {})
+        self.assertEqual(ImageStandInHandler.max_active, 0)
+
+    @mock.patch('scraping.tasks.process_images.delay')
+    def test_ingest_creates_images_and_queues_processing(self, process_delay):
+        downloader = ImageDownloader(storage=self.storage)
+        urls = [f"{self.base_url}/photo/1.png", f"{self.base_url}/photo/2.png"]
+        self.assertEqual(ingest_scraped_images([(self.property, urls)], downloader=downloader), 2)
+        self.assertEqual(PropertyImage.objects.filter(property=self.property).count(), 2)
+        self.assertEqual(process_delay.call_count, 2)
+
+        # Les photos déjà rattachées ne sont pas retéléchargées
+        self.assertEqual(ingest_scraped_images([(self.property, urls)], downloader=downloader), 0)